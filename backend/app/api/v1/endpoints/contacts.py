@@ -3,12 +3,13 @@ TECHGURU ElevateCRM Contacts Endpoints
 """
 from fastapi import APIRouter, Query, Depends, Request, Response, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_
+from sqlalchemy import select, func, or_, asc
 from typing import Dict, Any, Optional, List
 import logging
 
-from app.core.dependencies import get_tenant_db, get_current_tenant
+from app.core.dependencies import get_read_db, get_current_tenant
 from app.models.contact import Contact
+from app.services.search_service import encode_cursor, decode_cursor, keyset_condition
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -21,7 +22,8 @@ async def list_contacts(
     q: Optional[str] = Query(None, description="Search query"),
     limit: int = Query(10, ge=1, le=100, description="Number of contacts to return"),
     offset: int = Query(0, ge=0, description="Number of contacts to skip"),
-    db: AsyncSession = Depends(get_tenant_db)
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page (replaces offset)"),
+    db: AsyncSession = Depends(get_read_db)
 ) -> Dict[str, Any]:
     """
     List contacts for current tenant with search, pagination, and filtering.
@@ -29,6 +31,7 @@ async def list_contacts(
     - **q**: Search query (searches name, email, phone, company)
     - **limit**: Maximum number of contacts to return (1-100)
     - **offset**: Number of contacts to skip for pagination
+    - **cursor**: Keyset cursor from `next_cursor`; skips OFFSET and the total count
     
     Returns contacts with X-Total-Count header for frontend pagination.
     """
@@ -49,20 +52,44 @@ async def list_contacts(
             query = query.where(search_filter)
             count_query = count_query.where(search_filter)
         
-        # Get total count for X-Total-Count header
-        total_result = await db.execute(count_query)
-        total_count = total_result.scalar()
+        sort_columns = [
+            (Contact.first_name, "asc"),
+            (Contact.last_name, "asc"),
+            (Contact.id, "asc")
+        ]
         
-        # Apply pagination and ordering
-        query = query.order_by(Contact.first_name, Contact.last_name)
-        query = query.offset(offset).limit(limit)
+        # Cursor pages are located by keyset, so neither OFFSET nor COUNT is needed
+        total_count = None
+        if cursor:
+            try:
+                values = decode_cursor(cursor, "contacts")
+            except ValueError as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+            query = query.where(keyset_condition(sort_columns, values))
+        else:
+            # Get total count for X-Total-Count header
+            total_result = await db.execute(count_query)
+            total_count = total_result.scalar()
+            query = query.offset(offset)
+        
+        # Apply pagination and ordering (one extra row tells us if there is more)
+        query = query.order_by(*[asc(column).nulls_last() for column, _ in sort_columns])
+        query = query.limit(limit + 1)
         
         # Execute query
         result = await db.execute(query)
         contacts = result.scalars().all()
+        has_more = len(contacts) > limit
+        contacts = contacts[:limit]
+        
+        next_cursor = None
+        if has_more:
+            last = contacts[-1]
+            next_cursor = encode_cursor([last.first_name, last.last_name, last.id], "contacts")
         
         # Set X-Total-Count header for frontend pagination
-        response.headers["X-Total-Count"] = str(total_count)
+        if total_count is not None:
+            response.headers["X-Total-Count"] = str(total_count)
         
         # Convert to response format
         contacts_data = []
@@ -89,9 +116,12 @@ async def list_contacts(
             "limit": limit,
             "offset": offset,
             "query": q,
-            "has_more": offset + len(contacts_data) < total_count
+            "has_more": has_more,
+            "next_cursor": next_cursor
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving contacts: {e}")
         raise HTTPException(
@@ -103,7 +133,7 @@ async def list_contacts(
 @router.get("/{contact_id}")
 async def get_contact(
     contact_id: str,
-    db: AsyncSession = Depends(get_tenant_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Dict[str, Any]:
     """
     Get a specific contact by ID.
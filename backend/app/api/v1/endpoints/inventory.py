@@ -1,20 +1,33 @@
 """
 TECHGURU ElevateCRM Inventory API Endpoints
 """
+import json
+from collections import defaultdict
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func
+from sqlalchemy import select, and_, func, insert
 from sqlalchemy.orm import selectinload
 import uuid
 from datetime import datetime
 
-from app.core.dependencies import get_async_db, get_current_user
-from app.models.product import Product, StockLocation, StockMove
+from app.core.config import settings
+from app.core.dependencies import get_async_db, get_read_db, get_current_user
+from app.models.product import Product, StockLocation, StockMove, StockReservation
 from app.core.tenant_context import TenantContextManager
 from app.services.tenant_service import TenantAwareService
+from app.services.barcode_cache import barcode_cache
 from app.services.realtime_service import get_realtime_service, RealtimeService
-from pydantic import BaseModel
+from app.services.reservation_service import (
+    InsufficientStock, commit_reservation, release_reservation, reserve_stock_lines
+)
+from app.services.search_cache import mark_search_stale
+from app.services.search_service import decode_cursor, encode_cursor
+from app.services.stock_service import (
+    adjust_product_totals_bulk, apply_stock_deltas, apply_stock_move, stock_summary_query
+)
+from pydantic import BaseModel, Field
 
 router = APIRouter()
 
@@ -61,6 +74,44 @@ class StockMoveCreate(BaseModel):
     notes: Optional[str] = None
 
 
+class StockMoveBatchCreate(BaseModel):
+    moves: List[StockMoveCreate] = Field(..., min_length=1, max_length=settings.INVENTORY_BATCH_MAX_MOVES)
+
+
+class StockMoveBatchResponse(BaseModel):
+    created: int
+    move_ids: List[uuid.UUID]
+
+
+class StockReservationLine(BaseModel):
+    product_id: uuid.UUID
+    location_id: uuid.UUID
+    quantity: int = Field(..., gt=0)
+
+
+class StockReservationCreate(BaseModel):
+    lines: List[StockReservationLine] = Field(..., min_length=1, max_length=settings.INVENTORY_BATCH_MAX_MOVES)
+    ttl_seconds: int = Field(
+        settings.STOCK_RESERVATION_TTL_SECONDS, ge=1, le=settings.STOCK_RESERVATION_MAX_TTL_SECONDS
+    )
+    reference_type: Optional[str] = None  # order, cart, ...
+    reference_id: Optional[uuid.UUID] = None
+
+
+class StockReservationResponse(BaseModel):
+    id: uuid.UUID
+    product_id: uuid.UUID
+    location_id: uuid.UUID
+    quantity: int
+    status: str
+    reference_type: Optional[str]
+    reference_id: Optional[uuid.UUID]
+    expires_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
 class StockMoveResponse(BaseModel):
     id: uuid.UUID
     company_id: uuid.UUID
@@ -99,10 +150,21 @@ class StockSummaryResponse(BaseModel):
     locations: List[dict]
 
 
+def _current_company_id() -> uuid.UUID:
+    """Company of the request's tenant context"""
+    tenant_id = TenantContextManager.get_tenant_id()
+    if not tenant_id:
+        raise HTTPException(status_code=400, detail="No tenant context")
+    try:
+        return uuid.UUID(str(tenant_id))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 # Stock Locations endpoints
 @router.get("/locations", response_model=List[StockLocationResponse])
 async def get_stock_locations(
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user=Depends(get_current_user),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000)
@@ -152,7 +214,7 @@ async def get_stock_location(
 # Stock Moves endpoints
 @router.get("/moves", response_model=List[StockMoveResponse])
 async def get_stock_moves(
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user=Depends(get_current_user),
     product_id: Optional[uuid.UUID] = Query(None),
     location_id: Optional[uuid.UUID] = Query(None),
@@ -189,20 +251,6 @@ async def create_stock_move(
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    # Get current stock level before move
-    old_quantity = 0
-    if move_data.from_location_id:
-        # This is an outbound move - get current stock at from_location
-        current_stock_query = select(func.sum(StockMove.quantity)).where(
-            and_(
-                StockMove.product_id == move_data.product_id,
-                StockMove.to_location_id == move_data.from_location_id,
-                StockMove.company_id == service.tenant_context.company_id
-            )
-        )
-        current_stock_result = await db.execute(current_stock_query)
-        old_quantity = current_stock_result.scalar() or 0
-    
     # Validate locations if provided
     if move_data.from_location_id:
         from_location = await service.get_by_id(StockLocation, move_data.from_location_id)
@@ -225,46 +273,241 @@ async def create_stock_move(
     data["status"] = "completed"
     
     move = await service.create(StockMove, **data)
+    # Stock levels change in the same transaction as the move is recorded
+    stock_changes = await apply_stock_move(db, move)
+    # Commit before notifying so listeners and the search cache never see an uncommitted move
+    await db.commit()
+    
+    # Stock updates and notification go out in one pipelined flush
+    async with realtime_service.batch():
+        for location_id, old_quantity, new_quantity in stock_changes:
+            await realtime_service.publish_stock_update(
+                service.tenant_context.company_id,
+                str(move_data.product_id),
+                old_quantity,
+                new_quantity,
+                str(location_id)
+            )
     
-    # Calculate new stock level and publish real-time event
-    new_quantity = old_quantity
-    if move_data.from_location_id and move_data.to_location_id:
-        # Transfer between locations - no net change but still notify
-        await realtime_service.publish_stock_update(
+        # Also publish a general notification
+        await realtime_service.publish_system_notification(
             service.tenant_context.company_id,
-            str(move_data.product_id),
-            old_quantity,
-            old_quantity,  # Same quantity but transferred
-            str(move_data.from_location_id)
+            "stock_movement",
+            "Stock Movement Created",
+            f"Stock movement for {product.name}: {move_data.quantity} units",
+            "normal"
         )
-    elif move_data.to_location_id:
-        # Stock in - increase
-        new_quantity = old_quantity + move_data.quantity
-        await realtime_service.publish_stock_update(
-            service.tenant_context.company_id,
-            str(move_data.product_id),
-            old_quantity,
-            new_quantity,
-            str(move_data.to_location_id)
+    
+    return move
+
+
+@router.post("/moves/batch", response_model=StockMoveBatchResponse)
+async def create_stock_moves_batch(
+    batch: StockMoveBatchCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+    realtime_service: RealtimeService = Depends(get_realtime_service)
+):
+    """
+    Record many stock movements in one transaction (receipts, cycle counts)
+    
+    Every referenced product and location is checked up front and nothing is
+    written if any is missing. Each affected product gets a single
+    stock_update event carrying its per-location changes.
+    """
+    company_id = _current_company_id()
+    
+    product_ids = {move.product_id for move in batch.moves}
+    location_ids = {
+        location_id
+        for move in batch.moves
+        for location_id in (move.from_location_id, move.to_location_id)
+        if location_id
+    }
+    
+    # No row locks here: stock levels are locked before products, as for single moves
+    products = await db.execute(
+        select(Product.id).where(Product.company_id == company_id, Product.id.in_(product_ids))
+    )
+    missing_products = product_ids - set(products.scalars())
+    if missing_products:
+        raise HTTPException(status_code=404, detail={
+            "message": "Products not found", "ids": sorted(map(str, missing_products))
+        })
+    
+    if location_ids:
+        locations = await db.execute(
+            select(StockLocation.id)
+            .where(StockLocation.company_id == company_id, StockLocation.id.in_(location_ids))
         )
-    elif move_data.from_location_id:
-        # Stock out - decrease
-        new_quantity = old_quantity - move_data.quantity
-        await realtime_service.publish_stock_update(
-            service.tenant_context.company_id,
-            str(move_data.product_id),
-            old_quantity,
-            new_quantity,
-            str(move_data.from_location_id)
+        missing_locations = location_ids - set(locations.scalars())
+        if missing_locations:
+            raise HTTPException(status_code=404, detail={
+                "message": "Stock locations not found", "ids": sorted(map(str, missing_locations))
+            })
+    
+    moved_at = datetime.utcnow()
+    rows = []
+    level_deltas = defaultdict(int)
+    product_deltas = defaultdict(int)
+    for move in batch.moves:
+        data = move.dict()
+        data.update(
+            id=uuid.uuid4(),
+            company_id=company_id,
+            created_by_id=current_user.id,
+            moved_at=moved_at,
+            status="completed",
+            total_cost=data["unit_cost"] * data["quantity"] if data.get("unit_cost") else None
         )
+        rows.append(data)
+        
+        if move.from_location_id:
+            level_deltas[(move.product_id, move.from_location_id)] -= move.quantity
+            product_deltas[move.product_id] -= move.quantity
+        if move.to_location_id:
+            level_deltas[(move.product_id, move.to_location_id)] += move.quantity
+            product_deltas[move.product_id] += move.quantity
+    
+    # One multi-row INSERT, one stock level upsert and one product totals update
+    await db.execute(insert(StockMove), rows)
+    level_changes = await apply_stock_deltas(db, company_id, level_deltas)
+    totals = await adjust_product_totals_bulk(db, company_id, product_deltas)
+    # Core inserts bypass TenantAwareService, so queue the search cache bump here
+    mark_search_stale(db.sync_session, StockMove, company_id)
+    await db.commit()
+    
+    changes_by_product = defaultdict(list)
+    for (product_id, location_id), (old_quantity, new_quantity) in sorted(level_changes.items()):
+        changes_by_product[product_id].append({
+            "location_id": str(location_id),
+            "old_quantity": old_quantity,
+            "new_quantity": new_quantity
+        })
     
-    # Also publish a general notification
-    await realtime_service.publish_system_notification(
-        service.tenant_context.company_id,
-        "stock_movement",
-        "Stock Movement Created",
-        f"Stock movement for {product.name}: {move_data.quantity} units",
-        "normal"
+    async with realtime_service.batch():
+        for product_id, locations in changes_by_product.items():
+            await realtime_service.publish_stock_update(
+                str(company_id),
+                str(product_id),
+                *totals[product_id],
+                locations=locations
+            )
+        
+        await realtime_service.publish_system_notification(
+            str(company_id),
+            "stock_movement",
+            "Stock Movements Recorded",
+            f"{len(rows)} stock movements across {len(product_ids)} products",
+            "normal"
+        )
+    
+    return StockMoveBatchResponse(created=len(rows), move_ids=[row["id"] for row in rows])
+
+
+# Stock reservations
+async def _publish_reserved_levels(realtime_service: RealtimeService, levels):
+    """One stock_update per level whose reserved (and so available) quantity moved"""
+    async with realtime_service.batch():
+        for level in levels:
+            await realtime_service.publish_stock_update(
+                str(level.company_id),
+                str(level.product_id),
+                level.on_hand,
+                level.on_hand,
+                str(level.location_id),
+                reserved=level.reserved
+            )
+
+
+@router.post("/reservations", response_model=List[StockReservationResponse])
+async def create_stock_reservations(
+    reservation: StockReservationCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+    realtime_service: RealtimeService = Depends(get_realtime_service)
+):
+    """
+    Hold stock for a checkout until it is committed, released or expires
+    
+    All lines are reserved or none are; a line without enough unreserved
+    stock at its location fails the request with 409.
+    """
+    company_id = _current_company_id()
+    
+    try:
+        reserved = await reserve_stock_lines(
+            db,
+            company_id,
+            [(line.product_id, line.location_id, line.quantity) for line in reservation.lines],
+            ttl_seconds=reservation.ttl_seconds,
+            reference_type=reservation.reference_type,
+            reference_id=reservation.reference_id,
+            created_by_id=current_user.id
+        )
+    except InsufficientStock as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "message": "Insufficient stock",
+                "product_id": str(e.product_id),
+                "location_id": str(e.location_id),
+                "requested": e.requested
+            }
+        )
+    # Reserved quantities drive the product search stock status facet
+    mark_search_stale(db.sync_session, StockReservation, company_id)
+    await db.commit()
+    
+    await _publish_reserved_levels(realtime_service, [level for _, level in reserved])
+    return [reservation for reservation, _ in reserved]
+
+
+@router.post("/reservations/{reservation_id}/release")
+async def release_stock_reservation(
+    reservation_id: uuid.UUID,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+    realtime_service: RealtimeService = Depends(get_realtime_service)
+):
+    """Return a reservation's stock to the available quantity"""
+    company_id = _current_company_id()
+    
+    level = await release_reservation(db, company_id, reservation_id)
+    if level is None:
+        raise HTTPException(status_code=404, detail="Active reservation not found")
+    mark_search_stale(db.sync_session, StockReservation, company_id)
+    await db.commit()
+    
+    await _publish_reserved_levels(realtime_service, [level])
+    return {"id": str(reservation_id), "status": "released"}
+
+
+@router.post("/reservations/{reservation_id}/commit", response_model=StockMoveResponse)
+async def commit_stock_reservation(
+    reservation_id: uuid.UUID,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+    realtime_service: RealtimeService = Depends(get_realtime_service)
+):
+    """Ship a reserved quantity, recording it as an outbound stock move"""
+    company_id = _current_company_id()
+    
+    committed = await commit_reservation(db, company_id, reservation_id, current_user.id)
+    if committed is None:
+        raise HTTPException(status_code=404, detail="Active reservation not found or expired")
+    move, level = committed
+    mark_search_stale(db.sync_session, StockMove, company_id)
+    await db.commit()
+    
+    await realtime_service.publish_stock_update(
+        str(company_id),
+        str(move.product_id),
+        level.on_hand + move.quantity,
+        level.on_hand,
+        str(move.from_location_id),
+        reserved=level.reserved
     )
     
     return move
@@ -274,30 +517,23 @@ async def create_stock_move(
 @router.get("/barcode/{barcode}", response_model=BarcodeSearchResponse)
 async def search_by_barcode(
     barcode: str,
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user=Depends(get_current_user)
 ):
-    """Search for a product by barcode"""
-    service = TenantAwareService(db)
+    """
+    Look up a product by its exact barcode
     
-    # Search for product with this barcode
-    products = await service.search(
-        Product,
-        search_fields=["barcode"],
-        search_term=barcode
-    )
+    Served from the per-tenant barcode cache; codes the tenant has never
+    used are answered without touching the database.
+    """
+    tenant_id = str(_current_company_id())
+    
+    barcode = barcode.strip()
+    product = await barcode_cache.lookup(db, tenant_id, barcode) if barcode else None
     
-    if products:
-        product = products[0]
+    if product:
         return BarcodeSearchResponse(
-            product={
-                "id": str(product.id),
-                "name": product.name,
-                "sku": product.sku,
-                "barcode": product.barcode,
-                "sale_price": float(product.sale_price) if product.sale_price else None,
-                "stock_quantity": product.stock_quantity
-            },
+            product=product,
             found=True,
             barcode=barcode
         )
@@ -320,12 +556,8 @@ async def create_product_from_barcode(
     """Create a new product with the scanned barcode"""
     service = TenantAwareService(db)
     
-    # Check if barcode already exists
-    existing = await service.search(
-        Product,
-        search_fields=["barcode"],
-        search_term=barcode
-    )
+    # Check if barcode already exists (exact match; the search helper is a substring match)
+    existing = await service.get_all(Product, filters={"barcode": barcode}, limit=1)
     if existing:
         raise HTTPException(status_code=400, detail="Product with this barcode already exists")
     
@@ -348,43 +580,113 @@ async def create_product_from_barcode(
     }
     
     product = await service.create(Product, **product_data)
+    # The commit updates the barcode cache and publishes product_update
+    await db.commit()
     return {"product": product, "message": "Product created successfully"}
 
 
 # Stock summary and reports
-@router.get("/summary", response_model=List[StockSummaryResponse])
+@router.get("/summary")
 async def get_stock_summary(
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user=Depends(get_current_user),
     location_id: Optional[uuid.UUID] = Query(None),
-    low_stock_only: bool = Query(False)
+    low_stock_only: bool = Query(False),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page")
 ):
-    """Get stock summary by product and location"""
+    """
+    Get stock summary by product and location
+    
+    Streams ``{"items": [...], "has_more": bool, "next_cursor": str | null}``
+    where every item is a StockSummaryResponse. Pages are keyset paginated by
+    product name; pass ``next_cursor`` back as ``cursor`` for the next one.
+    With ``location_id`` quantities are those held at that location.
+    """
     tenant_id = TenantContextManager.get_tenant_id()
     if not tenant_id:
         raise HTTPException(status_code=400, detail="No tenant context")
+    try:
+        company_id = uuid.UUID(str(tenant_id))
+        after = decode_cursor(cursor, "stock_summary") if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # This would require a more complex query, for now return simplified version
-    service = TenantAwareService(db)
-    products = await service.get_all(Product, limit=1000)
-    
-    summary = []
-    for product in products:
-        if low_stock_only and product.stock_quantity > product.reorder_point:
-            continue
-            
-        summary.append(StockSummaryResponse(
-            product_id=product.id,
-            product_name=product.name,
-            product_sku=product.sku,
-            barcode=product.barcode,
-            total_quantity=product.stock_quantity,
-            available_quantity=product.stock_quantity - product.reserved_quantity,
-            reserved_quantity=product.reserved_quantity,
-            locations=[{"name": "Main Warehouse", "quantity": product.stock_quantity}]
-        ))
-    
-    return summary
+    # One extra product tells us whether there is another page
+    query = stock_summary_query(company_id, limit + 1, after, location_id, low_stock_only)
+    rows = await db.stream(query)
+    
+    # The session dependency stays open until the response has been sent
+    return StreamingResponse(
+        _stream_stock_summary(rows, limit, by_location=location_id is not None),
+        media_type="application/json"
+    )
+
+
+def _stock_summary_item(rows: list, by_location: bool) -> StockSummaryResponse:
+    first = rows[0]
+    locations = [
+        {
+            "location_id": str(row.location_id),
+            "name": row.location_name,
+            "quantity": row.on_hand,
+            "reserved": row.reserved
+        }
+        for row in rows if row.location_id is not None
+    ]
+    if by_location:
+        total = sum(row.on_hand for row in rows if row.location_id is not None)
+        reserved = sum(row.reserved for row in rows if row.location_id is not None)
+    else:
+        total = first.stock_quantity or 0
+        reserved = first.reserved_quantity or 0
+    
+    return StockSummaryResponse(
+        product_id=first.id,
+        product_name=first.name,
+        product_sku=first.sku,
+        barcode=first.barcode,
+        total_quantity=total,
+        available_quantity=total - reserved,
+        reserved_quantity=reserved,
+        locations=locations
+    )
+
+
+async def _stream_stock_summary(rows, limit: int, by_location: bool):
+    """Encode summary rows product by product as they arrive from the database"""
+    yield '{"items": ['
+    
+    emitted = 0
+    last_item = None
+    has_more = False
+    product_rows: list = []
+    try:
+        async for row in rows:
+            if product_rows and row.id != product_rows[0].id:
+                if emitted == limit:
+                    has_more = True
+                    break
+                last_item = _stock_summary_item(product_rows, by_location)
+                yield ("," if emitted else "") + last_item.model_dump_json()
+                emitted += 1
+                product_rows = []
+            product_rows.append(row)
+        
+        if product_rows and not has_more:
+            if emitted == limit:
+                has_more = True
+            else:
+                last_item = _stock_summary_item(product_rows, by_location)
+                yield ("," if emitted else "") + last_item.model_dump_json()
+                emitted += 1
+    finally:
+        await rows.close()
+    
+    next_cursor = None
+    if has_more and last_item is not None:
+        next_cursor = encode_cursor([last_item.product_name, last_item.product_id], "stock_summary")
+    yield "], " + json.dumps({"has_more": has_more, "next_cursor": next_cursor})[1:]
 
 
 @router.post("/moves/{move_id}/confirm")
@@ -411,5 +713,8 @@ async def confirm_stock_move(
         processed_at=datetime.utcnow(),
         processed_by_id=current_user.id
     )
+    # Pending moves only count towards stock once confirmed
+    await apply_stock_move(db, updated_move)
+    await db.commit()
     
     return {"message": "Stock move confirmed", "move": updated_move}
\ No newline at end of file
@@ -3,12 +3,13 @@ TECHGURU ElevateCRM Products Endpoints
 """
 from fastapi import APIRouter, Query, Depends, Request, Response, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_
+from sqlalchemy import select, func, or_, asc
 from typing import Dict, Any, Optional, List
 import logging
 
-from app.core.dependencies import get_tenant_db, get_current_tenant
+from app.core.dependencies import get_read_db, get_current_tenant
 from app.models.product import Product
+from app.services.search_service import encode_cursor, decode_cursor, keyset_condition
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -20,10 +21,11 @@ async def list_products(
     response: Response,
     q: Optional[str] = Query(None, description="Search query"),
     category: Optional[str] = Query(None, description="Filter by category"),
-    status: Optional[str] = Query(None, description="Filter by status"),
+    status_filter: Optional[str] = Query(None, alias="status", description="Filter by status"),
     limit: int = Query(10, ge=1, le=100, description="Number of products to return"),
     offset: int = Query(0, ge=0, description="Number of products to skip"),
-    db: AsyncSession = Depends(get_tenant_db)
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page (replaces offset)"),
+    db: AsyncSession = Depends(get_read_db)
 ) -> Dict[str, Any]:
     """
     List products for current tenant with search, filtering, and pagination.
@@ -33,6 +35,7 @@ async def list_products(
     - **status**: Filter by product status
     - **limit**: Maximum number of products to return (1-100)
     - **offset**: Number of products to skip for pagination
+    - **cursor**: Keyset cursor from `next_cursor`; skips OFFSET and the total count
     
     Returns products with X-Total-Count header for frontend pagination.
     """
@@ -57,24 +60,44 @@ async def list_products(
             count_query = count_query.where(Product.category == category)
             
         # Apply status filter if provided
-        if status:
-            query = query.where(Product.status == status)
-            count_query = count_query.where(Product.status == status)
+        if status_filter:
+            query = query.where(Product.status == status_filter)
+            count_query = count_query.where(Product.status == status_filter)
         
-        # Get total count for X-Total-Count header
-        total_result = await db.execute(count_query)
-        total_count = total_result.scalar()
+        sort_columns = [(Product.name, "asc"), (Product.id, "asc")]
         
-        # Apply pagination and ordering
-        query = query.order_by(Product.name)
-        query = query.offset(offset).limit(limit)
+        # Cursor pages are located by keyset, so neither OFFSET nor COUNT is needed
+        total_count = None
+        if cursor:
+            try:
+                values = decode_cursor(cursor, "products")
+            except ValueError as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+            query = query.where(keyset_condition(sort_columns, values))
+        else:
+            # Get total count for X-Total-Count header
+            total_result = await db.execute(count_query)
+            total_count = total_result.scalar()
+            query = query.offset(offset)
+        
+        # Apply pagination and ordering (one extra row tells us if there is more)
+        query = query.order_by(*[asc(column).nulls_last() for column, _ in sort_columns])
+        query = query.limit(limit + 1)
         
         # Execute query
         result = await db.execute(query)
         products = result.scalars().all()
+        has_more = len(products) > limit
+        products = products[:limit]
+        
+        next_cursor = None
+        if has_more:
+            last = products[-1]
+            next_cursor = encode_cursor([last.name, last.id], "products")
         
         # Set X-Total-Count header for frontend pagination
-        response.headers["X-Total-Count"] = str(total_count)
+        if total_count is not None:
+            response.headers["X-Total-Count"] = str(total_count)
         
         # Convert to response format
         products_data = []
@@ -105,10 +128,13 @@ async def list_products(
             "offset": offset,
             "query": q,
             "category": category,
-            "status": status,
-            "has_more": offset + len(products_data) < total_count
+            "status": status_filter,
+            "has_more": has_more,
+            "next_cursor": next_cursor
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving products: {e}")
         raise HTTPException(
@@ -120,7 +146,7 @@ async def list_products(
 @router.get("/{product_id}")
 async def get_product(
     product_id: str,
-    db: AsyncSession = Depends(get_tenant_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Dict[str, Any]:
     """
     Get a specific product by ID.
@@ -6,49 +6,33 @@ Supports full-text search, faceted filtering, and intelligent pagination.
 """
 import json
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Any, Dict, List, Optional
 from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import and_
-import redis.asyncio as redis
 from pydantic import BaseModel, Field
 
-from app.core.dependencies import get_async_db, get_current_user, get_current_tenant_context
+from app.core.database import cacheable_read
+from app.core.dependencies import get_read_db, get_current_user, get_current_tenant_context
 from app.core.tenant_context import TenantContext
 from app.models.user import User
-from app.models.contact import Contact
 from app.models.product import Product
 from app.services.search_service import SearchService
+from app.services.search_cache import get_redis_client, search_cache
+from app.services.suggestion_index import suggestion_index
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Redis client for caching and rate limiting
-redis_client = None
-
-
-async def get_redis_client():
-    """Get Redis client for caching"""
-    global redis_client
-    if redis_client is None:
-        try:
-            redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
-            await redis_client.ping()
-        except Exception as e:
-            logger.warning(f"Redis not available for search caching: {e}")
-            redis_client = None
-    return redis_client
-
 
 class SearchResponse(BaseModel):
     """Search API response model"""
     results: List[Dict[str, Any]]
-    total: int
+    total: Optional[int] = None
     page: int
     limit: int
     cursor: Optional[str] = None
@@ -130,35 +114,6 @@ async def check_rate_limit(request: Request, user: User, endpoint: str = "search
         return True  # Allow on error
 
 
-async def get_cached_search_result(cache_key: str) -> Optional[Dict[str, Any]]:
-    """Get cached search result"""
-    redis_conn = await get_redis_client()
-    if not redis_conn:
-        return None
-    
-    try:
-        cached = await redis_conn.get(cache_key)
-        if cached:
-            return json.loads(cached)
-    except Exception as e:
-        logger.error(f"Cache retrieval failed: {e}")
-    
-    return None
-
-
-async def cache_search_result(cache_key: str, result: Dict[str, Any], ttl: int = 60):
-    """Cache search result with TTL"""
-    redis_conn = await get_redis_client()
-    if not redis_conn:
-        return
-    
-    try:
-        # Cache for short TTL to balance performance vs freshness
-        await redis_conn.setex(cache_key, ttl, json.dumps(result, default=str))
-    except Exception as e:
-        logger.error(f"Cache storage failed: {e}")
-
-
 def normalize_search_params(q: str, filters: str, sort: str, page: int, limit: int) -> Dict[str, Any]:
     """Normalize search parameters for caching"""
     # Parse and normalize filters
@@ -184,8 +139,10 @@ async def search_contacts(
     sort: str = Query("", description="Sort fields (comma-separated, prefix with - for desc)"),
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(20, ge=1, le=100, description="Results per page"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page (overrides page)"),
+    total: str = Query("exact", regex="^(exact|estimate)$", description="Exact count or planner estimate"),
     no_cache: bool = Query(False, description="Bypass cache"),
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
     tenant_context: TenantContext = Depends(get_current_tenant_context)
 ):
@@ -207,6 +164,11 @@ async def search_contacts(
     - By name: `sort=name`
     - By update (desc): `sort=-updated_at`
     - Multi-field: `sort=-updated_at,name`
+    
+    **Pagination:**
+    - Pass the returned `cursor` back to fetch the next page in constant time;
+      cursor pages return `total=null` and no facets
+    - `total=estimate` returns a planner estimate instead of an exact count
     """
     start_time = datetime.now()
     
@@ -219,29 +181,19 @@ async def search_contacts(
     
     # Normalize parameters
     params = normalize_search_params(q, filters, sort, page, limit)
+    params['cursor'] = cursor or ''
+    params['total'] = total
     
-    # Generate cache key
-    cache_key = f"search:contacts:{tenant_context.company_id}:" + \
-                json.dumps(params, sort_keys=True)
-    
-    # Check cache if not bypassed
-    cached_result = None
-    if not no_cache:
-        cached_result = await get_cached_search_result(cache_key)
-        if cached_result:
-            cached_result['cached'] = True
-            cached_result['query_time_ms'] = (datetime.now() - start_time).total_seconds() * 1000
-            return SearchResponse(**cached_result)
-    
-    try:
-        # Perform search
-        search_service = SearchService(db, tenant_context)
+    async def run_search(session: AsyncSession) -> Dict[str, Any]:
+        search_service = SearchService(session, tenant_context)
         result = await search_service.search_contacts(
             q=params['q'],
             filters=params['filters'],
             sort=params['sort'],
             page=params['page'],
-            limit=params['limit']
+            limit=params['limit'],
+            cursor=cursor,
+            total_mode=total
         )
         
         # Convert ORM objects to response models
@@ -250,24 +202,32 @@ async def search_contacts(
             contact_data = ContactSearchResult.from_orm(contact)
             contact_results.append(contact_data.dict())
         
-        # Build response
-        response_data = {
+        return {
             'results': contact_results,
             'total': result['total'],
             'page': result['page'],
             'limit': result['limit'],
-            'cursor': None,  # TODO: Implement cursor pagination
+            'cursor': result.get('cursor'),
             'facets': result.get('facets', {}),
-            'query_time_ms': (datetime.now() - start_time).total_seconds() * 1000,
             'cached': False
         }
+    
+    try:
+        # Cache keys carry the tenant's contacts generation, so writes invalidate them
+        if no_cache:
+            response_data, cached = await run_search(db), False
+        else:
+            response_data, cached = await search_cache.get_or_compute(
+                str(tenant_context.company_id), "contacts", params,
+                lambda: run_search(db), cacheable=lambda: cacheable_read(db)
+            )
         
-        # Cache result
-        if not no_cache:
-            await cache_search_result(cache_key, response_data, ttl=60)
-        
+        response_data['cached'] = cached
+        response_data['query_time_ms'] = (datetime.now() - start_time).total_seconds() * 1000
         return SearchResponse(**response_data)
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Contact search failed: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Search temporarily unavailable")
@@ -281,8 +241,10 @@ async def search_products(
     sort: str = Query("", description="Sort fields (comma-separated, prefix with - for desc)"),
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(20, ge=1, le=100, description="Results per page"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page (overrides page)"),
+    total: str = Query("exact", regex="^(exact|estimate)$", description="Exact count or planner estimate"),
     no_cache: bool = Query(False, description="Bypass cache"),
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
     tenant_context: TenantContext = Depends(get_current_tenant_context)
 ):
@@ -305,6 +267,11 @@ async def search_products(
     - By price: `sort=price`
     - By stock (desc): `sort=-stock_quantity`
     - By relevance: `sort=` (default)
+    
+    **Pagination:**
+    - Pass the returned `cursor` back to fetch the next page in constant time;
+      cursor pages return `total=null` and no facets
+    - `total=estimate` returns a planner estimate instead of an exact count
     """
     start_time = datetime.now()
     
@@ -317,29 +284,19 @@ async def search_products(
     
     # Normalize parameters
     params = normalize_search_params(q, filters, sort, page, limit)
+    params['cursor'] = cursor or ''
+    params['total'] = total
     
-    # Generate cache key
-    cache_key = f"search:products:{tenant_context.company_id}:" + \
-                json.dumps(params, sort_keys=True)
-    
-    # Check cache if not bypassed
-    cached_result = None
-    if not no_cache:
-        cached_result = await get_cached_search_result(cache_key)
-        if cached_result:
-            cached_result['cached'] = True
-            cached_result['query_time_ms'] = (datetime.now() - start_time).total_seconds() * 1000
-            return SearchResponse(**cached_result)
-    
-    try:
-        # Perform search
-        search_service = SearchService(db, tenant_context)
+    async def run_search(session: AsyncSession) -> Dict[str, Any]:
+        search_service = SearchService(session, tenant_context)
         result = await search_service.search_products(
             q=params['q'],
             filters=params['filters'],
             sort=params['sort'],
             page=params['page'],
-            limit=params['limit']
+            limit=params['limit'],
+            cursor=cursor,
+            total_mode=total
         )
         
         # Convert ORM objects to response models
@@ -348,24 +305,32 @@ async def search_products(
             product_data = ProductSearchResult.from_orm_with_stock_status(product)
             product_results.append(product_data.dict())
         
-        # Build response
-        response_data = {
+        return {
             'results': product_results,
             'total': result['total'],
             'page': result['page'],
             'limit': result['limit'],
-            'cursor': None,  # TODO: Implement cursor pagination
+            'cursor': result.get('cursor'),
             'facets': result.get('facets', {}),
-            'query_time_ms': (datetime.now() - start_time).total_seconds() * 1000,
             'cached': False
         }
+    
+    try:
+        # Cache keys carry the tenant's products generation, so writes invalidate them
+        if no_cache:
+            response_data, cached = await run_search(db), False
+        else:
+            response_data, cached = await search_cache.get_or_compute(
+                str(tenant_context.company_id), "products", params,
+                lambda: run_search(db), cacheable=lambda: cacheable_read(db)
+            )
         
-        # Cache result
-        if not no_cache:
-            await cache_search_result(cache_key, response_data, ttl=60)
-        
+        response_data['cached'] = cached
+        response_data['query_time_ms'] = (datetime.now() - start_time).total_seconds() * 1000
         return SearchResponse(**response_data)
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Product search failed: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Search temporarily unavailable")
@@ -376,77 +341,17 @@ async def get_search_suggestions(
     q: str = Query(..., min_length=2, description="Partial query for suggestions"),
     entity: str = Query("contacts", regex="^(contacts|products)$", description="Entity type"),
     limit: int = Query(5, ge=1, le=10, description="Number of suggestions"),
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
     tenant_context: TenantContext = Depends(get_current_tenant_context)
 ):
-    """Get search suggestions based on partial query"""
-    
-    # Simple suggestions based on existing data
-    suggestions = []
-    
+    """Get search suggestions from the tenant's in-memory prefix index"""
     try:
-        if entity == "contacts":
-            # Get name and company suggestions
-            from sqlalchemy import select, func, distinct
-            
-            # Name suggestions
-            name_query = select(distinct(Contact.name)).where(
-                and_(
-                    Contact.company_id == tenant_context.company_id,
-                    Contact.name.ilike(f"{q}%")
-                )
-            ).limit(limit)
-            
-            result = await db.execute(name_query)
-            names = [row[0] for row in result.fetchall() if row[0]]
-            suggestions.extend([{"type": "name", "value": name} for name in names])
-            
-            # Company suggestions
-            if len(suggestions) < limit:
-                company_query = select(distinct(Contact.company)).where(
-                    and_(
-                        Contact.company_id == tenant_context.company_id,
-                        Contact.company.ilike(f"{q}%"),
-                        Contact.company.isnot(None)
-                    )
-                ).limit(limit - len(suggestions))
-                
-                result = await db.execute(company_query)
-                companies = [row[0] for row in result.fetchall() if row[0]]
-                suggestions.extend([{"type": "company", "value": company} for company in companies])
-        
-        elif entity == "products":
-            # Get product name and SKU suggestions
-            from sqlalchemy import select, distinct
-            
-            # Product name suggestions
-            name_query = select(distinct(Product.name)).where(
-                and_(
-                    Product.company_id == tenant_context.company_id,
-                    Product.name.ilike(f"{q}%")
-                )
-            ).limit(limit)
-            
-            result = await db.execute(name_query)
-            names = [row[0] for row in result.fetchall() if row[0]]
-            suggestions.extend([{"type": "name", "value": name} for name in names])
-            
-            # SKU suggestions
-            if len(suggestions) < limit:
-                sku_query = select(distinct(Product.sku)).where(
-                    and_(
-                        Product.company_id == tenant_context.company_id,
-                        Product.sku.ilike(f"{q}%")
-                    )
-                ).limit(limit - len(suggestions))
-                
-                result = await db.execute(sku_query)
-                skus = [row[0] for row in result.fetchall() if row[0]]
-                suggestions.extend([{"type": "sku", "value": sku} for sku in skus])
-        
+        suggestions = await suggestion_index.suggest(
+            db, str(tenant_context.company_id), entity, q, limit
+        )
         return {
-            "suggestions": suggestions[:limit],
+            "suggestions": suggestions,
             "query": q,
             "entity": entity
         }
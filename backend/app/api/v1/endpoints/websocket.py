@@ -7,19 +7,32 @@ Handles stock changes, order updates, notifications, and user activities.
 import json
 import asyncio
 import logging
-from typing import Dict, Set, Optional, List
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Set, Optional, List, Tuple, Union
 from datetime import datetime
 import uuid
 
+try:
+    import msgpack
+except ImportError:  # MessagePack frames are offered only when installed
+    msgpack = None
+
 from fastapi import WebSocket, WebSocketDisconnect, Depends, HTTPException
 from fastapi.routing import APIRouter
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ....core.config import settings
 from ....core.database import get_db
+from ....core.metrics import (
+    WEBSOCKET_CONNECTIONS, WEBSOCKET_DROPPED_MESSAGES, WEBSOCKET_QUEUED_MESSAGES, WEBSOCKET_TENANTS
+)
 from ....core.dependencies import get_current_user, get_current_tenant_context
 from ....core.tenant_context import TenantContext
 from ....models.user import User
-from app.services.realtime_service import get_realtime_service, RealtimeService, RealtimeEvent
+from app.services.realtime_service import (
+    get_realtime_service, RealtimeService, RealtimeEvent, RealtimeHub, EventTypes, realtime_hub,
+    stream_id_key
+)
 from ....services.tenant_service import TenantAwareService
 
 logger = logging.getLogger(__name__)
@@ -27,35 +40,421 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+class WireFormat:
+    """How messages are encoded on a WebSocket"""
+    
+    def __init__(self, name: str, binary: bool, encode: Callable[[dict], Union[str, bytes]],
+                 decode: Callable[[Union[str, bytes]], Any]):
+        self.name = name
+        self.binary = binary
+        self.encode = encode
+        self.decode = decode
+    
+    @property
+    def subprotocol(self) -> str:
+        return f"elevatecrm.{self.name}"
+
+
+JSON_FORMAT = WireFormat("json", False, json.dumps, json.loads)
+WIRE_FORMATS: Dict[str, WireFormat] = {"json": JSON_FORMAT}
+if msgpack is not None:
+    WIRE_FORMATS["msgpack"] = WireFormat(
+        "msgpack", True, lambda message: msgpack.packb(message, use_bin_type=True), msgpack.unpackb
+    )
+
+
+def negotiate_wire_format(websocket: WebSocket, requested: Optional[str] = None) -> Tuple[WireFormat, Optional[str]]:
+    """
+    Pick the wire format for a new connection
+    
+    Clients either pass ``?format=msgpack`` or offer ``elevatecrm.<format>``
+    subprotocols in preference order. Returns the format and the subprotocol
+    to accept, if one was offered. Unknown or unavailable formats fall back
+    to JSON.
+    """
+    offered = [
+        protocol.strip()
+        for protocol in websocket.headers.get("sec-websocket-protocol", "").split(",")
+        if protocol.strip()
+    ]
+    for protocol in offered:
+        if not protocol.startswith("elevatecrm."):
+            continue
+        name = protocol[len("elevatecrm."):]
+        if name in WIRE_FORMATS:
+            return WIRE_FORMATS[name], protocol
+    return WIRE_FORMATS.get((requested or "").lower(), JSON_FORMAT), None
+
+
+def negotiated_compression(websocket: WebSocket) -> Optional[str]:
+    """
+    permessage-deflate is negotiated by the server itself (uvicorn's
+    ws_per_message_deflate) when the client offers it; this only reports it
+    """
+    extensions = websocket.headers.get("sec-websocket-extensions", "")
+    if settings.WEBSOCKET_PER_MESSAGE_DEFLATE and "permessage-deflate" in extensions:
+        return "permessage-deflate"
+    return None
+
+
+class OutboundMessage:
+    """A message encoded lazily, at most once per wire format, and shared by all recipients"""
+    
+    __slots__ = ("message", "_encoded")
+    
+    def __init__(self, message: dict):
+        self.message = message
+        self._encoded: Dict[str, Union[str, bytes]] = {}
+    
+    def encode(self, wire_format: WireFormat) -> Union[str, bytes]:
+        payload = self._encoded.get(wire_format.name)
+        if payload is None:
+            payload = self._encoded[wire_format.name] = wire_format.encode(self.message)
+        return payload
+
+
+class ClientConnection:
+    """
+    A WebSocket plus a bounded outbound queue drained by its own writer task.
+    
+    Broadcasts only enqueue pre-serialized payloads, so one slow client can
+    never stall delivery to the rest of its tenant. When the queue is full a
+    message with the same coalesce key replaces the queued one; otherwise the
+    oldest queued message is dropped.
+    """
+    
+    def __init__(self, websocket: WebSocket, connection_id: str,
+                 max_queue_size: int = settings.WEBSOCKET_QUEUE_SIZE,
+                 send_timeout: float = settings.WEBSOCKET_SEND_TIMEOUT,
+                 wire_format: WireFormat = JSON_FORMAT):
+        self.websocket = websocket
+        self.connection_id = connection_id
+        self.wire_format = wire_format
+        self.max_queue_size = max_queue_size
+        self.send_timeout = send_timeout
+        self.queue: Deque[Tuple[Optional[str], Union[str, bytes]]] = deque()
+        self.dropped = 0
+        self.closed = False
+        # While replaying missed events, live messages wait here: (stream_id, coalesce_key, payload)
+        self._held: Optional[List[Tuple[Optional[str], Optional[str], Union[str, bytes]]]] = None
+        self._ready = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+    
+    def start(self, on_failure: Callable[[str], None]):
+        """Start the writer task"""
+        self._writer = asyncio.create_task(self._drain(on_failure))
+    
+    def close(self):
+        """Stop the writer task and discard pending messages"""
+        self.closed = True
+        self.queue.clear()
+        if self._writer and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+    
+    def hold(self):
+        """Park live messages until release(), e.g. while missed events are replayed"""
+        if self._held is None:
+            self._held = []
+    
+    def release(self) -> List[Tuple[Optional[str], Optional[str], Union[str, bytes]]]:
+        """Stop holding and return the parked (stream_id, coalesce_key, payload) entries"""
+        held, self._held = self._held or [], None
+        return held
+    
+    def enqueue(self, payload: Union[OutboundMessage, str, bytes], coalesce_key: Optional[str] = None,
+                stream_id: Optional[str] = None) -> bool:
+        """Queue a message without waiting for the socket"""
+        if self.closed:
+            return False
+        
+        if isinstance(payload, OutboundMessage):
+            payload = payload.encode(self.wire_format)
+        
+        if self._held is not None:
+            self._held.append((stream_id, coalesce_key, payload))
+            return True
+        
+        if len(self.queue) >= self.max_queue_size:
+            if coalesce_key is not None:
+                for index, (key, _) in enumerate(self.queue):
+                    if key == coalesce_key:
+                        self.queue[index] = (coalesce_key, payload)
+                        return True
+            self.queue.popleft()
+            self.dropped += 1
+            WEBSOCKET_DROPPED_MESSAGES.inc()
+        
+        self.queue.append((coalesce_key, payload))
+        self._ready.set()
+        return True
+    
+    async def _drain(self, on_failure: Callable[[str], None]):
+        """Send queued payloads in order, each bounded by the send timeout"""
+        try:
+            while True:
+                await self._ready.wait()
+                while self.queue:
+                    _, payload = self.queue.popleft()
+                    if isinstance(payload, bytes):
+                        send = self.websocket.send_bytes(payload)
+                    else:
+                        send = self.websocket.send_text(payload)
+                    await asyncio.wait_for(send, self.send_timeout)
+                self._ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to send message to {self.connection_id}: {e}")
+            self.closed = True
+            on_failure(self.connection_id)
+            # Tell the client to reconnect rather than leave the socket open but unserved
+            if isinstance(e, asyncio.TimeoutError):
+                code, reason = 1013, "Client too slow"
+            else:
+                code, reason = 1011, "Send failed"
+            try:
+                await asyncio.wait_for(self.websocket.close(code=code, reason=reason), self.send_timeout)
+            except Exception:
+                pass
+
+
+def _coalesce_key(event: RealtimeEvent) -> Optional[str]:
+    """Key under which a newer event supersedes a queued older one"""
+    if event.event_type == EventTypes.DASHBOARD_REFRESH:
+        return event.event_type
+    
+    entity_keys = {
+        EventTypes.STOCK_UPDATE: "product_id",
+        EventTypes.ORDER_UPDATE: "order_id",
+        EventTypes.PRODUCT_UPDATE: "product_id",
+        EventTypes.CONTACT_UPDATE: "contact_id",
+    }
+    field = entity_keys.get(event.event_type)
+    if field and event.data.get(field):
+        # A product-wide stock update only supersedes one touching the same locations
+        locations = ",".join(sorted(_event_values(event, "location_id"))) or None
+        return f"{event.event_type}:{event.data[field]}:{locations}"
+    return None
+
+
+def _event_values(event: RealtimeEvent, field: str) -> List[str]:
+    """
+    Values of a filterable field on an event
+    
+    Product-wide stock updates have no location_id of their own; they match
+    every location listed in their per-location changes.
+    """
+    value = event.data.get(field)
+    if value is not None:
+        return [str(value)]
+    if field == "location_id":
+        return [str(entry["location_id"]) for entry in event.data.get("locations") or ()]
+    return []
+
+
+# Event fields clients may filter on, per event type
+FILTERABLE_FIELDS: Dict[str, Tuple[str, ...]] = {
+    EventTypes.STOCK_UPDATE: ("product_id", "location_id"),
+    EventTypes.ORDER_UPDATE: ("order_id",),
+    EventTypes.PRODUCT_UPDATE: ("product_id",),
+    EventTypes.CONTACT_UPDATE: ("contact_id",),
+    EventTypes.USER_ACTIVITY: ("user_id",),
+}
+MAX_FILTER_VALUES = 1000
+
+
+class SubscriptionIndex:
+    """
+    Routes a tenant's events to the connections that subscribed to them
+    
+    Connections that never subscribed receive everything. Otherwise a
+    connection is indexed under each whole event type it asked for, and under
+    (event type, field, value) for entity filters, so routing an event is a
+    few set lookups regardless of how many sockets the tenant has open.
+    """
+    
+    def __init__(self):
+        # tenant_id -> connection ids without a subscription
+        self.unfiltered: Dict[str, Set[str]] = {}
+        # tenant_id -> event_type -> connection ids
+        self.by_type: Dict[str, Dict[str, Set[str]]] = {}
+        # tenant_id -> (event_type, field, value) -> {connection_id: other field predicates}
+        self.by_entity: Dict[str, Dict[Tuple[str, str, str], Dict[str, Dict[str, frozenset]]]] = {}
+        # connection_id -> (tenant_id, index keys it is registered under)
+        self._entries: Dict[str, Tuple[str, List[Tuple]]] = {}
+    
+    def add(self, tenant_id: str, connection_id: str):
+        """Register a connection that receives every event until it subscribes"""
+        self.remove(connection_id)
+        self.unfiltered.setdefault(tenant_id, set()).add(connection_id)
+        self._entries[connection_id] = (tenant_id, [("all",)])
+    
+    def subscribe(self, tenant_id: str, connection_id: str, event_types: Set[str],
+                  filters: Dict[str, Dict[str, frozenset]]):
+        """Replace a connection's subscription; no types and no filters means everything"""
+        if not event_types and not filters:
+            self.add(tenant_id, connection_id)
+            return
+        
+        self.remove(connection_id)
+        keys: List[Tuple] = []
+        for event_type in event_types:
+            self.by_type.setdefault(tenant_id, {}).setdefault(event_type, set()).add(connection_id)
+            keys.append(("type", event_type))
+        
+        for event_type, predicates in filters.items():
+            if event_type in event_types:
+                continue
+            # Index on the first field; the remaining ones are checked per candidate
+            field = next(name for name in FILTERABLE_FIELDS[event_type] if name in predicates)
+            rest = {name: values for name, values in predicates.items() if name != field}
+            for value in predicates[field]:
+                key = (event_type, field, value)
+                self.by_entity.setdefault(tenant_id, {}).setdefault(key, {})[connection_id] = rest
+                keys.append(("entity", key))
+        
+        self._entries[connection_id] = (tenant_id, keys)
+    
+    def remove(self, connection_id: str):
+        entry = self._entries.pop(connection_id, None)
+        if entry is None:
+            return
+        tenant_id, keys = entry
+        for key in keys:
+            if key[0] == "all":
+                self._discard(self.unfiltered, tenant_id, connection_id)
+            elif key[0] == "type":
+                by_type = self.by_type.get(tenant_id, {})
+                self._discard(by_type, key[1], connection_id)
+                if not by_type:
+                    self.by_type.pop(tenant_id, None)
+            else:
+                by_entity = self.by_entity.get(tenant_id, {})
+                subscribers = by_entity.get(key[1], {})
+                subscribers.pop(connection_id, None)
+                if not subscribers:
+                    by_entity.pop(key[1], None)
+                if not by_entity:
+                    self.by_entity.pop(tenant_id, None)
+    
+    @staticmethod
+    def _discard(index: Dict[str, Set[str]], key: str, connection_id: str):
+        members = index.get(key)
+        if members is not None:
+            members.discard(connection_id)
+            if not members:
+                del index[key]
+    
+    def targets(self, event: RealtimeEvent) -> Set[str]:
+        """Connection ids that should receive an event"""
+        tenant_id = event.tenant_id
+        targets = set(self.unfiltered.get(tenant_id, ()))
+        targets.update(self.by_type.get(tenant_id, {}).get(event.event_type, ()))
+        
+        by_entity = self.by_entity.get(tenant_id)
+        if by_entity:
+            for field in FILTERABLE_FIELDS.get(event.event_type, ()):
+                for value in _event_values(event, field):
+                    for connection_id, rest in by_entity.get((event.event_type, field, value), {}).items():
+                        if all(
+                            any(other in values for other in _event_values(event, name))
+                            for name, values in rest.items()
+                        ):
+                            targets.add(connection_id)
+        return targets
+
+
+def parse_subscription(data: dict) -> Tuple[Set[str], Dict[str, Dict[str, frozenset]]]:
+    """
+    Validate a subscribe message into (event types, entity filters)
+    
+    ``{"event_types": ["order_update"], "filters": {"stock_update": {"product_id": ["X", "Y"]}}}``
+    subscribes to every order update plus stock updates for products X and Y.
+    """
+    known = set(FILTERABLE_FIELDS) | {EventTypes.NOTIFICATION, EventTypes.DASHBOARD_REFRESH}
+    
+    event_types = data.get("event_types") or []
+    if not isinstance(event_types, list):
+        raise ValueError("event_types must be a list")
+    unknown = set(map(str, event_types)) - known
+    if unknown:
+        raise ValueError(f"Unknown event types: {sorted(unknown)}")
+    
+    filters: Dict[str, Dict[str, frozenset]] = {}
+    for event_type, predicates in (data.get("filters") or {}).items():
+        fields = FILTERABLE_FIELDS.get(event_type)
+        if not fields:
+            raise ValueError(f"Event type {event_type!r} does not support filters")
+        if not isinstance(predicates, dict) or not predicates:
+            raise ValueError(f"Filters for {event_type!r} must map fields to value lists")
+        
+        parsed = {}
+        for field, values in predicates.items():
+            if field not in fields:
+                raise ValueError(f"Cannot filter {event_type!r} on {field!r}")
+            if not isinstance(values, list) or not values or len(values) > MAX_FILTER_VALUES:
+                raise ValueError(f"{event_type}.{field} needs 1-{MAX_FILTER_VALUES} values")
+            parsed[field] = frozenset(str(value) for value in values)
+        filters[event_type] = parsed
+    
+    return set(event_types), filters
+
+
+def _event_message(event: RealtimeEvent, replayed: bool = False) -> dict:
+    """WebSocket message for a real-time event"""
+    message = {
+        "type": "realtime_event",
+        "event_type": event.event_type,
+        "data": event.data,
+        "timestamp": event.timestamp.isoformat(),
+        "event_id": event.event_id,
+        "stream_id": event.stream_id
+    }
+    if replayed:
+        message["replayed"] = True
+    return message
+
+
 class ConnectionManager:
     """Manages WebSocket connections with tenant isolation"""
     
-    def __init__(self):
-        # Active connections: tenant_id -> {user_id -> {connection_id -> websocket}}
-        self.active_connections: Dict[str, Dict[str, Dict[str, WebSocket]]] = {}
+    def __init__(self, hub: Optional[RealtimeHub] = None):
+        # Shared Redis subscriber that feeds events for locally connected tenants
+        self.hub = hub
+        # Active connections: tenant_id -> {user_id -> {connection_id -> ClientConnection}}
+        self.active_connections: Dict[str, Dict[str, Dict[str, ClientConnection]]] = {}
         # Connection metadata: connection_id -> {user_id, tenant_id, connected_at}
         self.connection_metadata: Dict[str, Dict] = {}
+        # Which connections each event should reach
+        self.subscriptions = SubscriptionIndex()
         
     def generate_connection_id(self) -> str:
         """Generate unique connection ID"""
         return str(uuid.uuid4())
     
-    async def connect(self, websocket: WebSocket, user_id: str, tenant_id: str) -> str:
+    async def connect(self, websocket: WebSocket, user_id: str, tenant_id: str,
+                      wire_format: WireFormat = JSON_FORMAT, subprotocol: Optional[str] = None) -> str:
         """Accept new WebSocket connection"""
-        await websocket.accept()
+        await websocket.accept(subprotocol=subprotocol)
         
         connection_id = self.generate_connection_id()
         
         # Initialize tenant connections if needed
         if tenant_id not in self.active_connections:
             self.active_connections[tenant_id] = {}
+            if self.hub:
+                self.hub.add_listener(tenant_id, self.dispatch_event)
         
         # Initialize user connections if needed
         if user_id not in self.active_connections[tenant_id]:
             self.active_connections[tenant_id][user_id] = {}
         
-        # Store connection
-        self.active_connections[tenant_id][user_id][connection_id] = websocket
+        # Store connection and start its writer
+        connection = ClientConnection(websocket, connection_id, wire_format=wire_format)
+        connection.start(self.disconnect)
+        self.active_connections[tenant_id][user_id][connection_id] = connection
+        
+        self.subscriptions.add(tenant_id, connection_id)
         
         # Store metadata
         self.connection_metadata[connection_id] = {
@@ -82,7 +481,8 @@ class ConnectionManager:
             user_id in self.active_connections[tenant_id] and 
             connection_id in self.active_connections[tenant_id][user_id]):
             
-            del self.active_connections[tenant_id][user_id][connection_id]
+            connection = self.active_connections[tenant_id][user_id].pop(connection_id)
+            connection.close()
             
             # Clean up empty structures
             if not self.active_connections[tenant_id][user_id]:
@@ -90,50 +490,127 @@ class ConnectionManager:
                 
             if not self.active_connections[tenant_id]:
                 del self.active_connections[tenant_id]
+                if self.hub:
+                    self.hub.remove_listener(tenant_id, self.dispatch_event)
         
-        # Remove metadata
+        # Remove metadata and subscriptions
         del self.connection_metadata[connection_id]
+        self.subscriptions.remove(connection_id)
         
         logger.info(f"❌ WebSocket disconnected: user={user_id}, tenant={tenant_id}, conn={connection_id}")
     
+    def _get_connection(self, connection_id: str) -> Optional[ClientConnection]:
+        metadata = self.connection_metadata.get(connection_id)
+        if not metadata:
+            return None
+        return (self.active_connections.get(metadata["tenant_id"], {})
+                .get(metadata["user_id"], {})
+                .get(connection_id))
+    
+    async def send_to_connection(self, connection_id: str, message: dict):
+        """Send message to a single connection"""
+        connection = self._get_connection(connection_id)
+        if connection:
+            connection.enqueue(OutboundMessage(message))
+    
     async def send_to_user(self, tenant_id: str, user_id: str, message: dict):
         """Send message to all connections of a specific user"""
         if (tenant_id not in self.active_connections or 
             user_id not in self.active_connections[tenant_id]):
             return
         
-        connections = self.active_connections[tenant_id][user_id]
-        disconnected = []
-        
-        for connection_id, websocket in connections.items():
-            try:
-                await websocket.send_text(json.dumps(message))
-            except Exception as e:
-                logger.error(f"Failed to send message to {connection_id}: {e}")
-                disconnected.append(connection_id)
-        
-        # Clean up disconnected connections
-        for connection_id in disconnected:
-            self.disconnect(connection_id)
+        payload = OutboundMessage(message)
+        for connection in self.active_connections[tenant_id][user_id].values():
+            connection.enqueue(payload)
     
-    async def send_to_tenant(self, tenant_id: str, message: dict, exclude_user: Optional[str] = None):
+    async def send_to_tenant(self, tenant_id: str, message: dict, exclude_user: Optional[str] = None,
+                             coalesce_key: Optional[str] = None):
         """Send message to all users in a tenant"""
         if tenant_id not in self.active_connections:
             return
         
-        for user_id in list(self.active_connections[tenant_id].keys()):
-            if exclude_user and user_id == exclude_user:
-                continue
-                
-            await self.send_to_user(tenant_id, user_id, message)
+        # Serialize once per wire format and hand the same payload to every writer
+        payload = OutboundMessage(message)
+        self._enqueue_tenant(tenant_id, payload, exclude_user, coalesce_key, message.get("stream_id"))
     
     async def broadcast(self, message: dict, exclude_tenant: Optional[str] = None):
         """Send message to all connected users across all tenants"""
+        payload = OutboundMessage(message)
         for tenant_id in list(self.active_connections.keys()):
             if exclude_tenant and tenant_id == exclude_tenant:
                 continue
                 
-            await self.send_to_tenant(tenant_id, message)
+            self._enqueue_tenant(tenant_id, payload)
+    
+    def _enqueue_tenant(self, tenant_id: str, payload: OutboundMessage, exclude_user: Optional[str] = None,
+                        coalesce_key: Optional[str] = None, stream_id: Optional[str] = None):
+        for user_id, connections in self.active_connections.get(tenant_id, {}).items():
+            if exclude_user and user_id == exclude_user:
+                continue
+            for connection in connections.values():
+                connection.enqueue(payload, coalesce_key, stream_id)
+    
+    async def dispatch_event(self, event: RealtimeEvent):
+        """Forward a real-time event from the hub to the tenant's subscribed sockets"""
+        targets = self.subscriptions.targets(event)
+        if not targets:
+            return
+        
+        # Serialize once per wire format and hand the same payload to every writer
+        payload = OutboundMessage(_event_message(event))
+        coalesce_key = _coalesce_key(event)
+        for connection_id in targets:
+            connection = self._get_connection(connection_id)
+            if connection:
+                connection.enqueue(payload, coalesce_key, event.stream_id)
+    
+    def subscribe(self, connection_id: str, event_types: Set[str],
+                  filters: Dict[str, Dict[str, frozenset]]):
+        """Replace the events a connection receives"""
+        metadata = self.connection_metadata.get(connection_id)
+        if metadata:
+            self.subscriptions.subscribe(metadata["tenant_id"], connection_id, event_types, filters)
+    
+    async def replay(self, connection_id: str, last_event_id: str, realtime_service: RealtimeService):
+        """
+        Send a reconnecting client the events it missed, then resume the live tail
+        
+        Live events that arrive during the stream read are held back and
+        delivered afterwards, minus any the replay already covered. If the
+        gap cannot be replayed in full the client is told to resync.
+        """
+        connection = self._get_connection(connection_id)
+        if not connection:
+            return
+        tenant_id = self.connection_metadata[connection_id]["tenant_id"]
+        
+        connection.hold()
+        try:
+            events, complete = await realtime_service.read_events_since(
+                tenant_id, last_event_id, min(settings.REALTIME_REPLAY_LIMIT, connection.max_queue_size)
+            )
+        except Exception as e:
+            logger.warning(f"Event replay failed for {connection_id}: {e}")
+            events, complete = [], False
+        finally:
+            held = connection.release()
+        
+        if not complete:
+            connection.enqueue(OutboundMessage({
+                "type": "resync_required",
+                "last_event_id": last_event_id,
+                "timestamp": datetime.utcnow().isoformat()
+            }))
+        
+        replayed_through = stream_id_key(last_event_id) if complete else None
+        for event in events:
+            connection.enqueue(OutboundMessage(_event_message(event, replayed=True)))
+            replayed_through = stream_id_key(event.stream_id)
+        
+        for stream_id, coalesce_key, payload in held:
+            if stream_id and replayed_through and stream_id_key(stream_id) <= replayed_through:
+                continue
+            connection.enqueue(payload, coalesce_key, stream_id)
     
     def get_tenant_user_count(self, tenant_id: str) -> int:
         """Get number of connected users for a tenant"""
@@ -145,6 +622,15 @@ class ConnectionManager:
         """Get total number of active connections"""
         return len(self.connection_metadata)
     
+    def get_queued_messages(self) -> int:
+        """Get number of messages waiting across all outbound queues"""
+        return sum(
+            len(connection.queue)
+            for users in self.active_connections.values()
+            for connections in users.values()
+            for connection in connections.values()
+        )
+    
     def get_user_connections(self, tenant_id: str, user_id: str) -> int:
         """Get number of connections for a specific user"""
         if (tenant_id not in self.active_connections or 
@@ -154,7 +640,11 @@ class ConnectionManager:
 
 
 # Global connection manager
-connection_manager = ConnectionManager()
+connection_manager = ConnectionManager(realtime_hub)
+
+WEBSOCKET_CONNECTIONS.set_function(connection_manager.get_total_connections)
+WEBSOCKET_TENANTS.set_function(lambda: len(connection_manager.active_connections))
+WEBSOCKET_QUEUED_MESSAGES.set_function(connection_manager.get_queued_messages)
 
 
 async def get_websocket_auth(
@@ -204,9 +694,19 @@ async def get_websocket_auth(
 async def websocket_endpoint(
     websocket: WebSocket,
     token: Optional[str] = None,
+    last_event_id: Optional[str] = None,
+    format: Optional[str] = None,
     realtime_service: RealtimeService = Depends(get_realtime_service)
 ):
-    """Main WebSocket endpoint for real-time communication"""
+    """
+    Main WebSocket endpoint for real-time communication
+    
+    Clients reconnecting after a drop pass the ``stream_id`` of the last event
+    they processed as ``last_event_id`` to receive only what they missed.
+    Messages are JSON text frames unless the client asks for MessagePack
+    binary frames with ``format=msgpack`` or the ``elevatecrm.msgpack``
+    subprotocol; either can be combined with permessage-deflate.
+    """
     user = None
     tenant_context = None
     connection_id = None
@@ -216,37 +716,44 @@ async def websocket_endpoint(
         user, tenant_context = await get_websocket_auth(websocket, token)
         
         # Connect to manager
+        wire_format, subprotocol = negotiate_wire_format(websocket, format)
         connection_id = await connection_manager.connect(
             websocket, 
             user.id, 
-            tenant_context.tenant_id
+            tenant_context.tenant_id,
+            wire_format=wire_format,
+            subprotocol=subprotocol
         )
         
         # Send connection confirmation
-        await websocket.send_text(json.dumps({
+        await connection_manager.send_to_connection(connection_id, {
             "type": "connection_established",
             "connection_id": connection_id,
             "user_id": user.id,
             "tenant_id": tenant_context.tenant_id,
+            "format": wire_format.name,
+            "compression": negotiated_compression(websocket),
             "timestamp": datetime.utcnow().isoformat()
-        }))
-        
-        # Start listening for real-time events from Redis
-        asyncio.create_task(
-            listen_for_events(
-                realtime_service, 
-                tenant_context.tenant_id, 
-                user.id, 
-                connection_id
-            )
-        )
+        })
+        
+        # Real-time events arrive through the shared per-process hub
+        await realtime_hub.start()
+        
+        # Catch a reconnecting client up before the live tail
+        if last_event_id:
+            await connection_manager.replay(connection_id, last_event_id, realtime_service)
         
         # Keep connection alive and handle incoming messages
         while True:
             try:
-                # Wait for messages from client
-                message = await websocket.receive_text()
-                data = json.loads(message)
+                # Wait for messages from client; binary frames use the negotiated format
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+                if message.get("bytes") is not None:
+                    data = wire_format.decode(message["bytes"])
+                else:
+                    data = json.loads(message["text"])
                 
                 # Handle different message types
                 await handle_client_message(
@@ -262,11 +769,11 @@ async def websocket_endpoint(
                 break
             except Exception as e:
                 logger.error(f"Error handling WebSocket message: {e}")
-                await websocket.send_text(json.dumps({
+                await connection_manager.send_to_connection(connection_id, {
                     "type": "error",
                     "message": "Failed to process message",
                     "timestamp": datetime.utcnow().isoformat()
-                }))
+                })
     
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected during setup")
@@ -303,20 +810,30 @@ async def handle_client_message(
         )
     
     elif message_type == "subscribe":
-        # Handle subscription to specific event types
-        event_types = data.get("event_types", [])
-        logger.info(f"User {user.id} subscribing to events: {event_types}")
+        # Only the subscribed event types (and entities) are sent from now on
+        try:
+            event_types, filters = parse_subscription(data)
+        except ValueError as e:
+            await connection_manager.send_to_connection(connection_id, {
+                "type": "subscription_rejected",
+                "reason": str(e),
+                "timestamp": datetime.utcnow().isoformat()
+            })
+            return
+        
+        connection_manager.subscribe(connection_id, event_types, filters)
+        logger.debug(f"Connection {connection_id} subscribed to {sorted(event_types)} filters={list(filters)}")
         
         # Send confirmation
-        await connection_manager.send_to_user(
-            tenant_context.tenant_id,
-            user.id,
-            {
-                "type": "subscription_confirmed",
-                "event_types": event_types,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-        )
+        await connection_manager.send_to_connection(connection_id, {
+            "type": "subscription_confirmed",
+            "event_types": sorted(event_types),
+            "filters": {
+                event_type: {field: sorted(values) for field, values in predicates.items()}
+                for event_type, predicates in filters.items()
+            },
+            "timestamp": datetime.utcnow().isoformat()
+        })
     
     elif message_type == "activity":
         # Handle user activity tracking
@@ -333,47 +850,6 @@ async def handle_client_message(
         logger.warning(f"Unknown message type: {message_type}")
 
 
-async def listen_for_events(
-    realtime_service: RealtimeService,
-    tenant_id: str,
-    user_id: str,
-    connection_id: str
-):
-    """Listen for Redis events and forward to WebSocket"""
-    try:
-        async def event_callback(event: RealtimeEvent):
-            """Callback for real-time events"""
-            message = {
-                "type": "realtime_event",
-                "event_type": event.event_type,
-                "data": event.data,
-                "timestamp": event.timestamp.isoformat(),
-                "event_id": event.event_id
-            }
-            
-            await connection_manager.send_to_user(tenant_id, user_id, message)
-        
-        # Subscribe to all event types for this tenant
-        event_types = [
-            "stock_update",
-            "order_update", 
-            "user_activity",
-            "notification",
-            "contact_update",
-            "product_update",
-            "dashboard_refresh"
-        ]
-        
-        await realtime_service.subscribe_to_tenant_events(
-            tenant_id,
-            event_types,
-            event_callback
-        )
-        
-    except Exception as e:
-        logger.error(f"Error in event listener for {connection_id}: {e}")
-
-
 # Health check endpoint for WebSocket status
 @router.get("/ws/health")
 async def websocket_health():
@@ -3,17 +3,24 @@ TECHGURU ElevateCRM Authentication Configuration
 
 Handles OIDC authentication with Keycloak integration.
 """
+import asyncio
+import hashlib
+import logging
 import os
+import time
+from collections import OrderedDict
 from typing import Optional, Dict, Any
 from datetime import datetime, timezone
 import jwt
-from jwt import PyJWK, PyJWKClient
+from jwt import PyJWK
 import httpx
-from fastapi import HTTPException, status
+from fastapi import HTTPException, Request, status
 from pydantic import BaseModel
 
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 
 class AuthConfig:
     """Authentication configuration"""
@@ -35,8 +42,11 @@ class AuthConfig:
         self.verify_exp = os.getenv("JWT_VERIFY_EXP", "true").lower() == "true"
         self.verify_aud = os.getenv("JWT_VERIFY_AUD", "false").lower() == "true"
         
-        # JWK Client for token verification
-        self.jwks_client = PyJWKClient(self.jwks_uri) if self.verify_signature else None
+        # Verified-token cache and JWKS refresh
+        self.token_cache_size = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+        self.token_cache_max_ttl = float(os.getenv("JWT_CACHE_MAX_TTL", "300"))
+        self.jwks_refresh_interval = float(os.getenv("JWKS_REFRESH_INTERVAL", "600"))
+        self.jwks_min_refresh_interval = float(os.getenv("JWKS_MIN_REFRESH_INTERVAL", "30"))
 
 
 class UserProfile(BaseModel):
@@ -77,9 +87,144 @@ class UserProfile(BaseModel):
         return self.name or self.display_name
 
 
+class JWKSCache:
+    """
+    Realm signing keys, fetched asynchronously and refreshed in the background
+
+    Keys are loaded at startup and re-fetched on an interval, so token
+    validation normally never waits on Keycloak. A token signed with an
+    unknown key ID triggers one shared refresh, rate limited so that forged
+    key IDs cannot be used to hammer the JWKS endpoint.
+    """
+
+    def __init__(self, jwks_uri: str, refresh_interval: float, min_refresh_interval: float):
+        self.jwks_uri = jwks_uri
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self.keys: Dict[Optional[str], PyJWK] = {}
+        self._last_attempt = float("-inf")
+        self._refreshing: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self):
+        """Fetch the key set and replace the cached keys"""
+        self._last_attempt = time.monotonic()
+        async with httpx.AsyncClient() as client:
+            response = await client.get(self.jwks_uri, timeout=5.0)
+            response.raise_for_status()
+
+        keys = {}
+        for data in response.json().get("keys", []):
+            if data.get("use", "sig") != "sig":
+                continue
+            try:
+                key = PyJWK(data)
+            except jwt.PyJWTError as e:
+                logger.debug(f"Skipping unusable JWKS key {data.get('kid')}: {e}")
+                continue
+            keys[key.key_id] = key
+        self.keys = keys
+        logger.debug(f"Loaded {len(keys)} JWKS signing keys")
+
+    def _refresh_once(self) -> asyncio.Task:
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.get_running_loop().create_task(self.refresh())
+        return self._refreshing
+
+    async def get_signing_key(self, kid: Optional[str]) -> PyJWK:
+        """Signing key for a token's key ID"""
+        key = self.keys.get(kid)
+        if key is None and kid is None and len(self.keys) == 1:
+            key = next(iter(self.keys.values()))
+
+        if key is None and time.monotonic() - self._last_attempt >= self.min_refresh_interval:
+            await asyncio.shield(self._refresh_once())
+            key = self.keys.get(kid)
+
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key: {kid}")
+        return key
+
+    async def start(self):
+        """Load keys and keep them fresh until stop()"""
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.warning(f"Initial JWKS fetch failed: {e}")
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self._refresh_once()
+            except Exception as e:
+                logger.warning(f"JWKS refresh failed: {e}")
+
+
+class VerifiedTokenCache:
+    """
+    LRU of validated tokens keyed by SHA-256 of the token
+
+    An entry never outlives the token's own exp claim, and is additionally
+    capped at max_ttl so revocations in Keycloak are picked up eventually.
+    """
+
+    def __init__(self, max_size: int, max_ttl: float):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self._entries: "OrderedDict[bytes, tuple[UserProfile, float]]" = OrderedDict()
+
+    @staticmethod
+    def token_hash(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[UserProfile]:
+        key = self.token_hash(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        profile, expires_at = entry
+        if time.time() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return profile
+
+    def put(self, token: str, profile: UserProfile, verify_exp: bool = True):
+        expires_at = time.time() + self.max_ttl
+        if verify_exp:
+            expires_at = min(expires_at, profile.exp)
+        key = self.token_hash(token)
+        self._entries[key] = (profile, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
 # Global auth config instance
 auth_config = AuthConfig()
 
+jwks_cache = JWKSCache(
+    auth_config.jwks_uri,
+    auth_config.jwks_refresh_interval,
+    auth_config.jwks_min_refresh_interval
+)
+token_cache = VerifiedTokenCache(auth_config.token_cache_size, auth_config.token_cache_max_ttl)
+
 
 async def validate_jwt_token(token: str) -> UserProfile:
     """
@@ -94,15 +239,19 @@ async def validate_jwt_token(token: str) -> UserProfile:
     Raises:
         HTTPException: If token is invalid
     """
+    profile = token_cache.get(token)
+    if profile is not None:
+        return profile
+
     try:
         # Decode token header to get key ID
         unverified_header = jwt.get_unverified_header(token)
         
         # Get signing key
         signing_key = None
-        if auth_config.verify_signature and auth_config.jwks_client:
+        if auth_config.verify_signature:
             try:
-                signing_key = auth_config.jwks_client.get_signing_key_from_jwt(token)
+                signing_key = await jwks_cache.get_signing_key(unverified_header.get("kid"))
             except Exception as e:
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -177,6 +326,7 @@ async def validate_jwt_token(token: str) -> UserProfile:
             auth_time=payload.get("auth_time")
         )
         
+        token_cache.put(token, profile, verify_exp=auth_config.verify_exp)
         return profile
         
     except jwt.ExpiredSignatureError:
@@ -196,6 +346,24 @@ async def validate_jwt_token(token: str) -> UserProfile:
         )
 
 
+async def authenticate_request(request: Request, token: str) -> UserProfile:
+    """
+    Validate a request's bearer token at most once per request
+    
+    The profile is kept on request.state, so the tenant middleware and the
+    auth dependencies share a single validation.
+    """
+    token_hash = VerifiedTokenCache.token_hash(token)
+    profile = getattr(request.state, "user", None)
+    if profile is not None and getattr(request.state, "user_token_hash", None) == token_hash:
+        return profile
+    
+    profile = await validate_jwt_token(token)
+    request.state.user = profile
+    request.state.user_token_hash = token_hash
+    return profile
+
+
 async def get_keycloak_user_info(access_token: str) -> Dict[str, Any]:
     """
     Get user info from Keycloak userinfo endpoint
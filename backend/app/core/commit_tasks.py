@@ -0,0 +1,57 @@
+"""
+TECHGURU ElevateCRM Post-Commit Tasks
+
+Work started from SQLAlchemy after_commit hooks, such as search cache
+invalidation, runs as tasks on the running event loop. They are tracked here
+so they cannot be garbage collected mid-flight and their failures are
+logged. Tasks started while handling an HTTP request are also recorded for
+CommitTasksMiddleware, which finishes them before the response goes out.
+"""
+import asyncio
+import logging
+from contextvars import ContextVar
+from typing import Awaitable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Tasks kept alive until they finish
+_running: Set[asyncio.Task] = set()
+
+# Tasks started by the current request, when one is being handled
+request_tasks: ContextVar[Optional[List[asyncio.Task]]] = ContextVar("commit_tasks", default=None)
+
+
+def run_after_commit(work: Awaitable, description: str) -> Optional[asyncio.Task]:
+    """
+    Run work on the current event loop, tracked until it finishes
+
+    Returns None, discarding the work, when no loop is running (e.g. in a
+    Celery task); callers there must do the work synchronously instead.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        logger.debug(f"No running loop; skipping {description}")
+        work.close()
+        return None
+
+    task = loop.create_task(work, name=description)
+    _running.add(task)
+    task.add_done_callback(_finished)
+
+    pending = request_tasks.get()
+    if pending is not None:
+        pending.append(task)
+    return task
+
+
+def _finished(task: asyncio.Task):
+    _running.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"{task.get_name()} failed: {task.exception()}")
+
+
+async def wait_for(tasks: List[asyncio.Task], timeout: float):
+    """Wait for tasks to finish, giving up after timeout; failures are logged by the tasks"""
+    if tasks:
+        await asyncio.wait(tasks, timeout=timeout)
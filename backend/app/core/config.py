@@ -22,10 +22,53 @@ class Settings(BaseSettings):
     DATABASE_URL_SYNC: str = ""  # Will be set in __init__
     DATABASE_POOL_SIZE: int = int(os.getenv("DATABASE_POOL_SIZE", "5"))
     DATABASE_MAX_OVERFLOW: int = int(os.getenv("DATABASE_MAX_OVERFLOW", "10"))
+    DATABASE_READ_URLS: str = os.getenv("DATABASE_READ_URLS", "")  # Comma-separated replica URLs
+    DATABASE_READ_STRATEGY: str = os.getenv("DATABASE_READ_STRATEGY", "round_robin")  # round_robin|least_connections
+    DATABASE_READ_STICKY_SECONDS: float = float(os.getenv("DATABASE_READ_STICKY_SECONDS", "5"))  # Read-your-writes window
+    DATABASE_READ_HEALTH_INTERVAL: float = float(os.getenv("DATABASE_READ_HEALTH_INTERVAL", "10"))
+    RLS_ENFORCED: bool = os.getenv("RLS_ENFORCED", "false").lower() == "true"  # Skip app-level tenant filters
     
     # Redis
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-    
+
+    # Access logging
+    ACCESS_LOG_SAMPLE_RATE: float = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "0.01"))  # Errors and slow requests always logged
+    ACCESS_LOG_SLOW_SECONDS: float = float(os.getenv("ACCESS_LOG_SLOW_SECONDS", "1.0"))
+
+    # Realtime publishing
+    REALTIME_BUFFER_MAX_EVENTS: int = int(os.getenv("REALTIME_BUFFER_MAX_EVENTS", "500"))
+    REALTIME_BUFFER_FLUSH_MS: float = float(os.getenv("REALTIME_BUFFER_FLUSH_MS", "50"))
+    REALTIME_BUFFER_MAX_PENDING: int = int(os.getenv("REALTIME_BUFFER_MAX_PENDING", "50000"))
+    REALTIME_STREAM_MAXLEN: int = int(os.getenv("REALTIME_STREAM_MAXLEN", "10000"))  # Per-tenant replay history
+    REALTIME_REPLAY_LIMIT: int = int(os.getenv("REALTIME_REPLAY_LIMIT", "200"))  # Beyond this, clients resync
+    REALTIME_STOCK_COALESCE_MS: float = float(os.getenv("REALTIME_STOCK_COALESCE_MS", "250"))  # 0 disables
+    REALTIME_STOCK_RATE_PER_SECOND: float = float(os.getenv("REALTIME_STOCK_RATE_PER_SECOND", "50"))  # Per tenant
+    REALTIME_STOCK_RATE_BURST: int = int(os.getenv("REALTIME_STOCK_RATE_BURST", "200"))
+
+    # Inventory
+    INVENTORY_BATCH_MAX_MOVES: int = int(os.getenv("INVENTORY_BATCH_MAX_MOVES", "10000"))
+    BARCODE_CACHE_SIZE: int = int(os.getenv("BARCODE_CACHE_SIZE", "10000"))  # Per tenant
+    BARCODE_CACHE_TTL: float = float(os.getenv("BARCODE_CACHE_TTL", "300"))  # Safety net; events invalidate
+    BARCODE_CACHE_MAX_TENANTS: int = int(os.getenv("BARCODE_CACHE_MAX_TENANTS", "1000"))
+    BARCODE_FILTER_MAX_AGE: float = float(os.getenv("BARCODE_FILTER_MAX_AGE", "3600"))  # Rebuild to shed deletes
+    BARCODE_NEGATIVE_TTL: float = float(os.getenv("BARCODE_NEGATIVE_TTL", "5"))  # Unknown codes skip the DB this long
+    BARCODE_FILTER_ERROR_RATE: float = float(os.getenv("BARCODE_FILTER_ERROR_RATE", "0.01"))
+    STOCK_RESERVATION_TTL_SECONDS: int = int(os.getenv("STOCK_RESERVATION_TTL_SECONDS", "900"))
+    STOCK_RESERVATION_MAX_TTL_SECONDS: int = int(os.getenv("STOCK_RESERVATION_MAX_TTL_SECONDS", "86400"))
+    STOCK_RESERVATION_SWEEP_INTERVAL: float = float(os.getenv("STOCK_RESERVATION_SWEEP_INTERVAL", "60"))
+    STOCK_RESERVATION_SWEEP_BATCH: int = int(os.getenv("STOCK_RESERVATION_SWEEP_BATCH", "1000"))
+
+    # WebSocket delivery
+    WEBSOCKET_QUEUE_SIZE: int = int(os.getenv("WEBSOCKET_QUEUE_SIZE", "256"))
+    WEBSOCKET_SEND_TIMEOUT: float = float(os.getenv("WEBSOCKET_SEND_TIMEOUT", "5.0"))
+    WEBSOCKET_PER_MESSAGE_DEFLATE: bool = os.getenv("WEBSOCKET_PER_MESSAGE_DEFLATE", "true").lower() == "true"
+
+    # Search
+    SEARCH_CACHE_TTL: int = int(os.getenv("SEARCH_CACHE_TTL", "21600"))  # Invalidated by generation
+    COMMIT_TASKS_TIMEOUT: float = float(os.getenv("COMMIT_TASKS_TIMEOUT", "2.0"))  # Max hold on a response
+    SUGGESTION_INDEX_MAX_TERMS: int = int(os.getenv("SUGGESTION_INDEX_MAX_TERMS", "500000"))
+    SUGGESTION_INDEX_MAX_AGE: float = float(os.getenv("SUGGESTION_INDEX_MAX_AGE", "3600"))  # Safety-net reload
+
     # CORS
     ALLOWED_ORIGINS: List[str] = [
         "http://localhost:3000",
@@ -64,6 +107,15 @@ class Settings(BaseSettings):
     QUICKBOOKS_CLIENT_SECRET: str = os.getenv("QUICKBOOKS_CLIENT_SECRET", "")
     STRIPE_API_KEY: str = os.getenv("STRIPE_API_KEY", "")
     
+    # AI & Analytics
+    RECOMMENDATION_MODEL_DIR: str = os.getenv("RECOMMENDATION_MODEL_DIR", "data/recommendations")  # Shared by API and workers
+    RECOMMENDATION_MODEL_CHECK_INTERVAL: float = float(os.getenv("RECOMMENDATION_MODEL_CHECK_INTERVAL", "30"))
+    EMBEDDING_MODEL_NAME: str = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+    EMBEDDING_WARMUP: bool = os.getenv("EMBEDDING_WARMUP", "false").lower() == "true"
+    EMBEDDING_MAX_BATCH: int = int(os.getenv("EMBEDDING_MAX_BATCH", "32"))
+    EMBEDDING_BATCH_WINDOW_MS: float = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+    
     # Celery
     CELERY_BROKER_URL: str = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
     CELERY_RESULT_BACKEND: str = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
@@ -2,11 +2,22 @@
 TECHGURU ElevateCRM Database Configuration
 """
 import logging
-from sqlalchemy import create_engine, text
+import time
+import uuid
+from typing import Optional
+
+import asyncpg
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.schema import CreateColumn
 
 from app.core.config import settings
+from app.core.metrics import DB_POOL_CHECKOUT_WAIT, DB_POOL_CONNECTIONS, InstrumentedRedis
+from app.core.replicas import replication_lag
 
 logger = logging.getLogger(__name__)
 
@@ -15,11 +26,69 @@ engine = None
 async_engine = None
 SessionLocal = None
 AsyncSessionLocal = None
+read_replicas = None
+
+# Session.info key naming the tenant whose RLS context the session's transactions apply
+RLS_TENANT_KEY = "rls_tenant_id"
+
+# Session.info key naming the read replica serving the session
+READ_REPLICA_KEY = "read_replica"
+
+
+class TenantConnection(asyncpg.Connection):
+    """
+    asyncpg connection that sets the RLS tenant GUC together with BEGIN
+
+    The tenant is folded into the simple-query BEGIN as a transaction-local
+    set_config(), so scoping a transaction to a tenant costs no extra round trip.
+    """
+
+    _pending_tenant_id: Optional[str] = None
+
+    async def execute(self, query: str, *args, timeout: float = None) -> str:
+        tenant_id = self._pending_tenant_id
+        if tenant_id and not args and query.startswith("BEGIN"):
+            self._pending_tenant_id = None
+            # tenant_id is a canonical UUID string (see _apply_rls_tenant)
+            query = f"{query} SELECT set_config('elevatecrm.tenant_id', '{tenant_id}', true);"
+        return await super().execute(query, *args, timeout=timeout)
+
+
+class TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+
+def _register_pool_metrics(pool):
+    """Expose the async pool's usage as scrape-time gauges"""
+    DB_POOL_CONNECTIONS.labels("checked_out").set_function(pool.checkedout)
+    DB_POOL_CONNECTIONS.labels("idle").set_function(pool.checkedin)
+    DB_POOL_CONNECTIONS.labels("overflow").set_function(lambda: max(pool.overflow(), 0))
+
+
+def _create_pooled_async_engine(url: str):
+    """Async PostgreSQL engine with timed checkouts and RLS-aware connections"""
+    pooled_engine = create_async_engine(
+        url.replace("postgresql://", "postgresql+asyncpg://"),
+        poolclass=TimedAsyncAdaptedQueuePool,
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        echo=settings.DEBUG,
+        connect_args={"connection_class": TenantConnection}
+    )
+    event.listen(pooled_engine.sync_engine.pool, "checkin", _clear_pending_tenant)
+    return pooled_engine
 
 
 def initialize_database():
     """Initialize database connections when ready"""
-    global engine, async_engine, SessionLocal, AsyncSessionLocal
+    global engine, async_engine, SessionLocal, AsyncSessionLocal, read_replicas
     
     try:
         # Determine database type
@@ -48,12 +117,22 @@ def initialize_database():
                 connect_args={"check_same_thread": False}
             )
         else:
-            async_engine = create_async_engine(
-                settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://"),
-                pool_size=settings.DATABASE_POOL_SIZE,
-                max_overflow=settings.DATABASE_MAX_OVERFLOW,
-                echo=settings.DEBUG
-            )
+            async_engine = _create_pooled_async_engine(settings.DATABASE_URL)
+            _register_pool_metrics(async_engine.pool)
+
+            # Optional read replicas for read-only endpoints
+            read_urls = [url.strip() for url in settings.DATABASE_READ_URLS.split(",") if url.strip()]
+            if read_urls:
+                from app.core.replicas import ReplicaSet
+                read_replicas = ReplicaSet(
+                    read_urls,
+                    _create_pooled_async_engine,
+                    strategy=settings.DATABASE_READ_STRATEGY,
+                    sticky_seconds=settings.DATABASE_READ_STICKY_SECONDS,
+                    health_interval=settings.DATABASE_READ_HEALTH_INTERVAL,
+                    redis_factory=lambda: InstrumentedRedis.from_url(settings.REDIS_URL, decode_responses=True)
+                )
+                logger.info(f"Read routing enabled across {len(read_urls)} replica(s)")
 
         # Session makers
         SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -73,6 +152,14 @@ class Base(DeclarativeBase):
     pass
 
 
+@compiles(CreateColumn, "sqlite")
+def _skip_postgresql_only_columns(element, compiler, **kw):
+    """Leave PostgreSQL-only columns (e.g. generated tsvectors) out of SQLite tables"""
+    if element.element.info.get("postgresql_only"):
+        return None
+    return compiler.visit_create_column(element, **kw)
+
+
 async def get_async_session():
     """Get async database session"""
     async with AsyncSessionLocal() as session:
@@ -85,6 +172,130 @@ async def get_async_session():
             await session.close()
 
 
+def scope_session_to_tenant(session, tenant_id: str) -> bool:
+    """
+    Apply the RLS tenant context to every transaction the session begins
+
+    Returns False (and leaves the session unscoped) if tenant_id is not a UUID.
+    """
+    try:
+        session.info[RLS_TENANT_KEY] = str(uuid.UUID(str(tenant_id)))
+    except ValueError:
+        logger.warning(f"Not applying RLS context for non-UUID tenant {tenant_id}")
+        return False
+    return True
+
+
+def rls_enforced(session) -> bool:
+    """Whether the session's queries are already tenant-scoped by PostgreSQL RLS"""
+    return (
+        settings.RLS_ENFORCED
+        and not settings.DATABASE_URL.startswith("sqlite")
+        and session.info.get(RLS_TENANT_KEY) is not None
+    )
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_rls_tenant(session, transaction, connection):
+    tenant_id = session.info.get(RLS_TENANT_KEY)
+    if not tenant_id or connection.dialect.name != "postgresql":
+        return
+
+    driver_connection = connection.connection.driver_connection
+    if isinstance(driver_connection, TenantConnection):
+        # asyncpg begins lazily with the first statement; piggyback on that BEGIN
+        driver_connection._pending_tenant_id = tenant_id
+    else:
+        connection.execute(
+            text("SELECT set_config('elevatecrm.tenant_id', :tenant_id, true)"),
+            {"tenant_id": tenant_id}
+        )
+
+
+def _clear_pending_tenant(dbapi_connection, connection_record):
+    # A transaction that never ran a statement must not leak its tenant to the next checkout
+    driver_connection = getattr(dbapi_connection, "driver_connection", None)
+    if isinstance(driver_connection, TenantConnection):
+        driver_connection._pending_tenant_id = None
+
+
+# Session.info key set once a session has written something in its transaction
+WROTE_KEY = "wrote"
+
+
+@event.listens_for(Session, "after_flush")
+def _note_flush_write(session, flush_context):
+    session.info[WROTE_KEY] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[WROTE_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _stick_tenant_to_primary(session):
+    if session.info.pop(WROTE_KEY, False) and read_replicas is not None:
+        from app.core.tenant_context import TenantContextManager
+        read_replicas.mark_write(session.info.get(RLS_TENANT_KEY) or TenantContextManager.get_tenant_id())
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_write(session):
+    session.info.pop(WROTE_KEY, None)
+
+
+async def get_read_session(tenant_id: Optional[str] = None):
+    """
+    Async session for read-only work, served by a replica when one is available
+
+    Falls back to the primary when no replica is configured or healthy, and
+    for tenants that committed a write within the stickiness window.
+    """
+    if AsyncSessionLocal is None:
+        initialize_database()
+
+    replica = await read_replicas.choose_for(tenant_id) if read_replicas is not None else None
+    if replica is None:
+        async with AsyncSessionLocal() as session:
+            yield session
+        return
+
+    replica.active_sessions += 1
+    try:
+        async with replica.sessionmaker() as session:
+            session.info[READ_REPLICA_KEY] = replica.name
+            try:
+                yield session
+            except DBAPIError as e:
+                if e.connection_invalidated:
+                    read_replicas.mark_unhealthy(replica, e)
+                raise
+    finally:
+        replica.active_sessions -= 1
+
+
+def on_read_replica(session) -> bool:
+    """Whether the session reads from a replica, which may lag the primary"""
+    return session.info.get(READ_REPLICA_KEY) is not None
+
+
+async def cacheable_read(session) -> bool:
+    """
+    Whether results just read through session may be cached under the
+    current search generation
+
+    Generations are bumped once the primary commits, and for the stickiness
+    window after a write its tenant reads from the primary. A replica read is
+    therefore only stale when the replica trails by more than that window.
+    """
+    if not on_read_replica(session) or read_replicas is None:
+        return True
+    lag = await replication_lag(session)
+    return lag is not None and lag < read_replicas.sticky_seconds
+
+
 async def set_tenant_context(session, tenant_id: str):
     """Set tenant context for RLS in database session"""
     if not tenant_id:
@@ -107,8 +318,8 @@ async def get_tenant_session(tenant_id: str):
     """Get async database session with tenant context set"""
     async with AsyncSessionLocal() as session:
         try:
-            # Set tenant context for RLS
-            await set_tenant_context(session, tenant_id)
+            # Scope every transaction to the tenant for RLS
+            scope_session_to_tenant(session, tenant_id)
             yield session
         except Exception:
             await session.rollback()
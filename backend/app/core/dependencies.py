@@ -7,8 +7,8 @@ from typing import Optional, List
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
-from app.core.auth import validate_jwt_token, extract_bearer_token, check_user_permissions, UserProfile
-from app.core.database import get_async_session
+from app.core.auth import authenticate_request, extract_bearer_token, check_user_permissions, UserProfile
+from app.core.database import get_async_session, get_read_session, scope_session_to_tenant
 from app.core.tenant_context import TenantContextManager
 from app.models.user import User
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -40,13 +40,8 @@ async def get_current_user_optional(
         return None
     
     try:
-        # Validate JWT token
-        user_profile = await validate_jwt_token(credentials.credentials)
-        
-        # Store user in request state for middleware access
-        request.state.user = user_profile
-        
-        return user_profile
+        # Validate JWT token (reuses the middleware's result for this request)
+        return await authenticate_request(request, credentials.credentials)
         
     except HTTPException:
         # Token is invalid, but this is optional auth
@@ -80,13 +75,8 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Validate JWT token
-    user_profile = await validate_jwt_token(credentials.credentials)
-    
-    # Store user in request state for middleware access
-    request.state.user = user_profile
-    
-    return user_profile
+    # Validate JWT token (reuses the middleware's result for this request)
+    return await authenticate_request(request, credentials.credentials)
 
 
 async def get_current_active_user(
@@ -293,6 +283,9 @@ async def get_tenant_db(
         # This replaces PostgreSQL RLS with application-level filtering
         TenantContextManager.set_tenant_id(tenant_id)
         logger.debug(f"Application tenant context set: {tenant_id}")
+        
+        # PostgreSQL RLS: the tenant GUC rides along with each transaction's BEGIN
+        scope_session_to_tenant(db, tenant_id)
         return db
         
     except Exception as e:
@@ -303,6 +296,30 @@ async def get_tenant_db(
         )
 
 
+async def get_read_db(request: Request) -> AsyncSession:
+    """
+    Get a read-only database session, routed to a replica when configured.
+    
+    Applies the same tenant context as get_tenant_db. Use only for endpoints
+    that never write.
+    
+    Args:
+        request: FastAPI request object
+        
+    Returns:
+        AsyncSession: Replica (or primary) session with tenant context set
+        
+    Raises:
+        HTTPException: If tenant context is not available
+    """
+    tenant_id = await get_current_tenant(request)
+    TenantContextManager.set_tenant_id(tenant_id)
+    
+    async for session in get_read_session(tenant_id):
+        scope_session_to_tenant(session, tenant_id)
+        yield session
+
+
 # Tenant Context Dependencies
 async def get_tenant_context(request: Request) -> str:
     """
@@ -0,0 +1,194 @@
+"""
+TECHGURU ElevateCRM Read Replica Routing
+
+Optional pool of read-replica engines for read-only endpoints. Sessions are
+spread over healthy replicas (round robin or least connections); a tenant
+that has just committed a write is kept on the primary for a short window so
+it reads its own writes despite replication lag. With a Redis client the
+window is shared by every worker process; without one it only covers reads
+served by the process that made the write.
+"""
+import asyncio
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.core.commit_tasks import run_after_commit
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ("round_robin", "least_connections")
+
+# Seconds a replica trails the primary; 0 when it has replayed everything it received
+REPLICATION_LAG_SQL = text("""
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+
+async def replication_lag(session: AsyncSession) -> Optional[float]:
+    """How far the replica behind session trails the primary, in seconds; None if unknown"""
+    if session.bind.dialect.name != "postgresql":
+        return 0.0
+    try:
+        lag = (await session.execute(REPLICATION_LAG_SQL)).scalar()
+    except Exception as e:
+        logger.warning(f"Replication lag check failed: {e}")
+        return None
+    return float(lag) if lag is not None else None
+
+
+class Replica:
+    """One replica engine and its routing state"""
+
+    def __init__(self, url: str, engine: AsyncEngine):
+        self.url = url
+        self.engine = engine
+        self.sessionmaker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        self.healthy = True
+        self.active_sessions = 0
+
+    @property
+    def name(self) -> str:
+        # Host part only; never log credentials
+        return self.url.rsplit("@", 1)[-1]
+
+
+class ReplicaSet:
+    """Health-checked replicas with read-your-writes stickiness per tenant"""
+
+    def __init__(self, urls: List[str], engine_factory: Callable[[str], AsyncEngine],
+                 strategy: str = "round_robin", sticky_seconds: float = 5.0,
+                 health_interval: float = 10.0, health_timeout: float = 2.0,
+                 max_tracked_tenants: int = 10000,
+                 redis_factory: Optional[Callable[[], Any]] = None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown replica strategy {strategy!r}; expected one of {STRATEGIES}")
+
+        self.replicas = [Replica(url, engine_factory(url)) for url in urls]
+        self.strategy = strategy
+        self.sticky_seconds = sticky_seconds
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.max_tracked_tenants = max_tracked_tenants
+        # tenant_id -> monotonic time of its last committed write
+        self._recent_writes: "OrderedDict[str, float]" = OrderedDict()
+        self._round_robin = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+        # Shares the stickiness window with other processes when set
+        self.redis_factory = redis_factory
+        self._redis = None
+
+    @staticmethod
+    def sticky_key(tenant_id: str) -> str:
+        return f"replicas:sticky:{tenant_id}"
+
+    def mark_write(self, tenant_id: Optional[str]):
+        """Route the tenant's reads to the primary for the stickiness window"""
+        if not tenant_id:
+            return
+        self._remember_write(str(tenant_id), time.monotonic())
+        if self.redis_factory is not None:
+            run_after_commit(self._share_write(str(tenant_id)), f"replica stickiness for {tenant_id}")
+
+    def _remember_write(self, tenant_id: str, written_at: float):
+        self._recent_writes[tenant_id] = written_at
+        self._recent_writes.move_to_end(tenant_id)
+        while len(self._recent_writes) > self.max_tracked_tenants:
+            self._recent_writes.popitem(last=False)
+
+    def _client(self):
+        if self._redis is None:
+            self._redis = self.redis_factory()
+        return self._redis
+
+    async def _share_write(self, tenant_id: str):
+        await self._client().set(self.sticky_key(tenant_id), "1", px=int(self.sticky_seconds * 1000))
+
+    async def choose_for(self, tenant_id: Optional[str] = None) -> Optional[Replica]:
+        """choose(), also keeping tenants that wrote through other processes on the primary"""
+        if tenant_id and self.redis_factory is not None and not self.is_sticky(tenant_id):
+            try:
+                remaining = await self._client().pttl(self.sticky_key(str(tenant_id)))
+            except Exception as e:
+                logger.warning(f"Shared replica stickiness unavailable: {e}")
+            else:
+                if remaining and remaining > 0:
+                    # Remembered locally for the rest of the window
+                    self._remember_write(str(tenant_id), time.monotonic() - self.sticky_seconds + remaining / 1000)
+        return self.choose(tenant_id)
+
+    def is_sticky(self, tenant_id: Optional[str]) -> bool:
+        if not tenant_id:
+            return False
+        written_at = self._recent_writes.get(str(tenant_id))
+        if written_at is None:
+            return False
+        if time.monotonic() - written_at >= self.sticky_seconds:
+            self._recent_writes.pop(str(tenant_id), None)
+            return False
+        return True
+
+    def choose(self, tenant_id: Optional[str] = None) -> Optional[Replica]:
+        """Replica to serve a read, or None to use the primary"""
+        if self.is_sticky(tenant_id):
+            return None
+
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        if self.strategy == "least_connections":
+            return min(healthy, key=lambda replica: replica.active_sessions)
+        return healthy[next(self._round_robin) % len(healthy)]
+
+    def mark_unhealthy(self, replica: Replica, reason: Exception):
+        if replica.healthy:
+            logger.warning(f"Read replica {replica.name} removed from rotation: {reason}")
+        replica.healthy = False
+
+    async def check_health(self):
+        """Probe every replica and update its place in the rotation"""
+        for replica in self.replicas:
+            try:
+                async with replica.engine.connect() as conn:
+                    await asyncio.wait_for(conn.execute(text("SELECT 1")), self.health_timeout)
+            except Exception as e:
+                self.mark_unhealthy(replica, e)
+            else:
+                if not replica.healthy:
+                    logger.info(f"Read replica {replica.name} back in rotation")
+                replica.healthy = True
+
+    async def start(self):
+        await self.check_health()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                logger.error(f"Replica health check failed: {e}")
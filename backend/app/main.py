@@ -1,20 +1,24 @@
 """
 TECHGURU ElevateCRM - FastAPI Application Entry Point
 """
+import asyncio
 import os
 import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 
 from app.core.config import settings
 from app.core.database import engine, create_tables
+from app.core.metrics import CONTENT_TYPE, registry as metrics_registry
 from app.api.v1.api import api_router
 from app.api.v1.health import router as health_router
 from app.middleware.tenant import TenantMiddleware
 from app.middleware.security import SecurityMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.commit_tasks import CommitTasksMiddleware
 
 # Configure logging
 logging.basicConfig(
@@ -33,10 +37,34 @@ async def lifespan(app: FastAPI):
     await create_tables()
     logger.info("Database tables created/verified")
 
+    # Decide between full-text and fuzzy search once, up front
+    from app.core import database
+    from app.services.search_service import detect_search_capabilities
+    await detect_search_capabilities(database.async_engine)
+
+    # Put healthy read replicas into rotation
+    if database.read_replicas is not None:
+        await database.read_replicas.start()
+
+    # Fetch signing keys before the first authenticated request
+    from app.core.auth import auth_config, jwks_cache
+    if auth_config.verify_signature:
+        await jwks_cache.start()
+
+    # Load the embedding model before the first semantic search
+    if settings.EMBEDDING_WARMUP:
+        try:
+            from app.services.embedding_service import embedding_registry
+            await asyncio.get_running_loop().run_in_executor(None, embedding_registry.warm)
+            logger.info("Embedding model loaded")
+        except Exception as e:
+            logger.warning(f"Embedding model warmup failed: {e}")
+
     # Initialize real-time service
     try:
-        from app.services.realtime_service import realtime_service
+        from app.services.realtime_service import realtime_service, realtime_hub
         await realtime_service.connect()
+        await realtime_hub.start()
         logger.info("✅ Real-time service (Redis) connected")
     except Exception as e:
         logger.warning(f"⚠️ Real-time service failed to connect: {e}")
@@ -46,12 +74,17 @@ async def lifespan(app: FastAPI):
 
     # Cleanup real-time service
     try:
-        from app.services.realtime_service import realtime_service
+        from app.services.realtime_service import realtime_service, realtime_hub
+        await realtime_hub.stop()
         await realtime_service.disconnect()
         logger.info("Real-time service disconnected")
     except Exception as e:
         logger.error(f"Error disconnecting real-time service: {e}")
 
+    await jwks_cache.stop()
+    if database.read_replicas is not None:
+        await database.read_replicas.stop()
+
     logger.info("Shutting down TECHGURU ElevateCRM API...")
 # Create FastAPI app
 app = FastAPI(
@@ -73,8 +106,12 @@ app.add_middleware(
 )
 
 # Custom middleware
+# Innermost, so responses wait for the post-commit work of their own request
+app.add_middleware(CommitTasksMiddleware)
 app.add_middleware(SecurityMiddleware)
 app.add_middleware(TenantMiddleware)
+# Outermost, so latency covers the whole middleware stack
+app.add_middleware(MetricsMiddleware)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
@@ -99,6 +136,12 @@ async def version():
         "service": "techguru-elevatecrm-api"
     }
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics in text exposition format"""
+    return Response(metrics_registry.render(), media_type=CONTENT_TYPE)
+
 # Development endpoints (only in debug mode)
 if settings.DEBUG:
     @app.get("/dev/seed", tags=["Development"])
@@ -136,5 +179,6 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         reload=settings.DEBUG,
-        log_level="info"
+        log_level="info",
+        ws_per_message_deflate=settings.WEBSOCKET_PER_MESSAGE_DEFLATE
     )
@@ -0,0 +1,41 @@
+"""
+TECHGURU ElevateCRM Post-Commit Task Middleware
+
+Holds each HTTP response until the post-commit work its request started
+(search cache invalidation, change events) has finished. A client that reads
+right after a write's response then sees the write's effects.
+"""
+import asyncio
+from typing import List
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.commit_tasks import request_tasks, wait_for
+from app.core.config import settings
+
+
+class CommitTasksMiddleware:
+    """Finish a request's post-commit tasks before starting its response"""
+
+    def __init__(self, app: ASGIApp, timeout: float = settings.COMMIT_TASKS_TIMEOUT):
+        self.app = app
+        self.timeout = timeout
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        pending: List[asyncio.Task] = []
+        token = request_tasks.set(pending)
+
+        async def send_after_commit_tasks(message: Message):
+            if message["type"] == "http.response.start" and pending:
+                await wait_for(pending, self.timeout)
+                pending.clear()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_after_commit_tasks)
+        finally:
+            request_tasks.reset(token)
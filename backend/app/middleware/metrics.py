@@ -0,0 +1,113 @@
+"""
+TECHGURU ElevateCRM Metrics Middleware
+
+Times every HTTP request and records it under its route template rather than
+the raw path, so per-id URLs share one series. Requests are also labelled by
+the tenant's subscription plan, resolved once per tenant in the background.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+from app.core.metrics import HTTP_REQUEST_DURATION
+
+logger = logging.getLogger(__name__)
+
+
+class TenantTierCache:
+    """Bounded tenant_id -> subscription plan map, filled off the request path"""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._tiers: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._pending: Set[str] = set()
+
+    def get(self, tenant_id: Optional[str]) -> str:
+        """Cached tier, or "unknown" while a lookup is scheduled"""
+        if not tenant_id:
+            return "none"
+
+        tenant_id = str(tenant_id)
+        entry = self._tiers.get(tenant_id)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            self._schedule(tenant_id)
+        if entry is None:
+            return "unknown"
+        self._tiers.move_to_end(tenant_id)
+        return entry[0]
+
+    def set(self, tenant_id: str, tier: str):
+        self._tiers[tenant_id] = (tier, time.monotonic())
+        self._tiers.move_to_end(tenant_id)
+        while len(self._tiers) > self.max_size:
+            self._tiers.popitem(last=False)
+
+    def _schedule(self, tenant_id: str):
+        if tenant_id in self._pending:
+            return
+        self._pending.add(tenant_id)
+        asyncio.get_running_loop().create_task(self._resolve(tenant_id))
+
+    async def _resolve(self, tenant_id: str):
+        try:
+            self.set(tenant_id, await self._lookup(tenant_id))
+        except Exception as e:
+            logger.debug(f"Tenant tier lookup failed for {tenant_id}: {e}")
+        finally:
+            self._pending.discard(tenant_id)
+
+    async def _lookup(self, tenant_id: str) -> str:
+        from app.core import database
+        from app.models.company import Company
+
+        try:
+            company_id = uuid.UUID(tenant_id)
+        except ValueError:
+            return "unknown"
+
+        if database.AsyncSessionLocal is None:
+            raise RuntimeError("Database not initialized")
+
+        async with database.AsyncSessionLocal() as session:
+            plan = await session.scalar(
+                select(Company.subscription_plan).where(Company.id == company_id)
+            )
+        return plan or "unknown"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request latency histograms"""
+
+    def __init__(self, app, tiers: Optional[TenantTierCache] = None):
+        self.app = app
+        self.tiers = tiers or TenantTierCache()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router and tenant middleware annotate the shared scope on the way in
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            state: Dict = scope.get("state") or {}
+            HTTP_REQUEST_DURATION.labels(
+                route, scope["method"], str(status), self.tiers.get(state.get("tenant_id"))
+            ).observe(time.perf_counter() - started)
@@ -1,44 +1,81 @@
 """
 TECHGURU ElevateCRM Security Middleware
 """
+import json
+import random
 import time
 import logging
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
+access_logger = logging.getLogger("elevatecrm.access")
+
+SECURITY_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "DENY",
+    "X-XSS-Protection": "1; mode=block",
+    "Referrer-Policy": "strict-origin-when-cross-origin",
+}
+
+
+class SecurityMiddleware:
+    """
+    Security headers and access logging as plain ASGI middleware
+
+    Headers are added to the http.response.start message, so response bodies
+    (including streaming ones) pass through untouched. WebSocket and lifespan
+    scopes are forwarded as-is. Access logs are sampled; server errors and
+    slow requests are always logged.
+    """
+
+    def __init__(self, app: ASGIApp,
+                 sample_rate: float = settings.ACCESS_LOG_SAMPLE_RATE,
+                 slow_request_seconds: float = settings.ACCESS_LOG_SLOW_SECONDS):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_request_seconds = slow_request_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_with_headers(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                for name, value in SECURITY_HEADERS.items():
+                    headers[name] = value
+                headers["X-Process-Time"] = str(time.perf_counter() - start_time)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            self._log_access(scope, status_code, time.perf_counter() - start_time)
 
+    def _log_access(self, scope: Scope, status_code: int, duration: float):
+        if (status_code < 500 and duration < self.slow_request_seconds
+                and random.random() >= self.sample_rate):
+            return
+        if not access_logger.isEnabledFor(logging.INFO):
+            return
 
-class SecurityMiddleware(BaseHTTPMiddleware):
-    """Security middleware for request processing"""
-    
-    async def dispatch(self, request: Request, call_next):
-        """Process request with security headers and logging"""
-        
-        # Log request start
-        start_time = time.time()
-        client_ip = request.client.host if request.client else "unknown"
-        
-        logger.info(
-            f"Request: {request.method} {request.url.path} from {client_ip}"
-        )
-        
-        # Process request
-        response = await call_next(request)
-        
-        # Add security headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        
-        # Add processing time header
-        process_time = time.time() - start_time
-        response.headers["X-Process-Time"] = str(process_time)
-        
-        # Log response
-        logger.info(
-            f"Response: {response.status_code} in {process_time:.3f}s"
-        )
-        
-        return response
+        client = scope.get("client")
+        access_logger.info(json.dumps({
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": getattr(scope.get("route"), "path", None),
+            "status": status_code,
+            "duration_ms": round(duration * 1000, 2),
+            "client_ip": client[0] if client else "unknown",
+            "tenant_id": (scope.get("state") or {}).get("tenant_id"),
+        }, default=str))
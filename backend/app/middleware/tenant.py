@@ -6,26 +6,38 @@ SQLite-compatible implementation using application-level filtering.
 """
 import logging
 from typing import Optional
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import Request
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from app.core.tenant_context import TenantContextManager
 
 logger = logging.getLogger(__name__)
 
+# Paths served without tenant context
+SKIP_PATHS = {"/healthz", "/version", "/metrics", "/docs", "/redoc", "/openapi.json"}
 
-class TenantMiddleware(BaseHTTPMiddleware):
+
+class TenantMiddleware:
     """Middleware to handle tenant context for multi-tenant requests"""
 
-    async def dispatch(self, request: Request, call_next) -> Response:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """Process request and set tenant context"""
         
-        # Skip tenant context for health checks and static files
-        if request.url.path in ["/healthz", "/version", "/docs", "/redoc", "/openapi.json"]:
-            return await call_next(request)
+        # WebSocket connections authenticate themselves; lifespan has no tenant
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        if request.url.path.startswith("/static/"):
-            return await call_next(request)
+        # Skip tenant context for health checks and static files
+        path = scope["path"]
+        if path in SKIP_PATHS or path.startswith("/static/"):
+            await self.app(scope, receive, send)
+            return
 
+        request = Request(scope)
         tenant_id = None
         user_profile = None
         
@@ -36,7 +48,6 @@ class TenantMiddleware(BaseHTTPMiddleware):
             if tenant_id:
                 # Set tenant context in request state AND application context
                 request.state.tenant_id = tenant_id
-                request.state.user = user_profile  # Store user for other middleware/handlers
                 
                 # Set application-level tenant context (SQLite compatible)
                 TenantContextManager.set_tenant_id(tenant_id)
@@ -50,14 +61,17 @@ class TenantMiddleware(BaseHTTPMiddleware):
         except Exception as e:
             logger.warning(f"Failed to extract tenant ID: {e}")
         
-        # Continue with request processing
-        response = await call_next(request)
+        if not tenant_id:
+            await self.app(scope, receive, send)
+            return
         
-        # Add tenant ID to response headers for debugging (if present)
-        if tenant_id:
-            response.headers["X-Tenant-ID"] = str(tenant_id)
-            
-        return response
+        async def send_with_tenant_header(message: Message):
+            # Add tenant ID to response headers for debugging
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Tenant-ID"] = str(tenant_id)
+            await send(message)
+        
+        await self.app(scope, receive, send_with_tenant_header)
 
     async def _extract_tenant_id(self, request: Request) -> tuple[Optional[str], Optional[object]]:
         """
@@ -77,10 +91,10 @@ class TenantMiddleware(BaseHTTPMiddleware):
         authorization = request.headers.get("Authorization")
         if authorization and authorization.startswith("Bearer "):
             try:
-                from app.core.auth import extract_bearer_token, validate_jwt_token
+                from app.core.auth import extract_bearer_token, authenticate_request
                 
                 token = extract_bearer_token(authorization)
-                user_profile = await validate_jwt_token(token)
+                user_profile = await authenticate_request(request, token)
                 
                 if user_profile.company_id:
                     logger.debug(f"Found tenant ID in JWT: {user_profile.company_id}")
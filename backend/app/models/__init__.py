@@ -6,7 +6,7 @@ Import all models to ensure they are registered with SQLAlchemy
 from app.models.company import Company
 from app.models.user import User
 from app.models.contact import Contact
-from app.models.product import Product, StockLocation, StockMove
+from app.models.product import Product, StockLocation, StockMove, StockLevel, StockReservation
 from app.models.order import Order, OrderLineItem
 from app.models.integration import Integration, Webhook
 
@@ -17,6 +17,8 @@ __all__ = [
     "Product",
     "StockLocation", 
     "StockMove",
+    "StockLevel",
+    "StockReservation",
     "Order",
     "OrderLineItem",
     "Integration",
@@ -214,14 +214,16 @@ class SemanticIndex(Base):
     entity_type = Column(String(100), nullable=False)  # product, contact, order, document
     entity_id = Column(UUID(as_uuid=True), nullable=False)
     content = Column(Text, nullable=False)  # Original text content
+    content_hash = Column(String(64), nullable=True)  # sha256 of content; unchanged rows are not re-embedded
     embedding = Column(VECTOR(384))  # Vector embedding (384 dims for all-MiniLM-L6-v2)
-    metadata = Column(JSONB, default={})
+    # "metadata" is reserved on declarative models; the column keeps its name
+    entity_metadata = Column("metadata", JSONB, default={})
     language = Column(String(10), default="en")
     indexed_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     __table_args__ = (
-        Index("idx_semantic_entity", "entity_type", "entity_id"),
+        UniqueConstraint("entity_type", "entity_id", name="uq_semantic_entity"),  # Upsert target
         Index("idx_semantic_embedding", "embedding", postgresql_using="ivfflat"),
     )
 
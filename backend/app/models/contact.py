@@ -3,12 +3,9 @@ TECHGURU ElevateCRM Contact Model
 """
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Text, Boolean, ForeignKey, JSON, Numeric
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
-
-from app.core.database import Base
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, DateTime, Text, Boolean, ForeignKey, JSON, Numeric, Computed
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 
 from app.core.database import Base
 
@@ -16,6 +13,8 @@ from app.core.database import Base
 class Contact(Base):
     """Contact/Lead/Customer model"""
     __tablename__ = "contacts"
+    # Don't fetch the generated search_vector back on every INSERT/UPDATE
+    __mapper_args__ = {"eager_defaults": False}
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), nullable=False, index=True)
@@ -56,6 +55,20 @@ class Contact(Base):
     tags = Column(JSON, default=list)
     notes = Column(Text, nullable=True)
     
+    # Full-text search document, generated by PostgreSQL (see migration d3f1a8c27b54)
+    search_vector = deferred(Column(
+        TSVECTOR().with_variant(Text(), "sqlite"),
+        Computed(
+            "setweight(to_tsvector('english', coalesce(first_name, '') || ' ' || "
+            "coalesce(last_name, '') || ' ' || coalesce(display_name, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(company_name, '') || ' ' || "
+            "coalesce(email, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(notes, '')), 'C')",
+            persisted=True
+        ),
+        info={"postgresql_only": True}
+    ))
+    
     # Status and Assignment
     is_active = Column(Boolean, default=True)
     assigned_to_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
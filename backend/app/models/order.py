@@ -12,6 +12,9 @@ from sqlalchemy.orm import relationship
 
 from app.core.database import Base
 
+# Orders that count as purchases
+COMPLETED_ORDER_STATUSES = ("confirmed", "fulfilled")
+
 
 class Order(Base):
     """Order model for quotes, sales orders, purchase orders, invoices"""
@@ -3,9 +3,9 @@ TECHGURU ElevateCRM Product Model
 """
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey, Text, Numeric, Integer, JSON
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey, Text, Numeric, Integer, JSON, Computed, Index, text
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 
 from app.core.database import Base
 
@@ -13,6 +13,8 @@ from app.core.database import Base
 class Product(Base):
     """Product/Service/SKU model"""
     __tablename__ = "products"
+    # Don't fetch the generated search_vector back on every INSERT/UPDATE
+    __mapper_args__ = {"eager_defaults": False}
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), nullable=False, index=True)
@@ -59,6 +61,19 @@ class Product(Base):
     # External References
     external_refs = Column(JSON, default=dict)  # Shopify, WooCommerce, etc. product IDs
     
+    # Full-text search document, generated by PostgreSQL (see migration d3f1a8c27b54)
+    search_vector = deferred(Column(
+        TSVECTOR().with_variant(Text(), "sqlite"),
+        Computed(
+            "setweight(to_tsvector('english', coalesce(name, '') || ' ' || sku), 'A') || "
+            "setweight(to_tsvector('english', coalesce(brand, '') || ' ' || "
+            "coalesce(category, '') || ' ' || coalesce(subcategory, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'C')",
+            persisted=True
+        ),
+        info={"postgresql_only": True}
+    ))
+    
     # Metadata
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -182,3 +197,81 @@ class StockMove(Base):
     
     def __repr__(self):
         return f"<StockMove {self.movement_type} {self.quantity} of {self.product.name if self.product else 'Unknown'}>"
+
+
+class StockLevel(Base):
+    """Current on-hand and reserved quantity of a product at one location
+
+    Maintained from StockMove inserts in the same transaction (see
+    app.services.stock_service) and rebuilt from the ledger by the
+    reconciliation job, so reading stock never scans move history.
+    """
+    __tablename__ = "stock_levels"
+    __table_args__ = (
+        Index("idx_stock_levels_location", "company_id", "location_id"),
+    )
+
+    company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), primary_key=True)
+    product_id = Column(UUID(as_uuid=True), ForeignKey("products.id"), primary_key=True)
+    location_id = Column(UUID(as_uuid=True), ForeignKey("stock_locations.id"), primary_key=True)
+
+    on_hand = Column(Integer, nullable=False, default=0)
+    reserved = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def available(self):
+        """On-hand quantity not held by reservations"""
+        return self.on_hand - self.reserved
+
+    @property
+    def tenant_id(self):
+        """Get tenant ID for RLS"""
+        return self.company_id
+
+    def __repr__(self):
+        return f"<StockLevel {self.product_id}@{self.location_id}: {self.on_hand}>"
+
+
+class StockReservation(Base):
+    """Stock held at one location for a pending order or checkout
+
+    Active reservations count in StockLevel.reserved until they are released,
+    committed (the stock ships as a StockMove) or expire. See
+    app.services.reservation_service.
+    """
+    __tablename__ = "stock_reservations"
+    __table_args__ = (
+        # Time-ordered queue of what the sweeper has to expire
+        Index(
+            "idx_stock_reservations_expiry", "expires_at",
+            postgresql_where=text("status = 'active'"),
+            sqlite_where=text("status = 'active'")
+        ),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), nullable=False, index=True)
+    product_id = Column(UUID(as_uuid=True), ForeignKey("products.id"), nullable=False)
+    location_id = Column(UUID(as_uuid=True), ForeignKey("stock_locations.id"), nullable=False)
+
+    quantity = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False, default="active")  # active, released, committed, expired
+
+    # What the stock is held for (order, cart, ...)
+    reference_type = Column(String(50), nullable=True)
+    reference_id = Column(UUID(as_uuid=True), nullable=True)
+
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    resolved_at = Column(DateTime, nullable=True)
+    created_by_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+
+    @property
+    def tenant_id(self):
+        """Get tenant ID for RLS"""
+        return self.company_id
+
+    def __repr__(self):
+        return f"<StockReservation {self.quantity} of {self.product_id}@{self.location_id} ({self.status})>"
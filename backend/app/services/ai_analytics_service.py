@@ -8,11 +8,12 @@ from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any, Tuple
 from uuid import UUID, uuid4
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_, desc
+from sqlalchemy import func, and_, or_, desc, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 import logging
 from collections import defaultdict
 import json
-from sentence_transformers import SentenceTransformer
+import hashlib
 
 from app.models.ai_analytics import (
     AIModel, AIPrediction, DemandForecast, LeadScore,
@@ -22,7 +23,7 @@ from app.models.ai_analytics import (
 from app.models.product import Product
 from app.models.inventory import InventoryItem, StockMovement
 from app.models.contact import Contact
-from app.models.order import Order, OrderItem
+from app.models.order import Order, OrderItem, OrderLineItem
 from app.models.company import Company
 from app.schemas.ai_analytics import (
     ForecastRequest, ForecastResponse,
@@ -32,6 +33,8 @@ from app.schemas.ai_analytics import (
     SemanticSearchRequest, SemanticSearchResult, SemanticSearchResponse
 )
 from app.core.database import get_db
+from app.services.recommendation_store import co_occurrence_store
+from app.services.embedding_service import embedding_registry, query_encoder
 
 logger = logging.getLogger(__name__)
 
@@ -272,20 +275,19 @@ class ProductRecommendationService:
     """Service for product recommendations"""
     def __init__(self, db: Session):
         self.db = db
-        self.co_occurrence = self._build_co_occurrence_matrix()
+        self.store = co_occurrence_store
 
-    def _build_co_occurrence_matrix(self) -> defaultdict:
-        order_items = self.db.query(OrderItem.order_id, OrderItem.product_id).limit(10000).all()
-        matrix = defaultdict(lambda: defaultdict(int))
+    def _rank_related(self, company_id: UUID, product_ids: set, num_recs: int, reason: str) -> List[Dict]:
+        """Top co-purchased products from the tenant's precomputed matrix"""
+        matrix = self.store.get(company_id) if company_id else None
+        if matrix is None:
+            logger.warning(f"No co-occurrence model for company {company_id}; skipping recommendations")
+            return []
 
-        from itertools import groupby, combinations
-        order_items.sort(key=lambda x: x.order_id)
-        for _, items in groupby(order_items, key=lambda x: x.order_id):
-            product_ids = {item.product_id for item in items}
-            for p1, p2 in combinations(product_ids, 2):
-                matrix[p1][p2] += 1
-                matrix[p2][p1] += 1
-        return matrix
+        sorted_recs = matrix.top_k(product_ids, num_recs, exclude=product_ids)
+        max_score = sorted_recs[0][1] if sorted_recs else 1.0
+
+        return [{'product_id': UUID(pid), 'score': score / max_score, 'reason': reason} for pid, score in sorted_recs]
 
     def get_recommendations(self, entity_type: str, entity_id: UUID, num_recs: int = 5) -> List[RecommendationResponse]:
         if entity_type == "order":
@@ -316,33 +318,17 @@ class ProductRecommendationService:
         return responses
 
     def _get_order_recommendations(self, order_id: UUID, num_recs: int) -> List[Dict]:
-        order_product_ids = {item.product_id for item in self.db.query(OrderItem.product_id).filter(OrderItem.order_id == order_id).all()}
+        company_id = self.db.query(Order.company_id).filter(Order.id == order_id).scalar()
+        order_product_ids = {item.product_id for item in self.db.query(OrderLineItem.product_id).filter(OrderLineItem.order_id == order_id).all()}
 
-        scores = defaultdict(int)
-        for pid in order_product_ids:
-            for related_pid, count in self.co_occurrence.get(pid, {}).items():
-                if related_pid not in order_product_ids:
-                    scores[related_pid] += count
-
-        sorted_recs = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:num_recs]
-        max_score = sorted_recs[0][1] if sorted_recs else 1.0
-
-        return [{'product_id': pid, 'score': score / max_score, 'reason': 'Frequently bought together'} for pid, score in sorted_recs]
+        return self._rank_related(company_id, order_product_ids, num_recs, 'Frequently bought together')
 
     def _get_customer_recommendations(self, customer_id: UUID, num_recs: int) -> List[Dict]:
-        history = self.db.query(OrderItem.product_id).join(Order).filter(Order.contact_id == customer_id).all()
+        company_id = self.db.query(Contact.company_id).filter(Contact.id == customer_id).scalar()
+        history = self.db.query(OrderLineItem.product_id).join(Order).filter(Order.contact_id == customer_id).all()
         purchased_ids = {item.product_id for item in history}
 
-        scores = defaultdict(int)
-        for pid in purchased_ids:
-            for related_pid, count in self.co_occurrence.get(pid, {}).items():
-                if related_pid not in purchased_ids:
-                    scores[related_pid] += count
-
-        sorted_recs = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:num_recs]
-        max_score = sorted_recs[0][1] if sorted_recs else 1.0
-
-        return [{'product_id': pid, 'score': score / max_score, 'reason': 'Based on your purchase history'} for pid, score in sorted_recs]
+        return self._rank_related(company_id, purchased_ids, num_recs, 'Based on your purchase history')
 
 
 class ChurnPredictionService:
@@ -412,40 +398,93 @@ class SemanticSearchService:
     """Service for semantic (vector) search"""
     def __init__(self, db: Session):
         self.db = db
-        # Use a small, fast model for sentence embeddings
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-
-    def index_batch(self, entity_type: str, items: List[Dict[str, Any]]):
-        """Index a batch of items (products, contacts, etc.)"""
-        logger.info(f"Indexing {len(items)} items of type {entity_type}")
-
-        texts_to_embed = [item['content'] for item in items]
-        embeddings = self.model.encode(texts_to_embed, convert_to_numpy=True)
-
-        for i, item in enumerate(items):
-            existing = self.db.query(SemanticIndex).filter_by(entity_type=entity_type, entity_id=item['id']).first()
-            if existing:
-                existing.content = item['content']
-                existing.embedding = embeddings[i]
-                existing.metadata = item.get('metadata', {})
-                existing.updated_at = datetime.utcnow()
-            else:
-                new_index = SemanticIndex(
-                    entity_type=entity_type,
-                    entity_id=item['id'],
-                    content=item['content'],
-                    embedding=embeddings[i],
-                    metadata=item.get('metadata', {})
-                )
-                self.db.add(new_index)
-
+        # Shared per process; loaded on first use (or at startup with EMBEDDING_WARMUP)
+        self.encoder = query_encoder
+
+    @property
+    def model(self):
+        return embedding_registry.get(self.encoder.model_name)
+
+    @staticmethod
+    def content_hash(content: str) -> str:
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def index_batch(self, entity_type: str, items: List[Dict[str, Any]]) -> int:
+        """
+        Index a batch of items (products, contacts, etc.)
+
+        Items whose content hash matches the stored row are skipped; the rest
+        are encoded in one pass and written with a single upsert statement.
+        Returns the number of rows written.
+        """
+        for item in items:
+            item['content_hash'] = self.content_hash(item['content'])
+
+        stored = dict(self.db.execute(
+            select(SemanticIndex.entity_id, SemanticIndex.content_hash).where(
+                SemanticIndex.entity_type == entity_type,
+                SemanticIndex.entity_id.in_([item['id'] for item in items])
+            )
+        ).all())
+        changed = [item for item in items if stored.get(item['id']) != item['content_hash']]
+        if not changed:
+            return 0
+
+        embeddings = self.model.encode([item['content'] for item in changed], convert_to_numpy=True)
+        now = datetime.utcnow()
+
+        table = SemanticIndex.__table__
+        stmt = pg_insert(table).values([
+            {
+                'id': uuid4(),
+                'entity_type': entity_type,
+                'entity_id': item['id'],
+                'content': item['content'],
+                'content_hash': item['content_hash'],
+                'embedding': embeddings[i],
+                'metadata': item.get('metadata', {}),
+                'indexed_at': now,
+                'updated_at': now
+            }
+            for i, item in enumerate(changed)
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.entity_type, table.c.entity_id],
+            set_={
+                'content': stmt.excluded.content,
+                'content_hash': stmt.excluded.content_hash,
+                'embedding': stmt.excluded.embedding,
+                'metadata': stmt.excluded['metadata'],
+                'updated_at': stmt.excluded.updated_at
+            }
+        )
+        self.db.execute(stmt)
         self.db.commit()
-        logger.info(f"Finished indexing {len(items)} items.")
+
+        logger.info(f"Indexed {len(changed)} of {len(items)} {entity_type} items ({len(items) - len(changed)} unchanged)")
+        return len(changed)
+
+    def index_stream(self, entity_type: str, query, to_item, chunk_size: int = 500) -> Dict[str, int]:
+        """
+        Index the rows of a Core select in server-side-cursor chunks
+
+        to_item maps a result row to {'id', 'content', 'metadata'}; only one
+        chunk is held in memory at a time. Rows are read on their own
+        connection so committing each chunk does not close the cursor.
+        """
+        seen = written = 0
+        with self.db.get_bind().connect() as reader:
+            result = reader.execution_options(yield_per=chunk_size).execute(query)
+            for rows in result.partitions():
+                items = [to_item(row) for row in rows]
+                seen += len(items)
+                written += self.index_batch(entity_type, items)
+        return {'seen': seen, 'written': written}
 
     def search(self, request: SemanticSearchRequest) -> SemanticSearchResponse:
         """Perform a semantic search"""
         start_time = datetime.now()
-        query_embedding = self.model.encode(request.query)
+        query_embedding = self.encoder.encode(request.query)
 
         query = self.db.query(
             SemanticIndex,
@@ -458,7 +497,7 @@ class SemanticSearchService:
         # Add metadata filters if any
         if request.filters:
             for key, value in request.filters.items():
-                query = query.filter(SemanticIndex.metadata[key].astext == str(value))
+                query = query.filter(SemanticIndex.entity_metadata[key].astext == str(value))
 
         results = query.order_by('distance').limit(request.limit).all()
 
@@ -469,7 +508,7 @@ class SemanticSearchService:
                 entity_id=index.entity_id,
                 content=index.content,
                 similarity_score=1 - (distance / 2), # Normalize L2 to similarity
-                metadata=index.metadata
+                metadata=index.entity_metadata
             ))
 
         end_time = datetime.now()
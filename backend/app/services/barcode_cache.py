@@ -0,0 +1,278 @@
+"""
+TECHGURU ElevateCRM Barcode Lookup Cache
+
+Per-tenant, in-process cache in front of the exact barcode lookup used by
+warehouse scanners. Each tenant keeps an LRU of barcode -> product summary,
+a Bloom filter of every barcode it has, and a short-lived set of codes the
+database did not have. Repeat scans are served from memory. A code the filter
+has never seen still gets one indexed lookup, since the product may have been
+written where this process could not see it (another worker, a job, a Core
+insert); only the database's answer is cached, for BARCODE_NEGATIVE_TTL.
+Committed product writes in this process and realtime product_update and
+stock_update events invalidate summaries and teach the filter new barcodes;
+the filter is rebuilt periodically to shed barcodes that were removed.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import BARCODE_CACHE_REQUESTS
+from app.models.product import Product
+from app.services.model_events import add_local_listener
+from app.services.realtime_service import EventTypes, RealtimeEvent, RealtimeHub, realtime_hub
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Set membership with false positives but no false negatives"""
+
+    def __init__(self, capacity: int, error_rate: float = settings.BARCODE_FILTER_ERROR_RATE):
+        capacity = max(1, capacity)
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str) -> Iterable[int]:
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        step = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * step) % self.size for i in range(self.hash_count))
+
+    def add(self, value: str):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class TenantBarcodes:
+    """One tenant's filter of known barcodes and LRU of looked-up summaries"""
+
+    def __init__(self, known: BloomFilter, max_entries: int):
+        self.known = known
+        self.max_entries = max_entries
+        self.built_at = time.monotonic()
+        # barcode -> (product summary, expiry)
+        self.entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        # product id -> barcodes cached for it
+        self.by_product: Dict[str, Set[str]] = {}
+        # barcode -> expiry, for codes the database did not have
+        self.absent: "OrderedDict[str, float]" = OrderedDict()
+
+    def get(self, barcode: str, now: float) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(barcode)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            self.drop(barcode)
+            return None
+        self.entries.move_to_end(barcode)
+        return entry[0]
+
+    def is_absent(self, barcode: str, now: float) -> bool:
+        expires_at = self.absent.get(barcode)
+        if expires_at is None:
+            return False
+        if expires_at <= now:
+            del self.absent[barcode]
+            return False
+        return True
+
+    def put_absent(self, barcode: str, expires_at: float):
+        self.absent.pop(barcode, None)
+        self.absent[barcode] = expires_at
+        while len(self.absent) > self.max_entries:
+            self.absent.popitem(last=False)
+
+    def put(self, barcode: str, summary: Dict[str, Any], expires_at: float):
+        self.drop(barcode)
+        self.entries[barcode] = (summary, expires_at)
+        self.by_product.setdefault(summary["id"], set()).add(barcode)
+        while len(self.entries) > self.max_entries:
+            self.drop(next(iter(self.entries)))
+
+    def drop(self, barcode: str):
+        entry = self.entries.pop(barcode, None)
+        if entry is None:
+            return
+        barcodes = self.by_product.get(entry[0]["id"])
+        if barcodes is not None:
+            barcodes.discard(barcode)
+            if not barcodes:
+                del self.by_product[entry[0]["id"]]
+
+    def invalidate_product(self, product_id: str):
+        for barcode in list(self.by_product.get(product_id, ())):
+            self.drop(barcode)
+
+    def add_barcode(self, barcode: str):
+        """A barcode now exists (or moved to another product)"""
+        self.known.add(barcode)
+        self.absent.pop(barcode, None)
+        self.drop(barcode)
+
+
+def product_summary(product: Product) -> Dict[str, Any]:
+    """Fields returned for a scanned product"""
+    return {
+        "id": str(product.id),
+        "name": product.name,
+        "sku": product.sku,
+        "barcode": product.barcode,
+        "sale_price": float(product.sale_price) if product.sale_price else None,
+        "stock_quantity": product.stock_quantity
+    }
+
+
+class BarcodeCache:
+    """Process-wide LRU of per-tenant barcode caches"""
+
+    def __init__(self, hub: Optional[RealtimeHub] = None,
+                 max_entries: int = settings.BARCODE_CACHE_SIZE,
+                 ttl: float = settings.BARCODE_CACHE_TTL,
+                 max_tenants: int = settings.BARCODE_CACHE_MAX_TENANTS,
+                 max_age: float = settings.BARCODE_FILTER_MAX_AGE,
+                 negative_ttl: float = settings.BARCODE_NEGATIVE_TTL):
+        self.hub = hub
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_tenants = max_tenants
+        self.max_age = max_age
+        # tenant_id -> TenantBarcodes, least recently used first
+        self.tenants: "OrderedDict[str, TenantBarcodes]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Lock] = {}
+        # Barcodes announced while a tenant's filter was being loaded
+        self._arrived: Dict[str, Set[str]] = {}
+
+    async def lookup(self, db: AsyncSession, tenant_id: str, barcode: str) -> Optional[Dict[str, Any]]:
+        """Summary of the tenant's product with exactly this barcode, or None"""
+        tenant_id = str(tenant_id)
+        tenant = await self._get_tenant(db, tenant_id)
+
+        now = time.monotonic()
+        summary = tenant.get(barcode, now)
+        if summary is not None:
+            BARCODE_CACHE_REQUESTS.labels("hit").inc()
+            return summary
+        if tenant.is_absent(barcode, now):
+            BARCODE_CACHE_REQUESTS.labels("unknown").inc()
+            return None
+
+        # A filter miss is only a hint: the product may have been written
+        # where this process could not see it, so the index has the last word
+        BARCODE_CACHE_REQUESTS.labels("miss").inc()
+        result = await db.execute(
+            select(Product)
+            .where(Product.company_id == uuid.UUID(tenant_id), Product.barcode == barcode)
+            .limit(1)
+        )
+        product = result.scalar_one_or_none()
+        if product is None:
+            # Kept briefly, so a lagging replica cannot pin a stale miss
+            tenant.put_absent(barcode, now + self.negative_ttl)
+            return None
+        if barcode not in tenant.known:
+            tenant.known.add(barcode)
+        summary = product_summary(product)
+        tenant.put(barcode, summary, now + self.ttl)
+        return summary
+
+    async def _get_tenant(self, db: AsyncSession, tenant_id: str) -> TenantBarcodes:
+        tenant = self.tenants.get(tenant_id)
+        if tenant is not None and time.monotonic() - tenant.built_at < self.max_age:
+            self.tenants.move_to_end(tenant_id)
+            return tenant
+
+        lock = self._loading.setdefault(tenant_id, asyncio.Lock())
+        async with lock:
+            tenant = self.tenants.get(tenant_id)
+            if tenant is None or time.monotonic() - tenant.built_at >= self.max_age:
+                tenant = await self._load(db, tenant_id)
+                self._store(tenant_id, tenant)
+            else:
+                self.tenants.move_to_end(tenant_id)
+        self._loading.pop(tenant_id, None)
+        return tenant
+
+    async def _load(self, db: AsyncSession, tenant_id: str) -> TenantBarcodes:
+        # Listen first so barcodes created during the load are not missed
+        if self.hub:
+            self.hub.add_listener(tenant_id, self.handle_event)
+        self._arrived[tenant_id] = set()
+        try:
+            result = await db.execute(
+                select(Product.barcode)
+                .where(Product.company_id == uuid.UUID(tenant_id), Product.barcode.isnot(None))
+            )
+            barcodes = result.scalars().all()
+        finally:
+            arrived = self._arrived.pop(tenant_id)
+
+        # Headroom for barcodes added before the next rebuild
+        known = BloomFilter(2 * (len(barcodes) + len(arrived)) + 1024)
+        for barcode in barcodes:
+            known.add(barcode)
+        for barcode in arrived:
+            known.add(barcode)
+
+        logger.debug(f"Loaded barcode filter for tenant {tenant_id}: {len(barcodes)} barcodes")
+        return TenantBarcodes(known, self.max_entries)
+
+    def _store(self, tenant_id: str, tenant: TenantBarcodes):
+        self.tenants[tenant_id] = tenant
+        self.tenants.move_to_end(tenant_id)
+        while len(self.tenants) > self.max_tenants:
+            self.discard(next(iter(self.tenants)))
+
+    def discard(self, tenant_id: str):
+        """Forget a tenant's cache; it is reloaded on next use"""
+        self.tenants.pop(tenant_id, None)
+        if self.hub and tenant_id not in self._arrived:
+            self.hub.remove_listener(tenant_id, self.handle_event)
+
+    def note_barcode(self, tenant_id: str, barcode: Optional[str]):
+        """Record a barcode written by this process without waiting for its event"""
+        if not barcode:
+            return
+        tenant = self.tenants.get(str(tenant_id))
+        if tenant is not None:
+            tenant.add_barcode(barcode)
+        if str(tenant_id) in self._arrived:
+            self._arrived[str(tenant_id)].add(barcode)
+
+    def product_changed(self, tenant_id: str, product_id: Optional[str], barcode: Optional[str] = None):
+        """Drop a changed product's cached summaries and learn its barcode"""
+        self.note_barcode(tenant_id, barcode)
+        tenant = self.tenants.get(str(tenant_id))
+        if tenant is not None and product_id:
+            tenant.invalidate_product(str(product_id))
+
+    def apply_event(self, event: RealtimeEvent):
+        """Invalidate summaries of changed products and learn new barcodes"""
+        if event.event_type == EventTypes.PRODUCT_UPDATE:
+            barcode = event.data.get("barcode") if event.data.get("action") != "deleted" else None
+            self.product_changed(event.tenant_id, event.data.get("product_id"), barcode)
+        elif event.event_type == EventTypes.STOCK_UPDATE:
+            self.product_changed(event.tenant_id, event.data.get("product_id"))
+
+    async def handle_event(self, event: RealtimeEvent):
+        """Apply a realtime event from another worker (or echoed from this one)"""
+        self.apply_event(event)
+
+
+# Global instance
+barcode_cache = BarcodeCache(realtime_hub)
+add_local_listener(barcode_cache.apply_event)
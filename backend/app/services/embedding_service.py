@@ -0,0 +1,146 @@
+"""
+Embedding Model Pool and Batching Encoder
+
+Sentence-transformer models are loaded once per process and shared by every
+SemanticSearchService. Query encoding goes through a micro-batching encoder:
+concurrent callers are collected for a few milliseconds and encoded in one
+forward pass on a dedicated thread, with an LRU cache in front for repeated
+queries.
+"""
+import logging
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _load_sentence_transformer(model_name: str):
+    # Imported lazily: torch and the model weights are only needed by AI paths
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+class EmbeddingModelRegistry:
+    """Process-wide cache of loaded embedding models"""
+
+    def __init__(self, loader: Callable[[str], Any] = _load_sentence_transformer):
+        self.loader = loader
+        self._models: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str = settings.EMBEDDING_MODEL_NAME):
+        """Return the model, loading it on first use"""
+        model = self._models.get(model_name)
+        if model is not None:
+            return model
+
+        with self._lock:
+            model = self._models.get(model_name)
+            if model is None:
+                logger.info(f"Loading embedding model {model_name}")
+                model = self.loader(model_name)
+                self._models[model_name] = model
+        return model
+
+    def warm(self, model_names: Optional[List[str]] = None):
+        """Load models ahead of the first request"""
+        for model_name in model_names or [settings.EMBEDDING_MODEL_NAME]:
+            self.get(model_name).encode(["warmup"])
+
+
+class BatchingEncoder:
+    """Coalesces concurrent encode() calls into batched forward passes"""
+
+    def __init__(self, registry: EmbeddingModelRegistry,
+                 model_name: str = settings.EMBEDDING_MODEL_NAME,
+                 max_batch: int = settings.EMBEDDING_MAX_BATCH,
+                 max_wait_ms: float = settings.EMBEDDING_BATCH_WINDOW_MS,
+                 cache_size: int = settings.EMBEDDING_CACHE_SIZE):
+        self.registry = registry
+        self.model_name = model_name
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+    def encode(self, text: str):
+        """Embedding for one query, blocking until its batch has run"""
+        return self.submit(text).result()
+
+    def submit(self, text: str) -> Future:
+        key = " ".join(text.split())
+        future: Future = Future()
+
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                future.set_result(cached)
+                return future
+
+        self._ensure_worker()
+        self._queue.put((key, future))
+        return future
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name=f"embedding-encoder-{self.model_name}", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                # Collect whatever else arrives within the batching window
+                while len(batch) < self.max_batch:
+                    batch.append(self._queue.get(timeout=self.max_wait))
+            except queue.Empty:
+                pass
+            self._encode_batch(batch)
+
+    def _encode_batch(self, batch: List[Tuple[str, Future]]):
+        # Identical queries in one window share a row of the forward pass
+        texts = list(dict.fromkeys(key for key, _ in batch))
+        try:
+            embeddings = self.registry.get(self.model_name).encode(texts, convert_to_numpy=True)
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(texts)} failed: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        results = {}
+        for text, embedding in zip(texts, embeddings):
+            if hasattr(embedding, "setflags"):
+                # Shared through the cache, so make it immutable
+                embedding.setflags(write=False)
+            results[text] = embedding
+
+        with self._cache_lock:
+            for text, embedding in results.items():
+                self._cache[text] = embedding
+                self._cache.move_to_end(text)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        for key, future in batch:
+            future.set_result(results[key])
+
+
+# Global instances
+embedding_registry = EmbeddingModelRegistry()
+query_encoder = BatchingEncoder(embedding_registry)
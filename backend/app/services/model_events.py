@@ -0,0 +1,164 @@
+"""
+TECHGURU ElevateCRM Model Change Events
+
+Turns committed ORM writes into realtime change events, whatever endpoint,
+service or job made them. Changes to tracked models are collected at flush;
+once the transaction commits, the events go to this process's local
+listeners at once (so in-memory caches here never wait on Redis) and are
+published for every other worker. Sessions without an event loop, such as
+Celery tasks, publish over a synchronous Redis client.
+
+Orders moving into a completed status are queued for the recommendation
+worker, which folds them into the tenant's co-occurrence model.
+"""
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+import redis
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.core.commit_tasks import run_after_commit
+from app.core.config import settings
+from app.models.contact import Contact
+from app.models.order import COMPLETED_ORDER_STATUSES, Order
+from app.models.product import Product
+from app.services.realtime_service import (
+    RealtimeEvent, contact_update_event, get_realtime_service, product_update_event, realtime_service
+)
+from app.workers.celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+MODEL_CHANGES_KEY = "model_changes"
+COMPLETED_ORDERS_KEY = "completed_orders"
+
+# Enqueued by name; importing the AI task module would load the analytics stack
+UPDATE_RECOMMENDATIONS_TASK = "ai.update_recommendations"
+
+
+def _contact_event(tenant_id: str, entity_id: str, action: str, values: Dict[str, Any]) -> RealtimeEvent:
+    return contact_update_event(
+        tenant_id, entity_id, action,
+        display_name=values.get("display_name"), company_name=values.get("company_name"),
+        first_name=values.get("first_name"), last_name=values.get("last_name")
+    )
+
+
+def _product_event(tenant_id: str, entity_id: str, action: str, values: Dict[str, Any]) -> RealtimeEvent:
+    return product_update_event(
+        tenant_id, entity_id, action,
+        name=values.get("name"), sku=values.get("sku"), barcode=values.get("barcode")
+    )
+
+
+# Tracked model -> builds its change event from (tenant, id, action, loaded values)
+TRACKED_MODELS: Dict[type, Callable[[str, str, str, Dict[str, Any]], RealtimeEvent]] = {
+    Contact: _contact_event,
+    Product: _product_event,
+}
+
+# Called synchronously with each committed change event, in this process only
+_local_listeners: List[Callable[[RealtimeEvent], None]] = []
+
+
+def add_local_listener(callback: Callable[[RealtimeEvent], None]):
+    """Apply committed change events to in-process state as soon as they commit"""
+    if callback not in _local_listeners:
+        _local_listeners.append(callback)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session: Session, flush_context):
+    changes = session.info.setdefault(MODEL_CHANGES_KEY, {})
+    for action, instances in (("created", session.new), ("updated", session.dirty), ("deleted", session.deleted)):
+        for instance in instances:
+            model = type(instance)
+            if model is Order and action != "deleted":
+                _collect_completed_order(session, instance, created=action == "created")
+                continue
+            if model not in TRACKED_MODELS:
+                continue
+            if action == "updated" and not session.is_modified(instance, include_collections=False):
+                continue
+            # Read loaded values only; attribute loads are not allowed mid-flush
+            values = dict(inspect(instance).dict)
+            key = (model, str(values.get("company_id")), str(values.get("id")))
+            if key in changes and changes[key][0] == "created" and action == "updated":
+                action = "created"
+            changes[key] = (action, values)
+
+
+def _collect_completed_order(session: Session, order: Order, created: bool):
+    state = inspect(order)
+    if state.dict.get("status") not in COMPLETED_ORDER_STATUSES:
+        return
+    if not created and not state.attrs.status.history.has_changes():
+        return
+    completed = session.info.setdefault(COMPLETED_ORDERS_KEY, {})
+    completed.setdefault(str(state.dict.get("company_id")), set()).add(str(state.dict.get("id")))
+
+
+@event.listens_for(Session, "after_commit")
+def _queue_recommendation_updates(session: Session):
+    completed: Dict[str, Set[str]] = session.info.pop(COMPLETED_ORDERS_KEY, None)
+    if not completed:
+        return
+    # Enqueueing talks to the broker, so keep it off the event loop
+    if run_after_commit(asyncio.to_thread(_enqueue_recommendation_updates, completed),
+                        "recommendation updates") is None:
+        _enqueue_recommendation_updates(completed)
+
+
+def _enqueue_recommendation_updates(completed: Dict[str, Set[str]]):
+    for company_id, order_ids in completed.items():
+        try:
+            celery_app.send_task(
+                UPDATE_RECOMMENDATIONS_TASK, args=[company_id], kwargs={"order_ids": sorted(order_ids)}
+            )
+        except Exception as e:
+            # The periodic sweep still picks these orders up
+            logger.error(f"Failed to queue recommendation update for company {company_id}: {e}")
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_changes(session: Session):
+    changes: Dict[Tuple[type, str, str], Tuple[str, Dict[str, Any]]] = session.info.pop(MODEL_CHANGES_KEY, None)
+    if not changes:
+        return
+
+    events = [
+        TRACKED_MODELS[model](tenant_id, entity_id, action, values)
+        for (model, tenant_id, entity_id), (action, values) in changes.items()
+    ]
+    for change_event in events:
+        for callback in _local_listeners:
+            try:
+                callback(change_event)
+            except Exception as e:
+                logger.error(f"Error applying {change_event.event_type} locally: {e}")
+
+    if run_after_commit(_publish(events), "model change events") is None:
+        _publish_sync(events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session: Session):
+    session.info.pop(MODEL_CHANGES_KEY, None)
+    session.info.pop(COMPLETED_ORDERS_KEY, None)
+
+
+async def _publish(events: List[RealtimeEvent]):
+    service = await get_realtime_service()
+    await service.publish_events(events)
+
+
+def _publish_sync(events: List[RealtimeEvent]):
+    client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    try:
+        realtime_service.publish_events_sync(client, events)
+    except Exception as e:
+        logger.error(f"Failed to publish model change events: {e}")
+    finally:
+        client.close()
@@ -7,13 +7,19 @@ Handles stock level changes, order updates, and other real-time events.
 import json
 import asyncio
 import logging
-from typing import Dict, Any, Optional, Callable, Set
+import re
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Callable, Set, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 import uuid
 
 import redis.asyncio as redis
+from redis.exceptions import NoScriptError
 from ..core.config import settings
+from ..core.metrics import InstrumentedRedis
 
 logger = logging.getLogger(__name__)
 
@@ -26,19 +32,23 @@ class RealtimeEvent:
     data: Dict[str, Any]
     timestamp: datetime
     event_id: str = None
+    stream_id: Optional[str] = None  # Position in the tenant's event stream, set by Redis
     
     def __post_init__(self):
         if not self.event_id:
             self.event_id = str(uuid.uuid4())
     
     def to_dict(self) -> Dict[str, Any]:
-        return {
+        data = {
             "event_type": self.event_type,
             "tenant_id": self.tenant_id,
             "data": self.data,
             "timestamp": self.timestamp.isoformat(),
             "event_id": self.event_id
         }
+        if self.stream_id:
+            data["stream_id"] = self.stream_id
+        return data
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "RealtimeEvent":
@@ -47,18 +57,337 @@ class RealtimeEvent:
             tenant_id=data["tenant_id"],
             data=data["data"],
             timestamp=datetime.fromisoformat(data["timestamp"]),
-            event_id=data.get("event_id")
+            event_id=data.get("event_id"),
+            stream_id=data.get("stream_id")
         )
 
 
+STREAM_ID_PATTERN = re.compile(r"^\d+-\d+$")
+
+
+def stream_id_key(stream_id: str) -> Tuple[int, int]:
+    """Sortable form of a Redis stream entry ID ("<ms>-<seq>")"""
+    ms, _, seq = stream_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+# Appends an event to the tenant's capped stream and publishes it, stamped
+# with its stream ID, to the tenant and global channels in one round trip.
+# KEYS: stream, tenant channel, global channel; ARGV: maxlen, event JSON object
+APPEND_EVENT_SCRIPT = """
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'event', ARGV[2])
+local payload = string.sub(ARGV[2], 1, -2) .. ',"stream_id":"' .. id .. '"}'
+redis.call('PUBLISH', KEYS[2], payload)
+redis.call('PUBLISH', KEYS[3], payload)
+return id
+"""
+
+
+class EventBatch:
+    """Events collected for a single pipelined publish"""
+    
+    def __init__(self, service: "RealtimeService"):
+        self.service = service
+        self.events: List[RealtimeEvent] = []
+    
+    def add(self, event: RealtimeEvent):
+        self.events.append(event)
+    
+    async def flush(self):
+        events, self.events = self.events, []
+        await self.service.publish_events(events)
+
+
+class BufferedPublisher(EventBatch):
+    """
+    Fire-and-forget publishing for high-volume producers
+    
+    While active (``async with``), events published through the service are
+    buffered and flushed in the background every flush_interval_ms or as soon
+    as max_events are waiting, so producers never wait on Redis. If Redis
+    falls behind, the oldest events beyond max_pending are dropped.
+    """
+    
+    def __init__(self, service: "RealtimeService",
+                 max_events: int = settings.REALTIME_BUFFER_MAX_EVENTS,
+                 flush_interval_ms: float = settings.REALTIME_BUFFER_FLUSH_MS,
+                 max_pending: int = settings.REALTIME_BUFFER_MAX_PENDING):
+        super().__init__(service)
+        self.max_events = max_events
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._token = None
+    
+    def add(self, event: RealtimeEvent):
+        self.events.append(event)
+        if len(self.events) > self.max_pending:
+            overflow = len(self.events) - self.max_pending
+            del self.events[:overflow]
+            self.dropped += overflow
+        if len(self.events) >= self.max_events:
+            self._wake.set()
+    
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self.events:
+                await self.flush()
+    
+    async def __aenter__(self) -> "BufferedPublisher":
+        self._task = asyncio.create_task(self._run())
+        self._token = _event_sink.set(self)
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        _event_sink.reset(self._token)
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        await self.flush()
+        if self.dropped:
+            logger.warning(f"Buffered publisher dropped {self.dropped} events")
+
+
+class TokenBucket:
+    """Allows rate events per second with bursts of up to capacity"""
+    
+    def __init__(self, rate: float, capacity: int, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = now
+    
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def take(self, now: float) -> bool:
+        self.refill(now)
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+    
+    @property
+    def full(self) -> bool:
+        return self.tokens >= self.capacity
+
+
+class StockUpdateCoalescer:
+    """
+    Merges bursts of stock_update events before they are published
+    
+    Updates for the same (tenant, product, location) arriving within one
+    window become a single event carrying the first old_quantity, the latest
+    new_quantity and the summed change. Each tenant's merged updates are then
+    rate limited by a token bucket; when updates are dropped, the tenant gets
+    one dashboard_refresh once its burst is over so clients can catch up.
+    """
+    
+    def __init__(self, service: "RealtimeService",
+                 window_ms: float = settings.REALTIME_STOCK_COALESCE_MS,
+                 rate_per_second: float = settings.REALTIME_STOCK_RATE_PER_SECOND,
+                 burst: int = settings.REALTIME_STOCK_RATE_BURST):
+        self.service = service
+        self.window = window_ms / 1000.0
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        # (tenant_id, product_id, location_id) -> merged event, in arrival order
+        self.pending: Dict[Tuple[str, str, Optional[str]], RealtimeEvent] = {}
+        self.buckets: Dict[str, TokenBucket] = {}
+        # tenant_id -> updates dropped since its last dashboard_refresh
+        self.dropped: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+    
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+    
+    def add(self, event: RealtimeEvent):
+        key = (event.tenant_id, str(event.data.get("product_id")), event.data.get("location_id"))
+        merged = self.pending.get(key)
+        if merged is None:
+            self.pending[key] = event
+        else:
+            merged.data["new_quantity"] = event.data["new_quantity"]
+            merged.data["change"] += event.data["change"]
+            merged.data["coalesced"] = merged.data.get("coalesced", 1) + 1
+            merged.timestamp = event.timestamp
+            if "reserved" in event.data:
+                merged.data["reserved"] = event.data["reserved"]
+            if "locations" in event.data:
+                merged.data["locations"] = self._merge_locations(
+                    merged.data.get("locations", []), event.data["locations"]
+                )
+        
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    @staticmethod
+    def _merge_locations(first: List[Dict[str, Any]], latest: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Per-location changes of two product-wide updates, merged the same way"""
+        merged = {entry["location_id"]: dict(entry) for entry in first}
+        for entry in latest:
+            if entry["location_id"] in merged:
+                merged[entry["location_id"]]["new_quantity"] = entry["new_quantity"]
+            else:
+                merged[entry["location_id"]] = dict(entry)
+        return list(merged.values())
+    
+    async def _run(self):
+        # Runs only while there is something to flush or a refresh still owed
+        while self.pending or self.dropped:
+            await asyncio.sleep(self.window)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush coalesced stock updates: {e}")
+    
+    def _allow(self, tenant_id: str, now: float) -> bool:
+        if self.rate_per_second <= 0:
+            return True
+        bucket = self.buckets.get(tenant_id)
+        if bucket is None:
+            bucket = self.buckets[tenant_id] = TokenBucket(self.rate_per_second, self.burst, now)
+        return bucket.take(now)
+    
+    async def flush(self, force: bool = False):
+        """Publish the merged updates, plus any catch-up refreshes that are due"""
+        pending, self.pending = self.pending, {}
+        now = time.monotonic()
+        
+        events = []
+        for (tenant_id, _, _), event in pending.items():
+            if self._allow(tenant_id, now):
+                events.append(event)
+            else:
+                self.dropped[tenant_id] = self.dropped.get(tenant_id, 0) + 1
+        
+        active_tenants = {tenant_id for tenant_id, _, _ in pending}
+        for tenant_id, dropped in list(self.dropped.items()):
+            if not force and (tenant_id in active_tenants or not self._allow(tenant_id, now)):
+                continue
+            del self.dropped[tenant_id]
+            logger.info(f"Throttled {dropped} stock updates for tenant {tenant_id}")
+            events.append(RealtimeEvent(
+                event_type="dashboard_refresh",
+                tenant_id=tenant_id,
+                data={"reason": "stock_updates_throttled", "dropped_updates": dropped},
+                timestamp=datetime.utcnow()
+            ))
+        
+        # Idle tenants are back at full capacity; forget their buckets
+        for tenant_id in [t for t, bucket in self.buckets.items() if t not in self.dropped]:
+            bucket = self.buckets[tenant_id]
+            bucket.refill(now)
+            if bucket.full:
+                del self.buckets[tenant_id]
+        
+        await self.service.publish_events(events)
+    
+    async def close(self):
+        """Stop the flush task and publish whatever is still held"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush(force=True)
+
+
+def stock_update_event(tenant_id: str, product_id: str, old_quantity: int, new_quantity: int,
+                       location_id: Optional[str] = None,
+                       locations: Optional[List[Dict[str, Any]]] = None,
+                       reserved: Optional[int] = None) -> RealtimeEvent:
+    """
+    Stock level update event
+    
+    Quantities are on hand. Product-wide updates (no location_id) may carry
+    the per-location changes as ``locations``: [{location_id, old_quantity,
+    new_quantity}]. ``reserved`` is the reserved quantity after the change,
+    sent when reservations moved.
+    """
+    data = {
+        "product_id": product_id,
+        "old_quantity": old_quantity,
+        "new_quantity": new_quantity,
+        "location_id": location_id,
+        "change": new_quantity - old_quantity
+    }
+    if locations is not None:
+        data["locations"] = locations
+    if reserved is not None:
+        data["reserved"] = reserved
+    return RealtimeEvent(
+        event_type="stock_update",
+        tenant_id=tenant_id,
+        data=data,
+        timestamp=datetime.utcnow()
+    )
+
+
+def contact_update_event(tenant_id: str, contact_id: str, action: str,
+                         display_name: Optional[str] = None, company_name: Optional[str] = None,
+                         first_name: Optional[str] = None, last_name: Optional[str] = None) -> RealtimeEvent:
+    """Contact created/updated/deleted event"""
+    return RealtimeEvent(
+        event_type="contact_update",
+        tenant_id=tenant_id,
+        data={
+            "contact_id": contact_id,
+            "action": action,
+            "display_name": display_name,
+            "company_name": company_name,
+            "first_name": first_name,
+            "last_name": last_name
+        },
+        timestamp=datetime.utcnow()
+    )
+
+
+def product_update_event(tenant_id: str, product_id: str, action: str,
+                         name: Optional[str] = None, sku: Optional[str] = None,
+                         barcode: Optional[str] = None) -> RealtimeEvent:
+    """Product created/updated/deleted event"""
+    return RealtimeEvent(
+        event_type="product_update",
+        tenant_id=tenant_id,
+        data={
+            "product_id": product_id,
+            "action": action,
+            "name": name,
+            "sku": sku,
+            "barcode": barcode
+        },
+        timestamp=datetime.utcnow()
+    )
+
+
+# Batch or buffer that publish_event() hands events to instead of Redis
+_event_sink: ContextVar[Optional[EventBatch]] = ContextVar("realtime_event_sink", default=None)
+
+
 class RealtimeService:
     """Redis-based real-time pub/sub service"""
     
-    def __init__(self):
+    def __init__(self, stock_coalesce_ms: float = settings.REALTIME_STOCK_COALESCE_MS):
         self.redis_pool: Optional[redis.ConnectionPool] = None
         self.redis_client: Optional[redis.Redis] = None
         self.subscriptions: Dict[str, Set[Callable]] = {}
         self.is_connected = False
+        self._append_sha: Optional[str] = None
+        self.stock_updates = StockUpdateCoalescer(self, window_ms=stock_coalesce_ms)
         
     async def connect(self):
         """Initialize Redis connection"""
@@ -71,7 +400,7 @@ class RealtimeService:
                 decode_responses=True
             )
             
-            self.redis_client = redis.Redis(connection_pool=self.redis_pool)
+            self.redis_client = InstrumentedRedis(connection_pool=self.redis_pool)
             
             # Test connection
             await self.redis_client.ping()
@@ -86,6 +415,8 @@ class RealtimeService:
     
     async def disconnect(self):
         """Close Redis connection"""
+        if self.is_connected:
+            await self.stock_updates.close()
         if self.redis_client:
             await self.redis_client.aclose()
         if self.redis_pool:
@@ -101,29 +432,119 @@ class RealtimeService:
         """Generate Redis channel name for global events"""
         return f"elevatecrm:global:{event_type}"
     
+    def _get_stream_key(self, tenant_id: str) -> str:
+        """Redis stream holding a tenant's recent events for replay"""
+        return f"elevatecrm-stream:{tenant_id}"
+    
     async def publish_event(self, event: RealtimeEvent):
-        """Publish an event to Redis"""
+        """Publish an event to Redis (or to the active batch/buffer)"""
+        if event.event_type == "stock_update" and self.stock_updates.enabled and self.is_connected:
+            self.stock_updates.add(event)
+            return
+        sink = _event_sink.get()
+        if sink is not None:
+            sink.add(event)
+            return
+        await self.publish_events([event])
+    
+    async def publish_events(self, events: List[RealtimeEvent]):
+        """Publish events to their tenant and global channels in one pipelined round trip"""
+        if not events:
+            return
         if not self.is_connected:
             logger.warning("Redis not connected, skipping event publish")
             return
             
         try:
-            # Tenant-specific channel
-            tenant_channel = self._get_channel_name(event.event_type, event.tenant_id)
-            
-            # Global channel for system-wide events
-            global_channel = self._get_global_channel_name(event.event_type)
-            
-            event_data = json.dumps(event.to_dict())
+            try:
+                stream_ids = await self._append_events(events)
+            except NoScriptError:
+                # Redis restarted or flushed its script cache
+                self._append_sha = None
+                stream_ids = await self._append_events(events)
             
-            # Publish to both channels
-            await self.redis_client.publish(tenant_channel, event_data)
-            await self.redis_client.publish(global_channel, event_data)
+            for event, stream_id in zip(events, stream_ids):
+                event.stream_id = stream_id
             
-            logger.debug(f"Published event {event.event_type} for tenant {event.tenant_id}")
+            logger.debug(f"Published {len(events)} event(s)")
             
         except Exception as e:
-            logger.error(f"Failed to publish event: {e}")
+            logger.error(f"Failed to publish {len(events)} event(s): {e}")
+    
+    async def _append_events(self, events: List[RealtimeEvent]) -> List[str]:
+        if self._append_sha is None:
+            self._append_sha = await self.redis_client.script_load(APPEND_EVENT_SCRIPT)
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        for event in events:
+            pipe.evalsha(
+                self._append_sha, 3,
+                self._get_stream_key(event.tenant_id),
+                self._get_channel_name(event.event_type, event.tenant_id),
+                self._get_global_channel_name(event.event_type),
+                settings.REALTIME_STREAM_MAXLEN,
+                json.dumps(event.to_dict())
+            )
+        return await pipe.execute()
+    
+    async def read_events_since(self, tenant_id: str, last_event_id: str,
+                                limit: int = settings.REALTIME_REPLAY_LIMIT) -> Tuple[List[RealtimeEvent], bool]:
+        """
+        Events a tenant published after last_event_id, oldest first
+        
+        Also returns whether the replay is complete. It is not when more than
+        limit events were missed or the stream has already been trimmed past
+        last_event_id; the client should then reload instead.
+        """
+        if not STREAM_ID_PATTERN.match(last_event_id or ""):
+            raise ValueError(f"Invalid event stream ID: {last_event_id!r}")
+        if not self.is_connected:
+            return [], False
+        
+        key = self._get_stream_key(tenant_id)
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.xrange(key, min="-", max="+", count=1)
+        pipe.xrange(key, min=f"({last_event_id}", max="+", count=limit + 1)
+        oldest, entries = await pipe.execute()
+        
+        complete = len(entries) <= limit
+        if oldest and stream_id_key(oldest[0][0]) > stream_id_key(last_event_id):
+            complete = False
+        
+        events = []
+        for stream_id, fields in entries[:limit]:
+            try:
+                event = RealtimeEvent.from_dict(json.loads(fields["event"]))
+            except Exception as e:
+                logger.error(f"Skipping unreadable stream entry {stream_id}: {e}")
+                continue
+            event.stream_id = stream_id
+            events.append(event)
+        return events, complete
+    
+    @asynccontextmanager
+    async def batch(self):
+        """
+        Collect events published inside the block and flush them together
+        
+        Nested batches (or a batch inside a buffered publisher) join the
+        outer one.
+        """
+        if _event_sink.get() is not None:
+            yield
+            return
+        
+        batch = EventBatch(self)
+        token = _event_sink.set(batch)
+        try:
+            yield
+        finally:
+            _event_sink.reset(token)
+            await batch.flush()
+    
+    def buffered(self, **options) -> BufferedPublisher:
+        """Background-flushed publisher, used as ``async with service.buffered():``"""
+        return BufferedPublisher(self, **options)
     
     async def subscribe_to_tenant_events(
         self, 
@@ -165,21 +586,36 @@ class RealtimeService:
     
     async def publish_stock_update(self, tenant_id: str, product_id: str, 
                                  old_quantity: int, new_quantity: int, 
-                                 location_id: Optional[str] = None):
-        """Publish stock level update event"""
-        event = RealtimeEvent(
-            event_type="stock_update",
-            tenant_id=tenant_id,
-            data={
-                "product_id": product_id,
-                "old_quantity": old_quantity,
-                "new_quantity": new_quantity,
-                "location_id": location_id,
-                "change": new_quantity - old_quantity
-            },
-            timestamp=datetime.utcnow()
-        )
-        await self.publish_event(event)
+                                 location_id: Optional[str] = None,
+                                 locations: Optional[List[Dict[str, Any]]] = None,
+                                 reserved: Optional[int] = None):
+        """Publish stock level update event (see stock_update_event)"""
+        await self.publish_event(stock_update_event(
+            tenant_id, product_id, old_quantity, new_quantity, location_id, locations, reserved
+        ))
+    
+    def publish_events_sync(self, client, events: List[RealtimeEvent]):
+        """
+        Publish events over a synchronous Redis client
+        
+        For code without an event loop, such as Celery tasks. Bypasses
+        batching and stock update coalescing.
+        """
+        if not events:
+            return
+        append = client.register_script(APPEND_EVENT_SCRIPT)
+        pipe = client.pipeline(transaction=False)
+        for event in events:
+            append(
+                keys=[
+                    self._get_stream_key(event.tenant_id),
+                    self._get_channel_name(event.event_type, event.tenant_id),
+                    self._get_global_channel_name(event.event_type)
+                ],
+                args=[settings.REALTIME_STREAM_MAXLEN, json.dumps(event.to_dict())],
+                client=pipe
+            )
+        pipe.execute()
     
     async def publish_order_update(self, tenant_id: str, order_id: str, 
                                  status: str, previous_status: Optional[str] = None):
@@ -196,6 +632,22 @@ class RealtimeService:
         )
         await self.publish_event(event)
     
+    async def publish_contact_update(self, tenant_id: str, contact_id: str, action: str,
+                                     display_name: Optional[str] = None,
+                                     company_name: Optional[str] = None,
+                                     first_name: Optional[str] = None,
+                                     last_name: Optional[str] = None):
+        """Publish contact created/updated/deleted event"""
+        await self.publish_event(contact_update_event(
+            tenant_id, contact_id, action, display_name, company_name, first_name, last_name
+        ))
+    
+    async def publish_product_update(self, tenant_id: str, product_id: str, action: str,
+                                     name: Optional[str] = None, sku: Optional[str] = None,
+                                     barcode: Optional[str] = None):
+        """Publish product created/updated/deleted event"""
+        await self.publish_event(product_update_event(tenant_id, product_id, action, name, sku, barcode))
+    
     async def publish_user_activity(self, tenant_id: str, user_id: str, 
                                   activity_type: str, details: Dict[str, Any]):
         """Publish user activity event"""
@@ -230,8 +682,130 @@ class RealtimeService:
         await self.publish_event(event)
 
 
+class RealtimeHub:
+    """
+    Per-process Redis subscriber that fans events out to local listeners.
+
+    A single pattern subscription on ``elevatecrm:*`` replaces the per-socket
+    pubsub connections, so Redis load scales with worker processes rather
+    than with open WebSockets. Messages are decoded once and dispatched in
+    memory to the listeners registered for the event's tenant.
+    """
+
+    CHANNEL_PATTERN = "elevatecrm:*"
+    RECONNECT_DELAY = 1.0
+    MAX_RECONNECT_DELAY = 30.0
+
+    def __init__(self, service: RealtimeService):
+        self.service = service
+        # tenant_id -> set of async callbacks
+        self.listeners: Dict[str, Set[Callable]] = {}
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def add_listener(self, tenant_id: str, callback: Callable[[RealtimeEvent], Any]):
+        """Register a callback for every event published for a tenant"""
+        self.listeners.setdefault(tenant_id, set()).add(callback)
+
+    def remove_listener(self, tenant_id: str, callback: Callable[[RealtimeEvent], Any]):
+        """Unregister a tenant callback"""
+        callbacks = self.listeners.get(tenant_id)
+        if not callbacks:
+            return
+        callbacks.discard(callback)
+        if not callbacks:
+            del self.listeners[tenant_id]
+
+    async def start(self):
+        """Start the shared subscriber task (idempotent)"""
+        if self.is_running:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the shared subscriber task"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._close_pubsub()
+
+    async def _close_pubsub(self):
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.reset()
+            except Exception as e:
+                logger.debug(f"Error closing realtime hub pubsub: {e}")
+            self._pubsub = None
+
+    async def _run(self):
+        """Listen on the pattern subscription, reconnecting with backoff"""
+        delay = self.RECONNECT_DELAY
+        while True:
+            try:
+                if not self.service.is_connected:
+                    await self.service.connect()
+
+                self._pubsub = self.service.redis_client.pubsub()
+                await self._pubsub.psubscribe(self.CHANNEL_PATTERN)
+                logger.info(f"Realtime hub subscribed to {self.CHANNEL_PATTERN}")
+                delay = self.RECONNECT_DELAY
+
+                async for message in self._pubsub.listen():
+                    await self.handle_message(message)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Realtime hub subscription error: {e}")
+
+            await self._close_pubsub()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.MAX_RECONNECT_DELAY)
+
+    async def handle_message(self, message: Dict[str, Any]):
+        """Decode a raw pubsub message once and dispatch it by tenant"""
+        if message.get("type") != "pmessage":
+            return
+
+        # Channel layout: elevatecrm:{tenant_id}:{event_type}
+        parts = message["channel"].split(":", 2)
+        if len(parts) != 3:
+            return
+        tenant_id = parts[1]
+
+        # Global channel mirrors every tenant event, and tenants without
+        # local sockets do not need the payload decoded at all
+        if tenant_id == "global" or tenant_id not in self.listeners:
+            return
+
+        try:
+            event = RealtimeEvent.from_dict(json.loads(message["data"]))
+        except Exception as e:
+            logger.error(f"Error decoding real-time event: {e}")
+            return
+
+        await self.dispatch(event)
+
+    async def dispatch(self, event: RealtimeEvent):
+        """Deliver a decoded event to the listeners of its tenant"""
+        for callback in list(self.listeners.get(event.tenant_id, ())):
+            try:
+                await callback(event)
+            except Exception as e:
+                logger.error(f"Error processing real-time event: {e}")
+
+
 # Global instance
 realtime_service = RealtimeService()
+realtime_hub = RealtimeHub(realtime_service)
 
 
 async def get_realtime_service() -> RealtimeService:
@@ -0,0 +1,326 @@
+"""
+Product Co-occurrence Store
+
+Per-tenant sparse "bought together" counts for ProductRecommendationService.
+Each tenant's matrix is kept as NumPy CSR arrays (indptr/indices/data plus the
+product id for every row) in a versioned directory on disk. Background jobs
+build it from the order history and fold newly completed orders into it; API
+workers memory-map the current version, so a recommendation is a handful of
+sparse row reads plus a top-k selection.
+
+Layout::
+
+    {RECOMMENDATION_MODEL_DIR}/{company_id}/CURRENT       -> "v000042"
+    {RECOMMENDATION_MODEL_DIR}/{company_id}/v000042/*.npy + meta.json
+"""
+import fcntl
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.models.order import COMPLETED_ORDER_STATUSES, Order, OrderLineItem
+
+logger = logging.getLogger(__name__)
+
+ARRAY_NAMES = ("product_ids", "indptr", "indices", "data")
+KEEP_VERSIONS = 2
+
+
+class CoOccurrenceMatrix:
+    """Immutable CSR co-occurrence counts for one tenant"""
+
+    def __init__(self, product_ids: np.ndarray, indptr: np.ndarray,
+                 indices: np.ndarray, data: np.ndarray, meta: Optional[Dict] = None):
+        self.product_ids = product_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.meta = meta or {}
+        self.positions: Dict[str, int] = {str(pid): i for i, pid in enumerate(product_ids)}
+
+    @property
+    def nnz(self) -> int:
+        return int(self.indptr[-1]) if len(self.indptr) else 0
+
+    @classmethod
+    def from_pairs(cls, product_ids: Sequence[str], rows: np.ndarray, cols: np.ndarray,
+                   counts: np.ndarray, meta: Optional[Dict] = None) -> "CoOccurrenceMatrix":
+        """Build a CSR matrix from COO triples, summing duplicate (row, col) pairs"""
+        size = len(product_ids)
+        rows = np.asarray(rows, dtype=np.int32)
+        cols = np.asarray(cols, dtype=np.int32)
+        counts = np.asarray(counts, dtype=np.float32)
+
+        if len(rows):
+            order = np.lexsort((cols, rows))
+            rows, cols, counts = rows[order], cols[order], counts[order]
+            starts = np.flatnonzero(np.r_[True, (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])])
+            counts = np.add.reduceat(counts, starts)
+            rows, cols = rows[starts], cols[starts]
+
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=size), out=indptr[1:])
+
+        return cls(np.asarray(product_ids, dtype="<U36"), indptr, cols, counts, meta)
+
+    def to_pairs(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """COO view of the matrix"""
+        rows = np.repeat(np.arange(len(self.product_ids), dtype=np.int32), np.diff(self.indptr))
+        return rows, np.asarray(self.indices), np.asarray(self.data)
+
+    def merge_baskets(self, baskets: Iterable[Iterable[str]], meta: Optional[Dict] = None) -> "CoOccurrenceMatrix":
+        """Return a new matrix with each basket's product pairs counted once more"""
+        product_ids = [str(pid) for pid in self.product_ids]
+        positions = dict(self.positions)
+        new_rows, new_cols = [], []
+
+        for basket in baskets:
+            indexes = []
+            for pid in {str(p) for p in basket if p}:
+                if pid not in positions:
+                    positions[pid] = len(product_ids)
+                    product_ids.append(pid)
+                indexes.append(positions[pid])
+            for a in indexes:
+                for b in indexes:
+                    if a != b:
+                        new_rows.append(a)
+                        new_cols.append(b)
+
+        rows, cols, data = self.to_pairs()
+        return CoOccurrenceMatrix.from_pairs(
+            product_ids,
+            np.concatenate([rows, np.asarray(new_rows, dtype=np.int32)]),
+            np.concatenate([cols, np.asarray(new_cols, dtype=np.int32)]),
+            np.concatenate([data, np.ones(len(new_rows), dtype=np.float32)]),
+            meta if meta is not None else self.meta
+        )
+
+    def top_k(self, product_ids: Iterable, k: int, exclude: Iterable = ()) -> List[Tuple[str, float]]:
+        """Products most often bought with product_ids, as (product_id, count) pairs"""
+        seeds = [self.positions[str(pid)] for pid in product_ids if str(pid) in self.positions]
+        if not seeds or k <= 0:
+            return []
+
+        scores = np.zeros(len(self.product_ids), dtype=np.float32)
+        for row in seeds:
+            start, end = self.indptr[row], self.indptr[row + 1]
+            np.add.at(scores, self.indices[start:end], self.data[start:end])
+
+        excluded = [self.positions[str(pid)] for pid in exclude if str(pid) in self.positions]
+        scores[seeds] = 0
+        scores[excluded] = 0
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            # Keep everything tied with the k-th best so ties are broken below, not by argpartition
+            kth_best = np.partition(scores[candidates], -k)[-k]
+            candidates = candidates[scores[candidates] >= kth_best]
+        # Highest count first, ties by product id
+        candidates = candidates[np.lexsort((self.product_ids[candidates], -scores[candidates]))[:k]]
+        return [(str(self.product_ids[i]), float(scores[i])) for i in candidates]
+
+    def save(self, tenant_dir: str) -> str:
+        """Write a new version and atomically point CURRENT at it"""
+        os.makedirs(tenant_dir, exist_ok=True)
+        current = _read_current(tenant_dir)
+        version = f"v{(int(current[1:]) + 1) if current else 1:06d}"
+        version_dir = os.path.join(tenant_dir, version)
+        staging_dir = version_dir + ".tmp"
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        os.makedirs(staging_dir)
+
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(staging_dir, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(staging_dir, "meta.json"), "w") as f:
+            json.dump(self.meta, f)
+        os.replace(staging_dir, version_dir)
+
+        pointer = os.path.join(tenant_dir, "CURRENT.tmp")
+        with open(pointer, "w") as f:
+            f.write(version)
+        os.replace(pointer, os.path.join(tenant_dir, "CURRENT"))
+
+        _prune_versions(tenant_dir, version)
+        return version
+
+    @classmethod
+    def load(cls, tenant_dir: str, mmap: bool = True) -> Optional["CoOccurrenceMatrix"]:
+        """Open the current version, memory-mapped read-only by default"""
+        version = _read_current(tenant_dir)
+        if not version:
+            return None
+
+        version_dir = os.path.join(tenant_dir, version)
+        arrays = {
+            name: np.load(os.path.join(version_dir, f"{name}.npy"), mmap_mode="r" if mmap else None)
+            for name in ARRAY_NAMES
+        }
+        with open(os.path.join(version_dir, "meta.json")) as f:
+            meta = json.load(f)
+        meta["version"] = version
+        return cls(meta=meta, **arrays)
+
+
+def _read_current(tenant_dir: str) -> Optional[str]:
+    try:
+        with open(os.path.join(tenant_dir, "CURRENT")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _prune_versions(tenant_dir: str, current: str):
+    versions = sorted(name for name in os.listdir(tenant_dir)
+                      if name.startswith("v") and not name.endswith(".tmp"))
+    for name in versions[:-KEEP_VERSIONS]:
+        if name != current:
+            # Readers that still map an old version keep their open file handles
+            shutil.rmtree(os.path.join(tenant_dir, name), ignore_errors=True)
+
+
+class CoOccurrenceStore:
+    """Process-wide access to per-tenant matrices, reloaded when a new version lands"""
+
+    def __init__(self, base_dir: str = settings.RECOMMENDATION_MODEL_DIR,
+                 check_interval: float = settings.RECOMMENDATION_MODEL_CHECK_INTERVAL):
+        self.base_dir = base_dir
+        self.check_interval = check_interval
+        # company_id -> (checked_at, matrix)
+        self._matrices: Dict[str, Tuple[float, Optional[CoOccurrenceMatrix]]] = {}
+        self._lock = threading.Lock()
+
+    def tenant_dir(self, company_id) -> str:
+        return os.path.join(self.base_dir, str(company_id))
+
+    def get(self, company_id) -> Optional[CoOccurrenceMatrix]:
+        """Current matrix for a tenant, or None if no model has been built yet"""
+        key = str(company_id)
+        now = time.monotonic()
+        cached = self._matrices.get(key)
+        if cached and now - cached[0] < self.check_interval:
+            return cached[1]
+
+        with self._lock:
+            cached = self._matrices.get(key)
+            matrix = cached[1] if cached else None
+            version = _read_current(self.tenant_dir(key))
+            if version and (matrix is None or matrix.meta.get("version") != version):
+                matrix = CoOccurrenceMatrix.load(self.tenant_dir(key))
+            self._matrices[key] = (now, matrix)
+            return matrix
+
+    @contextmanager
+    def _writer(self, company_id):
+        """Serialize writers for a tenant across worker processes"""
+        tenant_dir = self.tenant_dir(company_id)
+        os.makedirs(tenant_dir, exist_ok=True)
+        with open(os.path.join(tenant_dir, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield tenant_dir
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def rebuild(self, db: Session, company_id) -> CoOccurrenceMatrix:
+        """Recount every completed order of a tenant in the database"""
+        built_at = datetime.utcnow()
+        left, right = aliased(OrderLineItem), aliased(OrderLineItem)
+        pairs = db.query(
+            left.product_id, right.product_id, func.count(func.distinct(left.order_id))
+        ).join(
+            right, and_(right.order_id == left.order_id, right.product_id != left.product_id)
+        ).join(
+            Order, Order.id == left.order_id
+        ).filter(
+            Order.company_id == company_id,
+            Order.status.in_(COMPLETED_ORDER_STATUSES),
+            left.product_id.isnot(None),
+            right.product_id.isnot(None)
+        ).group_by(left.product_id, right.product_id).all()
+
+        positions: Dict[str, int] = {}
+        rows, cols, counts = [], [], []
+        for p1, p2, count in pairs:
+            for pid in (str(p1), str(p2)):
+                if pid not in positions:
+                    positions[pid] = len(positions)
+            rows.append(positions[str(p1)])
+            cols.append(positions[str(p2)])
+            counts.append(count)
+
+        matrix = CoOccurrenceMatrix.from_pairs(
+            list(positions), np.asarray(rows), np.asarray(cols), np.asarray(counts),
+            meta={"built_at": built_at.isoformat(), "updated_through": built_at.isoformat(),
+                  "applied_orders": []}
+        )
+        with self._writer(company_id) as tenant_dir:
+            version = matrix.save(tenant_dir)
+        logger.info(f"Built co-occurrence model {version} for company {company_id}: "
+                    f"{len(positions)} products, {matrix.nnz} pairs")
+        return matrix
+
+    def apply_completed_orders(self, db: Session, company_id,
+                               order_ids: Optional[Sequence] = None) -> Optional[CoOccurrenceMatrix]:
+        """
+        Fold orders completed since the last update into the tenant's matrix
+
+        With explicit order_ids only those orders are applied. Orders already
+        applied since the last full rebuild are skipped, so retries are safe.
+        """
+        with self._writer(company_id) as tenant_dir:
+            current = CoOccurrenceMatrix.load(tenant_dir, mmap=False)
+            if current is None:
+                logger.info(f"No co-occurrence model for company {company_id} yet; rebuilding")
+                return None
+
+            applied: Set[str] = set(current.meta.get("applied_orders", []))
+            since = datetime.fromisoformat(current.meta["updated_through"])
+            checked_at = datetime.utcnow()
+
+            query = db.query(Order.id).filter(
+                Order.company_id == company_id,
+                Order.status.in_(COMPLETED_ORDER_STATUSES)
+            )
+            if order_ids is not None:
+                query = query.filter(Order.id.in_(order_ids))
+            else:
+                query = query.filter(Order.updated_at > since)
+            new_orders = [oid for (oid,) in query.all() if str(oid) not in applied]
+            if not new_orders:
+                return current
+
+            baskets: Dict[str, List[str]] = {}
+            for order_id, product_id in db.query(OrderLineItem.order_id, OrderLineItem.product_id).filter(
+                OrderLineItem.order_id.in_(new_orders),
+                OrderLineItem.product_id.isnot(None)
+            ).all():
+                baskets.setdefault(str(order_id), []).append(str(product_id))
+
+            meta = dict(current.meta)
+            meta.pop("version", None)
+            meta["applied_orders"] = sorted(applied | {str(oid) for oid in new_orders})
+            if order_ids is None:
+                meta["updated_through"] = checked_at.isoformat()
+
+            matrix = current.merge_baskets(baskets.values(), meta)
+            version = matrix.save(tenant_dir)
+
+        logger.info(f"Applied {len(new_orders)} orders to co-occurrence model {version} "
+                    f"for company {company_id}")
+        return matrix
+
+
+# Global instance
+co_occurrence_store = CoOccurrenceStore()
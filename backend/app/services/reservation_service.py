@@ -0,0 +1,309 @@
+"""
+Stock Reservation Service
+
+Reserves stock for checkouts without read-then-write races or row locks held
+across requests. Every transition is a single conditional UPDATE ... RETURNING:
+reserving only succeeds while the location has enough unreserved stock, and a
+reservation only moves out of "active" once, so concurrent checkouts, releases
+and the expiry sweeper never double count. Rows are locked in the order
+reservation, stock level, product, matching stock moves.
+"""
+import logging
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import bindparam, func, select, tuple_, update
+
+from app.core.config import settings
+from app.models.product import Product, StockLevel, StockMove, StockReservation
+from app.services.stock_service import adjust_product_totals
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = "active"
+
+
+class LevelState(NamedTuple):
+    """A stock level's quantities after a reservation changed it"""
+    company_id: uuid.UUID
+    product_id: uuid.UUID
+    location_id: uuid.UUID
+    on_hand: int
+    reserved: int
+
+
+class InsufficientStock(ValueError):
+    """Not enough unreserved stock at the location"""
+
+    def __init__(self, product_id, location_id, requested: int):
+        super().__init__(f"Insufficient stock of {product_id} at {location_id} to reserve {requested}")
+        self.product_id = product_id
+        self.location_id = location_id
+        self.requested = requested
+
+
+async def reserve_stock(db, company_id, product_id, location_id, quantity: int,
+                        ttl_seconds: int = settings.STOCK_RESERVATION_TTL_SECONDS,
+                        reference_type: Optional[str] = None, reference_id=None,
+                        created_by_id=None, now: Optional[datetime] = None) -> Tuple[StockReservation, LevelState]:
+    """
+    Hold quantity at a location until it is committed, released or expires
+
+    Returns the reservation and the level it holds stock at. Raises
+    InsufficientStock, leaving nothing reserved, when the location's on-hand
+    minus reserved quantity is below the request.
+    """
+    if quantity <= 0:
+        raise ValueError("Reservation quantity must be positive")
+    now = now or datetime.utcnow()
+
+    result = await db.execute(
+        update(StockLevel)
+        .where(
+            (StockLevel.company_id == company_id)
+            & (StockLevel.product_id == product_id)
+            & (StockLevel.location_id == location_id)
+            & (StockLevel.on_hand - StockLevel.reserved >= quantity)
+        )
+        .values(reserved=StockLevel.reserved + quantity, updated_at=now)
+        .returning(StockLevel.on_hand, StockLevel.reserved)
+        .execution_options(synchronize_session=False)
+    )
+    level = result.one_or_none()
+    if level is None:
+        raise InsufficientStock(product_id, location_id, quantity)
+
+    await adjust_product_totals(db, company_id, product_id, reserved_delta=quantity)
+
+    reservation = StockReservation(
+        company_id=company_id,
+        product_id=product_id,
+        location_id=location_id,
+        quantity=quantity,
+        status=ACTIVE,
+        reference_type=reference_type,
+        reference_id=reference_id,
+        expires_at=now + timedelta(seconds=ttl_seconds),
+        created_at=now,
+        created_by_id=created_by_id
+    )
+    db.add(reservation)
+    await db.flush()
+    return reservation, LevelState(company_id, product_id, location_id, level.on_hand, level.reserved)
+
+
+async def reserve_stock_lines(db, company_id, lines: Iterable[Tuple[uuid.UUID, uuid.UUID, int]],
+                              **options) -> List[Tuple[StockReservation, LevelState]]:
+    """
+    Reserve several (product_id, location_id, quantity) lines
+
+    Lines are reserved in key order so concurrent multi-line checkouts take
+    their row locks in the same order. On InsufficientStock the caller must
+    roll back the earlier lines.
+    """
+    return [
+        await reserve_stock(db, company_id, product_id, location_id, quantity, **options)
+        for product_id, location_id, quantity in sorted(lines, key=lambda line: (line[0], line[1]))
+    ]
+
+
+def _resolve(company_id, reservation_id, status: str, now: datetime, unexpired: bool = False):
+    """Move an active reservation to status, returning what it held"""
+    condition = (
+        (StockReservation.id == reservation_id)
+        & (StockReservation.company_id == company_id)
+        & (StockReservation.status == ACTIVE)
+    )
+    if unexpired:
+        condition = condition & (StockReservation.expires_at > now)
+    return (
+        update(StockReservation)
+        .where(condition)
+        .values(status=status, resolved_at=now)
+        .returning(
+            StockReservation.product_id,
+            StockReservation.location_id,
+            StockReservation.quantity,
+            StockReservation.reference_type,
+            StockReservation.reference_id
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def _unreserve(db, company_id, held, now: datetime, shipped: bool = False) -> LevelState:
+    """Take a resolved reservation's quantity off its level (and on-hand if shipped)"""
+    on_hand_delta = -held.quantity if shipped else 0
+    level = (await db.execute(
+        update(StockLevel)
+        .where(
+            (StockLevel.company_id == company_id)
+            & (StockLevel.product_id == held.product_id)
+            & (StockLevel.location_id == held.location_id)
+        )
+        .values(
+            on_hand=StockLevel.on_hand + on_hand_delta,
+            reserved=StockLevel.reserved - held.quantity,
+            updated_at=now
+        )
+        .returning(StockLevel.on_hand, StockLevel.reserved)
+        .execution_options(synchronize_session=False)
+    )).one()
+    await adjust_product_totals(
+        db, company_id, held.product_id, on_hand_delta=on_hand_delta, reserved_delta=-held.quantity
+    )
+    return LevelState(company_id, held.product_id, held.location_id, level.on_hand, level.reserved)
+
+
+async def release_reservation(db, company_id, reservation_id,
+                              now: Optional[datetime] = None) -> Optional[LevelState]:
+    """Return a reservation's stock; None if it was not active"""
+    now = now or datetime.utcnow()
+    held = (await db.execute(_resolve(company_id, reservation_id, "released", now))).one_or_none()
+    if held is None:
+        return None
+    return await _unreserve(db, company_id, held, now)
+
+
+async def commit_reservation(db, company_id, reservation_id, created_by_id,
+                             now: Optional[datetime] = None) -> Optional[Tuple[StockMove, LevelState]]:
+    """
+    Ship a reservation's stock
+
+    Records a completed outbound StockMove and takes the quantity off both
+    on-hand and reserved. Returns the move and the level after it, or None
+    if the reservation is not active or has expired.
+    """
+    now = now or datetime.utcnow()
+    held = (await db.execute(
+        _resolve(company_id, reservation_id, "committed", now, unexpired=True)
+    )).one_or_none()
+    if held is None:
+        return None
+
+    level = await _unreserve(db, company_id, held, now, shipped=True)
+
+    # Already applied to the stock levels above; do not pass to apply_stock_move
+    move = StockMove(
+        company_id=company_id,
+        product_id=held.product_id,
+        from_location_id=held.location_id,
+        to_location_id=None,
+        quantity=held.quantity,
+        movement_type="sale",
+        reference_type=held.reference_type or "reservation",
+        reference_id=held.reference_id or reservation_id,
+        status="completed",
+        moved_at=now,
+        created_by_id=created_by_id
+    )
+    db.add(move)
+    await db.flush()
+    return move, level
+
+
+def expired_reservations_statement(now: datetime, limit: int = settings.STOCK_RESERVATION_SWEEP_BATCH):
+    """
+    Mark up to limit overdue reservations expired, oldest first
+
+    Walks idx_stock_reservations_expiry; rows another sweeper or a checkout
+    has locked are skipped rather than waited on.
+    """
+    overdue = (
+        select(StockReservation.id)
+        .where((StockReservation.status == ACTIVE) & (StockReservation.expires_at <= now))
+        .order_by(StockReservation.expires_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    return (
+        update(StockReservation)
+        .where(StockReservation.id.in_(overdue.scalar_subquery()) & (StockReservation.status == ACTIVE))
+        .values(status="expired", resolved_at=now)
+        .returning(
+            StockReservation.company_id,
+            StockReservation.product_id,
+            StockReservation.location_id,
+            StockReservation.quantity
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def expired_release_statements(expired, now: datetime) -> list:
+    """(statement, params) pairs returning the stock of expired reservations"""
+    levels = defaultdict(int)
+    products = defaultdict(int)
+    for company_id, product_id, location_id, quantity in expired:
+        levels[(company_id, product_id, location_id)] += quantity
+        products[(company_id, product_id)] += quantity
+    if not levels:
+        return []
+
+    level_table = StockLevel.__table__
+    product_table = Product.__table__
+    return [
+        (
+            update(level_table)
+            .where(
+                (level_table.c.company_id == bindparam("b_company_id"))
+                & (level_table.c.product_id == bindparam("b_product_id"))
+                & (level_table.c.location_id == bindparam("b_location_id"))
+            )
+            .values(reserved=level_table.c.reserved - bindparam("b_quantity"), updated_at=now),
+            [
+                {"b_company_id": c, "b_product_id": p, "b_location_id": l, "b_quantity": q}
+                for (c, p, l), q in sorted(levels.items())
+            ]
+        ),
+        (
+            update(product_table)
+            .where(
+                (product_table.c.company_id == bindparam("b_company_id"))
+                & (product_table.c.id == bindparam("b_product_id"))
+            )
+            .values(
+                reserved_quantity=func.coalesce(product_table.c.reserved_quantity, 0) - bindparam("b_quantity")
+            ),
+            [
+                {"b_company_id": c, "b_product_id": p, "b_quantity": q}
+                for (c, p), q in sorted(products.items())
+            ]
+        ),
+    ]
+
+
+def released_levels_statement(expired):
+    """
+    Current state of the levels expired reservations held stock at
+
+    Read after expired_release_statements; the rows are locked by that
+    update, so the quantities are exact.
+    """
+    keys = sorted({(company_id, product_id, location_id) for company_id, product_id, location_id, _ in expired})
+    return (
+        select(
+            StockLevel.company_id,
+            StockLevel.product_id,
+            StockLevel.location_id,
+            StockLevel.on_hand,
+            StockLevel.reserved
+        )
+        .where(tuple_(StockLevel.company_id, StockLevel.product_id, StockLevel.location_id).in_(keys))
+        .order_by(StockLevel.company_id, StockLevel.product_id, StockLevel.location_id)
+    )
+
+
+async def expire_reservations(db, now: Optional[datetime] = None,
+                              limit: int = settings.STOCK_RESERVATION_SWEEP_BATCH) -> Tuple[int, List[LevelState]]:
+    """Expire one batch of overdue reservations; returns how many and the levels they freed"""
+    now = now or datetime.utcnow()
+    expired = (await db.execute(expired_reservations_statement(now, limit))).all()
+    if not expired:
+        return 0, []
+    for statement, params in expired_release_statements(expired, now):
+        await db.execute(statement, params)
+    levels = (await db.execute(released_levels_statement(expired))).all()
+    return len(expired), [LevelState(*level) for level in levels]
@@ -0,0 +1,182 @@
+"""
+TECHGURU ElevateCRM Search Result Cache
+
+Tenant-versioned Redis cache for search responses. Every tenant has a
+generation counter per searchable entity that is folded into the cache key;
+writes bump the counter after their transaction commits, so stale entries are
+simply never read again and can be given long TTLs.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.commit_tasks import run_after_commit
+from app.core.config import settings
+from app.core.metrics import SEARCH_CACHE_REQUESTS, InstrumentedRedis
+
+logger = logging.getLogger(__name__)
+
+# Tables whose writes change what a search over an entity returns
+SEARCH_ENTITIES: Dict[str, str] = {
+    "contacts": "contacts",
+    "products": "products",
+    "stock_moves": "products",
+    "stock_locations": "products",
+    "stock_levels": "products",
+    "stock_reservations": "products",
+}
+
+STALE_ENTITIES_KEY = "search_cache_stale"
+
+# Redis client shared by search caching and rate limiting
+redis_client = None
+
+
+async def get_redis_client():
+    """Get Redis client for caching"""
+    global redis_client
+    if redis_client is None:
+        try:
+            redis_client = InstrumentedRedis.from_url(settings.REDIS_URL, decode_responses=True)
+            await redis_client.ping()
+        except Exception as e:
+            logger.warning(f"Redis not available for search caching: {e}")
+            redis_client = None
+    return redis_client
+
+
+class SearchCache:
+    """Generation-keyed search cache with per-key single flight"""
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Awaitable[Any]] = get_redis_client,
+        ttl: int = settings.SEARCH_CACHE_TTL
+    ):
+        self.client_factory = client_factory
+        self.ttl = ttl
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def generation_key(tenant_id: str, entity: str) -> str:
+        return f"search:gen:{tenant_id}:{entity}"
+
+    @staticmethod
+    def result_key(tenant_id: str, entity: str, generation: int, params: Dict[str, Any]) -> str:
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+        return f"search:{entity}:{tenant_id}:{generation}:{digest}"
+
+    async def get_generation(self, tenant_id: str, entity: str) -> Optional[int]:
+        """Current generation for a tenant's entity, or None if Redis is unavailable"""
+        redis_conn = await self.client_factory()
+        if not redis_conn:
+            return None
+
+        try:
+            value = await redis_conn.get(self.generation_key(tenant_id, entity))
+            return int(value or 0)
+        except Exception as e:
+            logger.error(f"Cache generation lookup failed: {e}")
+            return None
+
+    async def bump(self, tenant_id: str, entity: str):
+        """Invalidate every cached search for a tenant's entity"""
+        redis_conn = await self.client_factory()
+        if not redis_conn:
+            return
+
+        try:
+            await redis_conn.incr(self.generation_key(tenant_id, entity))
+        except Exception as e:
+            logger.error(f"Cache invalidation failed for {entity} of tenant {tenant_id}: {e}")
+
+    async def get_or_compute(
+        self,
+        tenant_id: str,
+        entity: str,
+        params: Dict[str, Any],
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+        cacheable: Optional[Callable[[], Awaitable[bool]]] = None
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Return the cached result for params, computing it on a miss
+
+        Concurrent misses for the same key in this process share a single
+        compute call. A computed result is only stored when cacheable (if
+        given) confirms it is current, e.g. it was not read from a lagging
+        replica. Returns the result and whether it came from the cache.
+        """
+        generation = await self.get_generation(tenant_id, entity)
+        if generation is None:
+            SEARCH_CACHE_REQUESTS.labels(entity, "bypass").inc()
+            return await compute(), False
+
+        key = self.result_key(tenant_id, entity, generation, params)
+        redis_conn = await self.client_factory()
+        try:
+            cached = await redis_conn.get(key)
+            if cached:
+                SEARCH_CACHE_REQUESTS.labels(entity, "hit").inc()
+                return json.loads(cached), True
+        except Exception as e:
+            logger.error(f"Cache retrieval failed: {e}")
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            SEARCH_CACHE_REQUESTS.labels(entity, "coalesced").inc()
+            result = await asyncio.shield(pending)
+            return dict(result), False
+
+        SEARCH_CACHE_REQUESTS.labels(entity, "miss").inc()
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await compute()
+        except BaseException as e:
+            future.set_exception(e)
+            # Followers re-raise it; keep the loop from logging it as unretrieved
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            self._inflight.pop(key, None)
+
+        if cacheable is not None and not await cacheable():
+            return dict(result), False
+
+        try:
+            await redis_conn.setex(key, self.ttl, json.dumps(result, default=str))
+        except Exception as e:
+            logger.error(f"Cache storage failed: {e}")
+
+        return dict(result), False
+
+
+search_cache = SearchCache()
+
+
+def mark_search_stale(session: Session, model: Any, tenant_id: Any):
+    """Queue a generation bump for the entity model belongs to once session commits"""
+    entity = SEARCH_ENTITIES.get(getattr(model, "__tablename__", None))
+    if not entity or not tenant_id:
+        return
+    session.info.setdefault(STALE_ENTITIES_KEY, set()).add((str(tenant_id), entity))
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_after_commit(session: Session):
+    stale: Set[Tuple[str, str]] = session.info.pop(STALE_ENTITIES_KEY, set())
+    # Requests finish these before responding, so their next read misses the old generation
+    for tenant_id, entity in stale:
+        run_after_commit(search_cache.bump(tenant_id, entity), f"search cache bump for {entity} of {tenant_id}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session):
+    session.info.pop(STALE_ENTITIES_KEY, None)
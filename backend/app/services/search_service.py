@@ -8,14 +8,22 @@ import json
 import logging
 from typing import Dict, List, Optional, Any, Tuple, Union
 from datetime import datetime, timedelta
+import base64
 import hashlib
 import re
+import time
+import uuid
+from decimal import Decimal
 
-from sqlalchemy import select, func, text, and_, or_, desc, asc, cast, String
+from sqlalchemy import (
+    select, func, text, and_, or_, desc, asc, cast, String, case, literal, true, false, union_all
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from sqlalchemy.dialects.postgresql import TSVECTOR
 
+from app.core.config import settings
+from app.models.company import Company
 from app.models.contact import Contact
 from app.models.product import Product
 from app.core.tenant_context import TenantContext
@@ -23,6 +31,145 @@ from app.services.tenant_service import TenantAwareService
 
 logger = logging.getLogger(__name__)
 
+# Default price facet boundaries; tenants override via settings["search"]["price_buckets"]
+DEFAULT_PRICE_BUCKETS = [0, 10, 50, 100, 500]
+PRICE_BUCKET_CACHE_TTL = 300  # seconds
+
+# tenant_id -> (loaded_at, price ranges)
+_price_bucket_cache: Dict[str, Tuple[float, List[Tuple[str, float, Optional[float]]]]] = {}
+
+# Search paths the connected database supports; set once by detect_search_capabilities()
+SEARCH_CAPABILITIES: Dict[str, bool] = {'fts': False, 'trigram': False}
+
+
+async def detect_search_capabilities(engine) -> Dict[str, bool]:
+    """
+    Probe the database for generated search vectors and pg_trgm
+    
+    Called at startup so searches pick the FTS or fuzzy path up front instead
+    of discovering a missing column by failing on every request.
+    """
+    capabilities = {'fts': False, 'trigram': False}
+    
+    if engine is not None and engine.dialect.name == 'postgresql':
+        try:
+            async with engine.connect() as conn:
+                vector_columns = await conn.scalar(text(
+                    "SELECT count(*) FROM information_schema.columns "
+                    "WHERE table_schema = current_schema() "
+                    "AND table_name IN ('contacts', 'products') "
+                    "AND column_name = 'search_vector'"
+                ))
+                trigram = await conn.scalar(text(
+                    "SELECT count(*) FROM pg_extension WHERE extname = 'pg_trgm'"
+                ))
+            capabilities['fts'] = vector_columns == 2
+            capabilities['trigram'] = bool(trigram)
+        except Exception as e:
+            logger.warning(f"Search capability detection failed, using fuzzy search: {e}")
+    
+    SEARCH_CAPABILITIES.update(capabilities)
+    logger.info(f"Search capabilities: {capabilities}")
+    return capabilities
+
+
+def build_price_ranges(boundaries: List[float]) -> List[Tuple[str, float, Optional[float]]]:
+    """Turn ascending bucket boundaries into (label, min, max) ranges"""
+    ranges = []
+    for index, lower in enumerate(boundaries):
+        if index + 1 < len(boundaries):
+            upper = boundaries[index + 1]
+            ranges.append((f"{lower:g}-{upper:g}", lower, upper))
+        else:
+            ranges.append((f"{lower:g}+", lower, None))
+    return ranges
+
+
+def _encode_cursor_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {'t': 'dt', 'v': value.isoformat()}
+    if isinstance(value, uuid.UUID):
+        return {'t': 'uuid', 'v': str(value)}
+    if isinstance(value, Decimal):
+        return {'t': 'dec', 'v': str(value)}
+    return value
+
+
+def _decode_cursor_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        kind = value.get('t')
+        if kind == 'dt':
+            return datetime.fromisoformat(value['v'])
+        if kind == 'uuid':
+            return uuid.UUID(value['v'])
+        if kind == 'dec':
+            return Decimal(value['v'])
+        raise ValueError("Invalid cursor")
+    return value
+
+
+def encode_cursor(values: List[Any], signature: str = '') -> str:
+    """Encode a sort tuple into an opaque, URL-safe keyset cursor"""
+    payload = json.dumps({'s': signature, 'v': [_encode_cursor_value(v) for v in values]})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, signature: str = '') -> List[Any]:
+    """Decode a keyset cursor, rejecting cursors issued for a different sort"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = [_decode_cursor_value(v) for v in payload['v']]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    
+    if payload.get('s') != signature:
+        raise ValueError("Cursor does not match the requested sort")
+    return values
+
+
+def keyset_condition(sort_columns: List[Tuple[Any, str]], values: List[Any]):
+    """
+    Build the "rows after this sort tuple" predicate for a NULLS LAST ordering.
+    
+    Expands to (c1 > v1) OR (c1 = v1 AND c2 > v2) OR ..., with the comparison
+    flipped for descending columns.
+    """
+    clauses = []
+    equal_prefix = []
+    
+    for (column, direction), value in zip(sort_columns, values):
+        if value is None:
+            # Only NULLs sort after NULL, and they are all equal
+            after = false()
+            equal = column.is_(None)
+        else:
+            greater = column < value if direction == 'desc' else column > value
+            after = or_(greater, column.is_(None))
+            equal = column == value
+        
+        clauses.append(and_(*equal_prefix, after))
+        equal_prefix.append(equal)
+    
+    return or_(*clauses)
+
+
+def _has_word(term: str) -> bool:
+    """Whether a term has anything for the text search parser to index"""
+    return re.search(r'\w', term) is not None
+
+
+def _tsquery_lexeme(term: str, prefix: bool = False) -> str:
+    """
+    Quote a user term as a single tsquery operand
+
+    Inside quotes the tsquery operators (& | ! : ( ) <->) are plain text, so
+    only quotes and backslashes need escaping; to_tsquery then runs the text
+    through the parser like any document.
+    """
+    escaped = term.replace('\\', '\\\\').replace("'", "''")
+    return f"'{escaped}':*" if prefix else f"'{escaped}'"
+
 
 class SearchQuery:
     """Parsed search query with support for phrases, exclusions, and operators"""
@@ -50,10 +197,13 @@ class SearchQuery:
         
         # Process phrases
         for neg, phrase in phrases:
+            words = ' '.join(word for word in phrase.split() if _has_word(word))
+            if not words:
+                continue
             if neg == '-':
-                self.excluded_phrases.append(phrase.strip())
+                self.excluded_phrases.append(words)
             else:
-                self.phrases.append(phrase.strip())
+                self.phrases.append(words)
         
         # Process remaining terms
         terms = remaining.split()
@@ -63,8 +213,9 @@ class SearchQuery:
                 continue
                 
             if term.startswith('-') and len(term) > 1:
-                self.excluded_terms.append(term[1:])
-            else:
+                if _has_word(term[1:]):
+                    self.excluded_terms.append(term[1:])
+            elif _has_word(term):
                 self.terms.append(term)
     
     def to_tsquery(self) -> str:
@@ -76,16 +227,16 @@ class SearchQuery:
         
         # Add positive terms (AND by default)
         if self.terms:
-            parts.append(' & '.join(f"'{term}':*" for term in self.terms))
+            parts.append(' & '.join(_tsquery_lexeme(term, prefix=True) for term in self.terms))
         
         # Add positive phrases
         for phrase in self.phrases:
             # Convert phrase to proximity search
             phrase_terms = phrase.split()
             if len(phrase_terms) == 1:
-                parts.append(f"'{phrase_terms[0]}':*")
+                parts.append(_tsquery_lexeme(phrase_terms[0], prefix=True))
             else:
-                parts.append(' <-> '.join(f"'{term}'" for term in phrase_terms))
+                parts.append(' <-> '.join(_tsquery_lexeme(term) for term in phrase_terms))
         
         # Combine positive parts with AND
         positive_query = ' & '.join(f"({part})" for part in parts) if parts else ''
@@ -93,13 +244,13 @@ class SearchQuery:
         # Add exclusions with AND NOT
         exclusions = []
         for term in self.excluded_terms:
-            exclusions.append(f"'{term}':*")
+            exclusions.append(_tsquery_lexeme(term, prefix=True))
         for phrase in self.excluded_phrases:
             phrase_terms = phrase.split()
             if len(phrase_terms) == 1:
-                exclusions.append(f"'{phrase_terms[0]}':*")
+                exclusions.append(_tsquery_lexeme(phrase_terms[0], prefix=True))
             else:
-                exclusions.append(' <-> '.join(f"'{term}'" for term in phrase_terms))
+                exclusions.append(' <-> '.join(_tsquery_lexeme(term) for term in phrase_terms))
         
         if exclusions:
             exclusion_query = ' | '.join(f"({excl})" for excl in exclusions)
@@ -167,7 +318,7 @@ class SearchService:
     def __init__(self, db: AsyncSession, tenant_context: TenantContext):
         self.db = db
         self.tenant_context = tenant_context
-        self.tenant_service = TenantAwareService(db, tenant_context)
+        self.tenant_service = TenantAwareService(db)
     
     def _generate_cache_key(self, entity_type: str, params: Dict[str, Any]) -> str:
         """Generate cache key for search results"""
@@ -201,43 +352,129 @@ class SearchService:
         
         return sorts
     
-    def _apply_sorting(self, query, model_class, sort_params: List[Tuple[str, str]], 
-                      has_fts_rank: bool = False):
-        """Apply sorting to query"""
-        if not sort_params:
-            # Default sorting: relevance if FTS, then by updated_at desc
-            if has_fts_rank:
-                return query.order_by(desc(text('ts_rank')), desc(model_class.updated_at))
-            else:
-                return query.order_by(desc(model_class.updated_at))
+    def _sort_columns(self, model_class, sort_params: List[Tuple[str, str]],
+                      rank_expr=None) -> List[Tuple[Any, str, Optional[str]]]:
+        """
+        Resolve the full ordering as (expression, direction, attribute) tuples.
         
-        order_clauses = []
+        The primary key is always appended as a tiebreaker so the ordering is
+        total, which keyset cursors rely on. The attribute is None for the
+        FTS rank, whose value comes from the result row instead of the entity.
+        """
+        columns = []
         
         # Add relevance ranking first if we have FTS
-        if has_fts_rank:
-            order_clauses.append(desc(text('ts_rank')))
+        if rank_expr is not None:
+            columns.append((rank_expr, 'desc', None))
+        
+        if not sort_params:
+            # Default sorting: relevance if FTS, then by updated_at desc
+            columns.append((model_class.updated_at, 'desc', 'updated_at'))
         
         for field, direction in sort_params:
-            if not hasattr(model_class, field):
+            if field not in model_class.__table__.columns or field == 'id':
                 continue
-                
-            column = getattr(model_class, field)
+            columns.append((getattr(model_class, field), direction, field))
+        
+        columns.append((model_class.id, 'asc', 'id'))
+        return columns
+    
+    def _apply_sorting(self, query, model_class, sort_params: List[Tuple[str, str]], 
+                      rank_expr=None):
+        """Apply sorting to query"""
+        order_clauses = []
+        for column, direction, _ in self._sort_columns(model_class, sort_params, rank_expr):
             if direction == 'desc':
-                order_clauses.append(desc(column))
+                order_clauses.append(desc(column).nulls_last())
             else:
-                order_clauses.append(asc(column))
+                order_clauses.append(asc(column).nulls_last())
         
         return query.order_by(*order_clauses)
     
+    async def _count_results(self, base_query, total_mode: str = 'exact') -> int:
+        """Count matching rows exactly, or estimate from planner statistics"""
+        if total_mode == 'estimate' and not self._is_sqlite():
+            try:
+                compiled = base_query.compile(
+                    dialect=self.db.bind.dialect,
+                    compile_kwargs={"literal_binds": True}
+                )
+                result = await self.db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"))
+                plan = result.scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                return int(plan[0]['Plan']['Plan Rows'])
+            except Exception as e:
+                logger.warning(f"Row estimate failed, falling back to exact count: {e}")
+        
+        count_query = select(func.count()).select_from(base_query.subquery())
+        total_result = await self.db.execute(count_query)
+        return total_result.scalar()
+    
+    async def _paginate(self, base_query, model_class, sort_params: List[Tuple[str, str]],
+                        page: int, limit: int, cursor: Optional[str] = None,
+                        total_mode: str = 'exact', rank_expr=None) -> Dict[str, Any]:
+        """
+        Count, sort and page a search query.
+        
+        With a cursor the page is located by a keyset predicate on the sort
+        tuple instead of OFFSET, so deep pages cost the same as the first.
+        Cursor pages skip the count and return a total of None; the client
+        already has it from the first page.
+        """
+        sort_columns = self._sort_columns(model_class, sort_params, rank_expr)
+        signature = f"{model_class.__tablename__}:{sort_params}:{rank_expr is not None}"
+        
+        total = None if cursor else await self._count_results(base_query, total_mode)
+        
+        query = self._apply_sorting(base_query, model_class, sort_params, rank_expr)
+        if cursor:
+            values = decode_cursor(cursor, signature)
+            if len(values) != len(sort_columns):
+                raise ValueError("Invalid cursor")
+            query = query.where(keyset_condition(
+                [(column, direction) for column, direction, _ in sort_columns], values
+            ))
+        else:
+            query = query.offset((page - 1) * limit)
+        
+        # Fetch one extra row to know whether another page exists
+        result = await self.db.execute(query.limit(limit + 1))
+        if rank_expr is not None:
+            rows = [tuple(row) for row in result.fetchall()]
+        else:
+            rows = [(entity,) for entity in result.scalars().all()]
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        next_cursor = None
+        if has_more and rows:
+            last = rows[-1]
+            next_cursor = encode_cursor([
+                last[1] if attribute is None else getattr(last[0], attribute)
+                for _, _, attribute in sort_columns
+            ], signature)
+        
+        return {
+            'results': [row[0] for row in rows],
+            'total': total,
+            'page': page,
+            'limit': limit,
+            'cursor': next_cursor
+        }
+    
     async def _search_contacts_fts(self, search_query: SearchQuery, filters: SearchFilters,
-                                 sort_params: List[Tuple[str, str]], page: int, limit: int) -> Dict[str, Any]:
+                                 sort_params: List[Tuple[str, str]], page: int, limit: int,
+                                 cursor: Optional[str] = None, total_mode: str = 'exact') -> Dict[str, Any]:
         """Full-text search for contacts"""
         tsquery = search_query.to_tsquery()
         
         # Base query with FTS ranking
+        rank_expr = func.ts_rank(Contact.search_vector, func.to_tsquery('english', tsquery))
         base_query = select(
             Contact,
-            func.ts_rank(Contact.search_vector, func.to_tsquery('english', tsquery)).label('ts_rank')
+            rank_expr.label('ts_rank')
         ).where(
             and_(
                 Contact.company_id == self.tenant_context.company_id,
@@ -250,32 +487,15 @@ class SearchService:
         if filter_conditions:
             base_query = base_query.where(and_(*filter_conditions))
         
-        # Count total results
-        count_query = select(func.count()).select_from(
-            base_query.subquery()
+        # Count, sort and paginate (keyset when a cursor is supplied)
+        return await self._paginate(
+            base_query, Contact, sort_params, page, limit,
+            cursor=cursor, total_mode=total_mode, rank_expr=rank_expr
         )
-        total_result = await self.db.execute(count_query)
-        total = total_result.scalar()
-        
-        # Apply sorting and pagination
-        query = self._apply_sorting(base_query, Contact, sort_params, has_fts_rank=True)
-        query = query.offset((page - 1) * limit).limit(limit)
-        
-        # Execute query
-        result = await self.db.execute(query)
-        rows = result.fetchall()
-        
-        contacts = [row[0] for row in rows]  # Extract Contact objects
-        
-        return {
-            'results': contacts,
-            'total': total,
-            'page': page,
-            'limit': limit
-        }
     
     async def _search_contacts_fuzzy(self, search_query: SearchQuery, filters: SearchFilters,
-                                   sort_params: List[Tuple[str, str]], page: int, limit: int) -> Dict[str, Any]:
+                                   sort_params: List[Tuple[str, str]], page: int, limit: int,
+                                   cursor: Optional[str] = None, total_mode: str = 'exact') -> Dict[str, Any]:
         """Fuzzy search for contacts using trigram similarity"""
         terms = search_query.to_fuzzy_terms()
         
@@ -293,9 +513,11 @@ class SearchService:
                     continue
                     
                 term_conditions = or_(
-                    Contact.name.op('%')(term),  # pg_trgm similarity
+                    self._name_match(Contact.display_name, term),
+                    self._name_match(Contact.first_name, term),
+                    self._name_match(Contact.last_name, term),
                     Contact.email.ilike(f'%{term}%'),
-                    Contact.company.ilike(f'%{term}%'),
+                    Contact.company_name.ilike(f'%{term}%'),
                     Contact.phone.ilike(f'%{term}%')
                 )
                 fuzzy_conditions.append(term_conditions)
@@ -317,37 +539,23 @@ class SearchService:
         if filter_conditions:
             base_query = base_query.where(and_(*filter_conditions))
         
-        # Count total results
-        count_query = select(func.count()).select_from(
-            base_query.subquery()
+        # Count, sort and paginate (keyset when a cursor is supplied)
+        return await self._paginate(
+            base_query, Contact, sort_params, page, limit,
+            cursor=cursor, total_mode=total_mode
         )
-        total_result = await self.db.execute(count_query)
-        total = total_result.scalar()
-        
-        # Apply sorting and pagination
-        query = self._apply_sorting(base_query, Contact, sort_params, has_fts_rank=False)
-        query = query.offset((page - 1) * limit).limit(limit)
-        
-        # Execute query
-        result = await self.db.execute(query)
-        contacts = result.scalars().all()
-        
-        return {
-            'results': contacts,
-            'total': total,
-            'page': page,
-            'limit': limit
-        }
     
     async def _search_products_fts(self, search_query: SearchQuery, filters: SearchFilters,
-                                 sort_params: List[Tuple[str, str]], page: int, limit: int) -> Dict[str, Any]:
+                                 sort_params: List[Tuple[str, str]], page: int, limit: int,
+                                 cursor: Optional[str] = None, total_mode: str = 'exact') -> Dict[str, Any]:
         """Full-text search for products"""
         tsquery = search_query.to_tsquery()
         
         # Base query with FTS ranking
+        rank_expr = func.ts_rank(Product.search_vector, func.to_tsquery('english', tsquery))
         base_query = select(
             Product,
-            func.ts_rank(Product.search_vector, func.to_tsquery('english', tsquery)).label('ts_rank')
+            rank_expr.label('ts_rank')
         ).where(
             and_(
                 Product.company_id == self.tenant_context.company_id,
@@ -360,32 +568,15 @@ class SearchService:
         if filter_conditions:
             base_query = base_query.where(and_(*filter_conditions))
         
-        # Count total results
-        count_query = select(func.count()).select_from(
-            base_query.subquery()
+        # Count, sort and paginate (keyset when a cursor is supplied)
+        return await self._paginate(
+            base_query, Product, sort_params, page, limit,
+            cursor=cursor, total_mode=total_mode, rank_expr=rank_expr
         )
-        total_result = await self.db.execute(count_query)
-        total = total_result.scalar()
-        
-        # Apply sorting and pagination
-        query = self._apply_sorting(base_query, Product, sort_params, has_fts_rank=True)
-        query = query.offset((page - 1) * limit).limit(limit)
-        
-        # Execute query
-        result = await self.db.execute(query)
-        rows = result.fetchall()
-        
-        products = [row[0] for row in rows]  # Extract Product objects
-        
-        return {
-            'results': products,
-            'total': total,
-            'page': page,
-            'limit': limit
-        }
     
     async def _search_products_fuzzy(self, search_query: SearchQuery, filters: SearchFilters,
-                                   sort_params: List[Tuple[str, str]], page: int, limit: int) -> Dict[str, Any]:
+                                   sort_params: List[Tuple[str, str]], page: int, limit: int,
+                                   cursor: Optional[str] = None, total_mode: str = 'exact') -> Dict[str, Any]:
         """Fuzzy search for products using trigram similarity"""
         terms = search_query.to_fuzzy_terms()
         
@@ -403,7 +594,7 @@ class SearchService:
                     continue
                     
                 term_conditions = or_(
-                    Product.name.op('%')(term),  # pg_trgm similarity
+                    self._name_match(Product.name, term),
                     Product.sku.ilike(f'%{term}%'),
                     Product.description.ilike(f'%{term}%'),
                     Product.category.ilike(f'%{term}%'),
@@ -428,165 +619,181 @@ class SearchService:
         if filter_conditions:
             base_query = base_query.where(and_(*filter_conditions))
         
-        # Count total results
-        count_query = select(func.count()).select_from(
-            base_query.subquery()
+        # Count, sort and paginate (keyset when a cursor is supplied)
+        return await self._paginate(
+            base_query, Product, sort_params, page, limit,
+            cursor=cursor, total_mode=total_mode
         )
-        total_result = await self.db.execute(count_query)
-        total = total_result.scalar()
+    
+    def _name_match(self, column, term: str):
+        """pg_trgm similarity when available, substring match otherwise"""
+        if SEARCH_CAPABILITIES['trigram']:
+            return column.op('%')(term)
+        return column.ilike(f'%{term}%')
+    
+    def _is_sqlite(self) -> bool:
+        """Whether the configured database is SQLite (no GROUPING SETS / RLS)"""
+        return settings.DATABASE_URL.startswith("sqlite")
+    
+    async def _get_price_ranges(self) -> List[Tuple[str, float, Optional[float]]]:
+        """Get price facet ranges from tenant settings (cached per process)"""
+        tenant_id = str(self.tenant_context.company_id)
+        cached = _price_bucket_cache.get(tenant_id)
+        if cached and time.monotonic() - cached[0] < PRICE_BUCKET_CACHE_TTL:
+            return cached[1]
+        
+        boundaries = DEFAULT_PRICE_BUCKETS
+        try:
+            result = await self.db.execute(
+                select(Company.settings).where(Company.id == self.tenant_context.company_id)
+            )
+            tenant_settings = result.scalar() or {}
+            configured = (tenant_settings.get('search') or {}).get('price_buckets')
+            if configured:
+                boundaries = sorted(float(b) for b in configured)
+        except Exception as e:
+            logger.warning(f"Failed to load price buckets from tenant settings: {e}")
+        
+        ranges = build_price_ranges(boundaries)
+        _price_bucket_cache[tenant_id] = (time.monotonic(), ranges)
+        return ranges
+    
+    def _facet_search_conditions(self, model_class, search_query: Optional[SearchQuery],
+                                 fuzzy_columns: List[str]) -> List:
+        """Tenant and search conditions shared by the facet queries"""
+        conditions = [model_class.company_id == self.tenant_context.company_id]
         
-        # Apply sorting and pagination
-        query = self._apply_sorting(base_query, Product, sort_params, has_fts_rank=False)
-        query = query.offset((page - 1) * limit).limit(limit)
+        if not search_query or not search_query.has_content():
+            return conditions
         
-        # Execute query
-        result = await self.db.execute(query)
-        products = result.scalars().all()
+        tsquery = search_query.to_tsquery()
+        if tsquery and SEARCH_CAPABILITIES['fts']:
+            conditions.append(
+                model_class.search_vector.op('@@')(func.to_tsquery('english', tsquery))
+            )
+            return conditions
+        
+        # Fall back to fuzzy search conditions
+        fuzzy_conditions = []
+        for term in search_query.to_fuzzy_terms()[:3]:  # Limit terms for performance
+            if not term.startswith('-'):
+                fuzzy_conditions.append(or_(*[
+                    getattr(model_class, column).ilike(f'%{term}%') for column in fuzzy_columns
+                ]))
+        if fuzzy_conditions:
+            conditions.append(or_(*fuzzy_conditions))
         
-        return {
-            'results': products,
-            'total': total,
-            'page': page,
-            'limit': limit
-        }
+        return conditions
     
     async def _get_contact_facets(self, search_query: Optional[SearchQuery] = None) -> Dict[str, Dict[str, int]]:
-        """Generate facet counts for contacts"""
-        base_conditions = [Contact.company_id == self.tenant_context.company_id]
-        
-        # Add search conditions if provided
-        if search_query and search_query.has_content():
-            tsquery = search_query.to_tsquery()
-            if tsquery:
-                try:
-                    base_conditions.append(
-                        Contact.search_vector.op('@@')(func.to_tsquery('english', tsquery))
-                    )
-                except Exception:
-                    # Fall back to fuzzy search conditions
-                    terms = search_query.to_fuzzy_terms()
-                    if terms:
-                        fuzzy_conditions = []
-                        for term in terms[:3]:  # Limit terms for performance
-                            if not term.startswith('-'):
-                                term_conditions = or_(
-                                    Contact.name.ilike(f'%{term}%'),
-                                    Contact.email.ilike(f'%{term}%'),
-                                    Contact.company.ilike(f'%{term}%')
-                                )
-                                fuzzy_conditions.append(term_conditions)
-                        if fuzzy_conditions:
-                            base_conditions.append(or_(*fuzzy_conditions))
-        
-        facets = {}
+        """Generate facet counts for contacts in a single round trip"""
+        base_conditions = self._facet_search_conditions(
+            Contact, search_query, ['display_name', 'email', 'company_name']
+        )
         
         # Status facets
         status_query = select(
-            Contact.status,
+            literal('status').label('facet'),
+            Contact.lifecycle_stage.label('value'),
             func.count().label('count')
         ).where(
             and_(*base_conditions)
-        ).group_by(Contact.status)
+        ).group_by(Contact.lifecycle_stage)
         
-        result = await self.db.execute(status_query)
-        facets['status'] = {row.status: row.count for row in result.fetchall() if row.status}
+        # Tags facets (limit to top 10) - expand the JSON tag array per row
+        if self._is_sqlite():
+            tag_source = func.json_each(Contact.tags).table_valued('value')
+        else:
+            tag_source = func.json_array_elements_text(Contact.tags).table_valued('value')
         
-        # Tags facets (limit to top 10)
-        tags_query = select(
-            func.unnest(Contact.tags).label('tag'),
+        top_tags = select(
+            literal('tags').label('facet'),
+            tag_source.c.value.label('value'),
             func.count().label('count')
-        ).where(
+        ).select_from(Contact).join(tag_source, true()).where(
             and_(*base_conditions, Contact.tags.isnot(None))
-        ).group_by(text('tag')).order_by(desc(text('count'))).limit(10)
+        ).group_by(tag_source.c.value).order_by(desc(text('count'))).limit(10).subquery()
+        
+        facet_query = union_all(
+            status_query,
+            select(top_tags.c.facet, top_tags.c.value, top_tags.c.count)
+        )
         
-        result = await self.db.execute(tags_query)
-        facets['tags'] = {row.tag: row.count for row in result.fetchall() if row.tag}
+        result = await self.db.execute(facet_query)
+        
+        facets = {'status': {}, 'tags': {}}
+        for row in result.fetchall():
+            if row.value:
+                facets[row.facet][row.value] = row.count
         
         return facets
     
     async def _get_product_facets(self, search_query: Optional[SearchQuery] = None) -> Dict[str, Dict[str, int]]:
-        """Generate facet counts for products"""
-        base_conditions = [Product.company_id == self.tenant_context.company_id]
-        
-        # Add search conditions if provided
-        if search_query and search_query.has_content():
-            tsquery = search_query.to_tsquery()
-            if tsquery:
-                try:
-                    base_conditions.append(
-                        Product.search_vector.op('@@')(func.to_tsquery('english', tsquery))
-                    )
-                except Exception:
-                    # Fall back to fuzzy search conditions
-                    terms = search_query.to_fuzzy_terms()
-                    if terms:
-                        fuzzy_conditions = []
-                        for term in terms[:3]:  # Limit terms for performance
-                            if not term.startswith('-'):
-                                term_conditions = or_(
-                                    Product.name.ilike(f'%{term}%'),
-                                    Product.sku.ilike(f'%{term}%'),
-                                    Product.category.ilike(f'%{term}%')
-                                )
-                                fuzzy_conditions.append(term_conditions)
-                        if fuzzy_conditions:
-                            base_conditions.append(or_(*fuzzy_conditions))
-        
-        facets = {}
-        
-        # Category facets
-        category_query = select(
-            Product.category,
-            func.count().label('count')
-        ).where(
-            and_(*base_conditions)
-        ).group_by(Product.category)
-        
-        result = await self.db.execute(category_query)
-        facets['category'] = {row.category: row.count for row in result.fetchall() if row.category}
-        
-        # Stock status facets
-        stock_query = select(
-            func.case(
-                (Product.stock_quantity == 0, 'out_of_stock'),
-                (Product.stock_quantity < Product.low_stock_threshold, 'low_stock'),
-                else_='in_stock'
-            ).label('stock_status'),
-            func.count().label('count')
-        ).where(
-            and_(*base_conditions)
-        ).group_by(text('stock_status'))
-        
-        result = await self.db.execute(stock_query)
-        facets['stock_status'] = {row.stock_status: row.count for row in result.fetchall()}
-        
-        # Price range facets
-        price_ranges = [
-            ('0-10', 0, 10),
-            ('10-50', 10, 50),
-            ('50-100', 50, 100),
-            ('100-500', 100, 500),
-            ('500+', 500, float('inf'))
-        ]
-        
-        price_facets = {}
-        for label, min_price, max_price in price_ranges:
-            price_conditions = base_conditions + [Product.price >= min_price]
-            if max_price != float('inf'):
-                price_conditions.append(Product.price < max_price)
-            
-            price_query = select(func.count()).where(and_(*price_conditions))
-            result = await self.db.execute(price_query)
-            count = result.scalar()
-            if count > 0:
-                price_facets[label] = count
+        """Generate facet counts for products in a single round trip"""
+        base_conditions = self._facet_search_conditions(
+            Product, search_query, ['name', 'sku', 'category']
+        )
+        price_ranges = await self._get_price_ranges()
+        
+        stock_status = case(
+            (Product.stock_quantity <= 0, 'out_of_stock'),
+            (Product.stock_quantity - Product.reserved_quantity <= Product.reorder_point, 'low_stock'),
+            else_='in_stock'
+        )
+        
+        price_cases = [(Product.sale_price.is_(None), None), (Product.sale_price < price_ranges[0][1], None)]
+        for label, _, max_price in price_ranges[:-1]:
+            price_cases.append((Product.sale_price < max_price, label))
+        price_bucket = case(*price_cases, else_=price_ranges[-1][0])
         
-        facets['price_range'] = price_facets
+        facet_rows = select(
+            Product.category.label('category'),
+            stock_status.label('stock_status'),
+            price_bucket.label('price_bucket')
+        ).where(and_(*base_conditions)).subquery()
+        
+        columns = [facet_rows.c.category, facet_rows.c.stock_status, facet_rows.c.price_bucket]
+        facets = {'category': {}, 'stock_status': {}, 'price_range': {}}
+        
+        if self._is_sqlite():
+            # SQLite has no GROUPING SETS: group by all dimensions and fold per facet
+            result = await self.db.execute(
+                select(*columns, func.count().label('count')).group_by(*columns)
+            )
+            for row in result.fetchall():
+                for facet, value in zip(facets, (row.category, row.stock_status, row.price_bucket)):
+                    if value:
+                        facets[facet][value] = facets[facet].get(value, 0) + row.count
+        else:
+            result = await self.db.execute(
+                select(
+                    *columns,
+                    func.grouping(facet_rows.c.category).label('g_category'),
+                    func.grouping(facet_rows.c.stock_status).label('g_stock_status'),
+                    func.count().label('count')
+                ).group_by(func.grouping_sets(*columns))
+            )
+            for row in result.fetchall():
+                if row.g_category == 0:
+                    facet, value = 'category', row.category
+                elif row.g_stock_status == 0:
+                    facet, value = 'stock_status', row.stock_status
+                else:
+                    facet, value = 'price_range', row.price_bucket
+                if value:
+                    facets[facet][value] = row.count
+        
+        # Keep price ranges in bucket order
+        facets['price_range'] = {
+            label: facets['price_range'][label]
+            for label, _, _ in price_ranges if label in facets['price_range']
+        }
         
         return facets
     
     async def search_contacts(self, q: str = '', filters: Optional[Dict[str, Any]] = None,
-                            sort: str = '', page: int = 1, limit: int = 20) -> Dict[str, Any]:
+                            sort: str = '', page: int = 1, limit: int = 20,
+                            cursor: Optional[str] = None, total_mode: str = 'exact') -> Dict[str, Any]:
         """Search contacts with full-text search and facets"""
         search_query = SearchQuery(q)
         search_filters = SearchFilters(filters)
@@ -596,32 +803,30 @@ class SearchService:
         limit = min(limit, 100)
         page = max(page, 1)
         
-        # Try full-text search first if we have a query
+        # Full-text search when the database has search vectors (detected at startup)
         results = None
-        if search_query.has_content():
-            try:
-                results = await self._search_contacts_fts(
-                    search_query, search_filters, sort_params, page, limit
-                )
-            except Exception as e:
-                logger.warning(f"FTS search failed, falling back to fuzzy: {e}")
-                results = await self._search_contacts_fuzzy(
-                    search_query, search_filters, sort_params, page, limit
-                )
+        if search_query.has_content() and SEARCH_CAPABILITIES['fts']:
+            results = await self._search_contacts_fts(
+                search_query, search_filters, sort_params, page, limit, cursor, total_mode
+            )
         else:
-            # No query, just filter and sort
+            # Fuzzy matching, or just filter and sort when there is no query
             results = await self._search_contacts_fuzzy(
-                search_query, search_filters, sort_params, page, limit
+                search_query, search_filters, sort_params, page, limit, cursor, total_mode
             )
         
-        # Add facets
-        facets = await self._get_contact_facets(search_query if search_query.has_content() else None)
-        results['facets'] = {'contacts': facets}
+        # Facets come with the first page only, like the total
+        if cursor:
+            results['facets'] = {}
+        else:
+            facets = await self._get_contact_facets(search_query if search_query.has_content() else None)
+            results['facets'] = {'contacts': facets}
         
         return results
     
     async def search_products(self, q: str = '', filters: Optional[Dict[str, Any]] = None,
-                            sort: str = '', page: int = 1, limit: int = 20) -> Dict[str, Any]:
+                            sort: str = '', page: int = 1, limit: int = 20,
+                            cursor: Optional[str] = None, total_mode: str = 'exact') -> Dict[str, Any]:
         """Search products with full-text search and facets"""
         search_query = SearchQuery(q)
         search_filters = SearchFilters(filters)
@@ -631,26 +836,23 @@ class SearchService:
         limit = min(limit, 100)
         page = max(page, 1)
         
-        # Try full-text search first if we have a query
+        # Full-text search when the database has search vectors (detected at startup)
         results = None
-        if search_query.has_content():
-            try:
-                results = await self._search_products_fts(
-                    search_query, search_filters, sort_params, page, limit
-                )
-            except Exception as e:
-                logger.warning(f"FTS search failed, falling back to fuzzy: {e}")
-                results = await self._search_products_fuzzy(
-                    search_query, search_filters, sort_params, page, limit
-                )
+        if search_query.has_content() and SEARCH_CAPABILITIES['fts']:
+            results = await self._search_products_fts(
+                search_query, search_filters, sort_params, page, limit, cursor, total_mode
+            )
         else:
-            # No query, just filter and sort
+            # Fuzzy matching, or just filter and sort when there is no query
             results = await self._search_products_fuzzy(
-                search_query, search_filters, sort_params, page, limit
+                search_query, search_filters, sort_params, page, limit, cursor, total_mode
             )
         
-        # Add facets
-        facets = await self._get_product_facets(search_query if search_query.has_content() else None)
-        results['facets'] = {'products': facets}
+        # Facets come with the first page only, like the total
+        if cursor:
+            results['facets'] = {}
+        else:
+            facets = await self._get_product_facets(search_query if search_query.has_content() else None)
+            results['facets'] = {'products': facets}
         
         return results
\ No newline at end of file
@@ -0,0 +1,365 @@
+"""
+Stock Level Service
+
+Per-location stock kept in the stock_levels table. Every stock move adjusts
+the affected rows with an atomic UPDATE ... RETURNING in the move's own
+transaction, so concurrent moves never lose updates and reading current stock
+is a primary-key lookup. The reconciliation job rebuilds the table from the
+stock_moves ledger. Product.stock_quantity and reserved_quantity are kept as
+the product-wide totals, which is what the low-stock partial index covers.
+"""
+import logging
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, func, literal, select, true, union_all, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.models.product import Product, StockLevel, StockLocation, StockMove
+from app.services.search_service import keyset_condition
+
+logger = logging.getLogger(__name__)
+
+# Moves that count towards stock; pending moves apply once confirmed
+STOCK_LEDGER_STATUSES = ("completed", "confirmed")
+
+LEVEL_KEY = ("company_id", "product_id", "location_id")
+
+
+def _insert(dialect_name: str):
+    return sqlite_insert if dialect_name == "sqlite" else postgresql_insert
+
+
+def _key_filter(company_id, product_id, location_id):
+    return (
+        (StockLevel.company_id == company_id)
+        & (StockLevel.product_id == product_id)
+        & (StockLevel.location_id == location_id)
+    )
+
+
+async def adjust_stock_level(db, company_id, product_id, location_id,
+                             on_hand_delta: int = 0, reserved_delta: int = 0) -> Tuple[int, int]:
+    """
+    Atomically add deltas to one stock level
+
+    Returns (old_on_hand, new_on_hand). The row is created on first use; the
+    upsert covers two transactions creating it at the same time.
+    """
+    now = datetime.utcnow()
+    result = await db.execute(
+        update(StockLevel)
+        .where(_key_filter(company_id, product_id, location_id))
+        .values(
+            on_hand=StockLevel.on_hand + on_hand_delta,
+            reserved=StockLevel.reserved + reserved_delta,
+            updated_at=now
+        )
+        .returning(StockLevel.on_hand)
+        .execution_options(synchronize_session=False)
+    )
+    new_on_hand = result.scalar_one_or_none()
+
+    if new_on_hand is None:
+        insert = _insert(db.get_bind().dialect.name)(StockLevel).values(
+            company_id=company_id,
+            product_id=product_id,
+            location_id=location_id,
+            on_hand=on_hand_delta,
+            reserved=reserved_delta,
+            updated_at=now
+        )
+        result = await db.execute(
+            insert.on_conflict_do_update(
+                index_elements=list(LEVEL_KEY),
+                set_={
+                    "on_hand": StockLevel.on_hand + insert.excluded.on_hand,
+                    "reserved": StockLevel.reserved + insert.excluded.reserved,
+                    "updated_at": now
+                }
+            ).returning(StockLevel.on_hand)
+        )
+        new_on_hand = result.scalar_one()
+
+    return new_on_hand - on_hand_delta, new_on_hand
+
+
+async def adjust_product_totals(db, company_id, product_id, on_hand_delta: int = 0, reserved_delta: int = 0):
+    """Add deltas to a product's company-wide stock and reserved totals"""
+    if not on_hand_delta and not reserved_delta:
+        return
+    await db.execute(
+        update(Product)
+        .where((Product.company_id == company_id) & (Product.id == product_id))
+        .values(
+            stock_quantity=func.coalesce(Product.stock_quantity, 0) + on_hand_delta,
+            reserved_quantity=func.coalesce(Product.reserved_quantity, 0) + reserved_delta
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def adjust_product_totals_bulk(db, company_id, deltas: Dict[uuid.UUID, int]) -> Dict[uuid.UUID, Tuple[int, int]]:
+    """
+    Add on-hand deltas to many products' totals in one executemany
+
+    Returns (old_total, new_total) per product in deltas. Rows are updated in
+    id order; executemany UPDATE cannot use RETURNING, so the new totals are
+    read back afterwards, which is exact since the changed rows stay locked
+    by this transaction.
+    """
+    if not deltas:
+        return {}
+    params = [
+        {"b_product_id": product_id, "b_delta": delta}
+        for product_id, delta in sorted(deltas.items()) if delta
+    ]
+    products = Product.__table__
+    if params:
+        await db.execute(
+            update(products)
+            .where((products.c.company_id == company_id) & (products.c.id == bindparam("b_product_id")))
+            .values(stock_quantity=func.coalesce(products.c.stock_quantity, 0) + bindparam("b_delta")),
+            params
+        )
+    result = await db.execute(
+        select(products.c.id, func.coalesce(products.c.stock_quantity, 0))
+        .where((products.c.company_id == company_id) & products.c.id.in_(list(deltas)))
+    )
+    return {product_id: (total - deltas[product_id], total) for product_id, total in result}
+
+
+async def apply_stock_move(db, move: StockMove) -> List[Tuple[uuid.UUID, int, int]]:
+    """
+    Apply a move to the stock levels of its locations
+
+    Returns (location_id, old_on_hand, new_on_hand) for each location touched.
+    Transfers leave the product total alone; receipts and issues adjust it.
+    Stock level rows are locked in location order and before the product
+    row, the same order as batches and reservations, so concurrent writers
+    (including opposite transfers) cannot deadlock.
+    """
+    if move.status not in STOCK_LEDGER_STATUSES:
+        return []
+
+    levels = [
+        (location_id, delta)
+        for location_id, delta in ((move.from_location_id, -move.quantity), (move.to_location_id, move.quantity))
+        if location_id is not None
+    ]
+    applied = {}
+    for location_id, delta in sorted(levels):
+        applied[location_id] = await adjust_stock_level(
+            db, move.company_id, move.product_id, location_id, on_hand_delta=delta
+        )
+    # Reported source first, destination second
+    changes = [(location_id, *applied[location_id]) for location_id, _ in levels]
+
+    net = (move.quantity if move.to_location_id else 0) - (move.quantity if move.from_location_id else 0)
+    await adjust_product_totals(db, move.company_id, move.product_id, on_hand_delta=net)
+    return changes
+
+
+async def apply_stock_deltas(db, company_id,
+                             deltas: Dict[Tuple[uuid.UUID, uuid.UUID], int]) -> Dict[Tuple[uuid.UUID, uuid.UUID], Tuple[int, int]]:
+    """
+    Add many (product_id, location_id) -> on-hand deltas in one upsert
+
+    Returns (old_on_hand, new_on_hand) per key. Rows are written in key order
+    so concurrent batches lock them in the same order instead of deadlocking.
+    """
+    keys = sorted(key for key, delta in deltas.items() if delta)
+    if not keys:
+        return {}
+
+    now = datetime.utcnow()
+    insert = _insert(db.get_bind().dialect.name)(StockLevel).values([
+        {
+            "company_id": company_id,
+            "product_id": product_id,
+            "location_id": location_id,
+            "on_hand": deltas[(product_id, location_id)],
+            "reserved": 0,
+            "updated_at": now
+        }
+        for product_id, location_id in keys
+    ])
+    result = await db.execute(
+        insert.on_conflict_do_update(
+            index_elements=list(LEVEL_KEY),
+            set_={"on_hand": StockLevel.on_hand + insert.excluded.on_hand, "updated_at": now}
+        ).returning(StockLevel.product_id, StockLevel.location_id, StockLevel.on_hand)
+    )
+
+    changes = {}
+    for product_id, location_id, new_on_hand in result:
+        delta = deltas[(product_id, location_id)]
+        changes[(product_id, location_id)] = (new_on_hand - delta, new_on_hand)
+    return changes
+
+
+async def get_stock_level(db, company_id, product_id, location_id) -> Optional[StockLevel]:
+    """Current stock of a product at one location"""
+    result = await db.execute(
+        select(StockLevel).where(_key_filter(company_id, product_id, location_id))
+    )
+    return result.scalar_one_or_none()
+
+
+def ledger_stock_levels(company_id):
+    """(product_id, location_id, on_hand) for a company, summed from its stock moves"""
+    counted = (StockMove.company_id == company_id) & StockMove.status.in_(STOCK_LEDGER_STATUSES)
+    inbound = select(
+        StockMove.product_id,
+        StockMove.to_location_id.label("location_id"),
+        StockMove.quantity.label("quantity")
+    ).where(counted & StockMove.to_location_id.isnot(None))
+    outbound = select(
+        StockMove.product_id,
+        StockMove.from_location_id.label("location_id"),
+        (literal(0) - StockMove.quantity).label("quantity")
+    ).where(counted & StockMove.from_location_id.isnot(None))
+
+    moves = union_all(inbound, outbound).subquery()
+    return select(
+        moves.c.product_id,
+        moves.c.location_id,
+        func.sum(moves.c.quantity).label("on_hand")
+    ).group_by(moves.c.product_id, moves.c.location_id)
+
+
+def level_totals(column):
+    """Correlated sum of a stock level column over the current product's locations"""
+    return (
+        select(func.sum(column))
+        .where((StockLevel.company_id == Product.company_id) & (StockLevel.product_id == Product.id))
+        .scalar_subquery()
+    )
+
+
+def stock_level_rebuild_statements(company_id, dialect_name: str) -> list:
+    """
+    Statements that reset a company's on-hand quantities to the ledger
+
+    Reserved quantities are kept, since reservations are not in the ledger.
+    Levels the ledger no longer knows about drop to zero and are removed
+    unless something is still reserved there. Run them in one transaction.
+    """
+    now = datetime.utcnow()
+    ledger = ledger_stock_levels(company_id).subquery()
+    insert = _insert(dialect_name)(StockLevel).from_select(
+        ["company_id", "product_id", "location_id", "on_hand", "reserved", "updated_at"],
+        select(
+            literal(company_id, StockLevel.company_id.type),
+            ledger.c.product_id,
+            ledger.c.location_id,
+            ledger.c.on_hand,
+            literal(0),
+            literal(now, StockLevel.updated_at.type)
+        ).where(true())  # SQLite needs a WHERE before ON CONFLICT
+    )
+    return [
+        update(StockLevel)
+        .where(StockLevel.company_id == company_id)
+        .values(on_hand=0, updated_at=now)
+        .execution_options(synchronize_session=False),
+        insert.on_conflict_do_update(
+            index_elements=list(LEVEL_KEY),
+            set_={"on_hand": insert.excluded.on_hand, "updated_at": now}
+        ),
+        StockLevel.__table__.delete().where(
+            (StockLevel.company_id == company_id)
+            & (StockLevel.on_hand == 0)
+            & (StockLevel.reserved == 0)
+        ),
+        # Product totals follow the rebuilt levels for every product with stock history
+        update(Product)
+        .where(
+            (Product.company_id == company_id)
+            & Product.id.in_(
+                select(StockMove.product_id).where(StockMove.company_id == company_id)
+                .union(select(StockLevel.product_id).where(StockLevel.company_id == company_id))
+            )
+        )
+        .values(
+            stock_quantity=func.coalesce(level_totals(StockLevel.on_hand), 0),
+            reserved_quantity=func.coalesce(level_totals(StockLevel.reserved), 0)
+        )
+        .execution_options(synchronize_session=False),
+    ]
+
+
+async def rebuild_stock_levels(db, company_id):
+    """Recompute a company's stock levels from its move ledger"""
+    for statement in stock_level_rebuild_statements(company_id, db.get_bind().dialect.name):
+        await db.execute(statement)
+    logger.info(f"Rebuilt stock levels for company {company_id}")
+
+
+# Sort order of the stock summary; cursors carry (name, id)
+SUMMARY_SORT = [(Product.name, "asc"), (Product.id, "asc")]
+
+
+def low_stock_condition():
+    """
+    Products at or below their reorder point
+
+    Must match the predicate of the idx_products_low_stock partial index
+    (migration f2b8d6e1c4a9) for PostgreSQL to use it.
+    """
+    return and_(
+        Product.track_inventory,
+        Product.stock_quantity - Product.reserved_quantity <= Product.reorder_point
+    )
+
+
+def stock_summary_query(company_id, limit: int, after: Optional[list] = None,
+                        location_id=None, low_stock_only: bool = False):
+    """
+    One page of the stock summary
+
+    Picks up to limit products in (name, id) order after the keyset values
+    and joins their stock levels, yielding one row per product and location
+    (products without stock levels get a single row with NULL location
+    columns). With location_id only products stocked there are included.
+    """
+    page = select(
+        Product.id,
+        Product.name,
+        Product.sku,
+        Product.barcode,
+        Product.stock_quantity,
+        Product.reserved_quantity
+    ).where(Product.company_id == company_id)
+
+    if after:
+        page = page.where(keyset_condition(SUMMARY_SORT, after))
+    if low_stock_only:
+        page = page.where(low_stock_condition())
+    if location_id:
+        page = page.where(Product.id.in_(
+            select(StockLevel.product_id)
+            .where((StockLevel.company_id == company_id) & (StockLevel.location_id == location_id))
+        ))
+    page = page.order_by(Product.name, Product.id).limit(limit).subquery("page")
+
+    level_join = (StockLevel.company_id == company_id) & (StockLevel.product_id == page.c.id)
+    if location_id:
+        level_join = level_join & (StockLevel.location_id == location_id)
+
+    return (
+        select(
+            page,
+            StockLevel.location_id,
+            StockLocation.name.label("location_name"),
+            StockLevel.on_hand,
+            StockLevel.reserved
+        )
+        .select_from(
+            page.outerjoin(StockLevel, level_join)
+            .outerjoin(StockLocation, StockLocation.id == StockLevel.location_id)
+        )
+        .order_by(page.c.name, page.c.id, StockLocation.name)
+    )
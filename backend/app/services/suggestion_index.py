@@ -0,0 +1,256 @@
+"""
+TECHGURU ElevateCRM Search Suggestion Index
+
+Per-tenant, in-memory prefix index that serves /search/suggestions without a
+database round trip. Each tenant's index is loaded lazily on first use, kept
+current from the contact_update/product_update events of committed writes
+(applied directly in the writing process, over realtime elsewhere), and
+evicted in least-recently-used order once the process-wide term budget is
+exceeded.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.contact import Contact
+from app.models.product import Product
+from app.services.model_events import add_local_listener
+from app.services.realtime_service import EventTypes, RealtimeEvent, RealtimeHub, realtime_hub
+
+logger = logging.getLogger(__name__)
+
+# entity -> suggestion kinds, in the order they are offered
+SUGGESTION_KINDS: Dict[str, Tuple[str, ...]] = {
+    "contacts": ("name", "company"),
+    "products": ("name", "sku"),
+}
+
+
+def contact_terms(display_name: Optional[str], first_name: Optional[str] = None,
+                  last_name: Optional[str] = None, company_name: Optional[str] = None) -> Dict[str, str]:
+    """Suggestion terms for a contact, keyed by kind"""
+    name = display_name or " ".join(part for part in (first_name, last_name) if part)
+    return {kind: value for kind, value in (("name", name), ("company", company_name)) if value}
+
+
+def product_terms(name: Optional[str], sku: Optional[str]) -> Dict[str, str]:
+    """Suggestion terms for a product, keyed by kind"""
+    return {kind: value for kind, value in (("name", name), ("sku", sku)) if value}
+
+
+class PrefixIndex:
+    """
+    Sorted term arrays for one tenant's entity, searched with bisect
+
+    Terms are reference counted so that values shared by many records (e.g. a
+    company name) appear once and disappear only when the last record goes.
+    """
+
+    def __init__(self, kinds: Tuple[str, ...]):
+        self.kinds = kinds
+        # kind -> sorted [(folded, value)]
+        self.terms: Dict[str, List[Tuple[str, str]]] = {kind: [] for kind in kinds}
+        self.refcounts: Dict[Tuple[str, str], int] = {}
+        # entity id -> {kind: value}
+        self.records: Dict[str, Dict[str, str]] = {}
+        self.built_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.refcounts)
+
+    def _add_term(self, kind: str, value: str):
+        key = (kind, value)
+        count = self.refcounts.get(key, 0)
+        self.refcounts[key] = count + 1
+        if count == 0:
+            insort(self.terms[kind], (value.casefold(), value))
+
+    def _remove_term(self, kind: str, value: str):
+        key = (kind, value)
+        count = self.refcounts.get(key, 0)
+        if count > 1:
+            self.refcounts[key] = count - 1
+            return
+        self.refcounts.pop(key, None)
+        terms = self.terms[kind]
+        entry = (value.casefold(), value)
+        position = bisect_left(terms, entry)
+        if position < len(terms) and terms[position] == entry:
+            del terms[position]
+
+    def load(self, records: Iterable[Tuple[str, Dict[str, str]]]):
+        """Bulk-load (entity id, terms) pairs into an empty index with one sort per kind"""
+        for entity_id, terms in records:
+            terms = {kind: value for kind, value in terms.items() if kind in self.terms and value}
+            if not terms:
+                continue
+            self.records[entity_id] = terms
+            for kind, value in terms.items():
+                self.refcounts[(kind, value)] = self.refcounts.get((kind, value), 0) + 1
+
+        for kind, value in self.refcounts:
+            self.terms[kind].append((value.casefold(), value))
+        for terms in self.terms.values():
+            terms.sort()
+
+    def upsert(self, entity_id: str, terms: Dict[str, str]):
+        """Replace the terms contributed by one record"""
+        self.remove(entity_id)
+        terms = {kind: value for kind, value in terms.items() if kind in self.terms and value}
+        for kind, value in terms.items():
+            self._add_term(kind, value)
+        if terms:
+            self.records[entity_id] = terms
+
+    def remove(self, entity_id: str):
+        """Drop the terms contributed by one record"""
+        for kind, value in self.records.pop(entity_id, {}).items():
+            self._remove_term(kind, value)
+
+    def suggest(self, prefix: str, limit: int) -> List[Dict[str, str]]:
+        """Case-insensitive prefix matches, grouped by kind in priority order"""
+        folded = prefix.casefold()
+        suggestions = []
+        for kind in self.kinds:
+            terms = self.terms[kind]
+            position = bisect_left(terms, (folded, ""))
+            while position < len(terms) and len(suggestions) < limit:
+                term_folded, value = terms[position]
+                if not term_folded.startswith(folded):
+                    break
+                suggestions.append({"type": kind, "value": value})
+                position += 1
+            if len(suggestions) >= limit:
+                break
+        return suggestions
+
+
+class SuggestionIndex:
+    """Process-wide LRU of per-tenant prefix indexes"""
+
+    def __init__(self, hub: Optional[RealtimeHub] = None,
+                 max_terms: int = settings.SUGGESTION_INDEX_MAX_TERMS,
+                 max_age: float = settings.SUGGESTION_INDEX_MAX_AGE):
+        self.hub = hub
+        self.max_terms = max_terms
+        self.max_age = max_age
+        # (tenant_id, entity) -> PrefixIndex, least recently used first
+        self.indexes: "OrderedDict[Tuple[str, str], PrefixIndex]" = OrderedDict()
+        self._loading: Dict[Tuple[str, str], asyncio.Lock] = {}
+
+    @property
+    def total_terms(self) -> int:
+        return sum(len(index) for index in self.indexes.values())
+
+    async def suggest(self, db: AsyncSession, tenant_id: str, entity: str,
+                      prefix: str, limit: int) -> List[Dict[str, str]]:
+        """Suggestions for a prefix, loading the tenant's index on first use"""
+        index = await self._get_index(db, str(tenant_id), entity)
+        return index.suggest(prefix, limit)
+
+    async def _get_index(self, db: AsyncSession, tenant_id: str, entity: str) -> PrefixIndex:
+        key = (tenant_id, entity)
+        index = self.indexes.get(key)
+        if index is not None and time.monotonic() - index.built_at < self.max_age:
+            self.indexes.move_to_end(key)
+            return index
+
+        lock = self._loading.setdefault(key, asyncio.Lock())
+        async with lock:
+            index = self.indexes.get(key)
+            if index is None or time.monotonic() - index.built_at >= self.max_age:
+                index = await self._load(db, tenant_id, entity)
+                self._store(key, index)
+            else:
+                self.indexes.move_to_end(key)
+        self._loading.pop(key, None)
+        return index
+
+    async def _load(self, db: AsyncSession, tenant_id: str, entity: str) -> PrefixIndex:
+        index = PrefixIndex(SUGGESTION_KINDS[entity])
+
+        if entity == "contacts":
+            result = await db.execute(
+                select(Contact.id, Contact.display_name, Contact.first_name,
+                       Contact.last_name, Contact.company_name)
+                .where(Contact.company_id == uuid.UUID(tenant_id))
+            )
+            index.load(
+                (str(row.id), contact_terms(row.display_name, row.first_name,
+                                            row.last_name, row.company_name))
+                for row in result
+            )
+        else:
+            result = await db.execute(
+                select(Product.id, Product.name, Product.sku)
+                .where(Product.company_id == uuid.UUID(tenant_id))
+            )
+            index.load((str(row.id), product_terms(row.name, row.sku)) for row in result)
+
+        logger.debug(f"Loaded {entity} suggestion index for tenant {tenant_id}: {len(index)} terms")
+        return index
+
+    def _store(self, key: Tuple[str, str], index: PrefixIndex):
+        tenant_id = key[0]
+        if self.hub and not any(existing[0] == tenant_id for existing in self.indexes):
+            self.hub.add_listener(tenant_id, self.handle_event)
+
+        self.indexes[key] = index
+        self.indexes.move_to_end(key)
+        self._evict(keep=key)
+
+    def _evict(self, keep: Tuple[str, str]):
+        """Drop idle tenants' indexes until the term budget is met"""
+        total = self.total_terms
+        while total > self.max_terms and len(self.indexes) > 1:
+            key, index = next(iter(self.indexes.items()))
+            if key == keep:
+                break
+            self.discard(*key)
+            total -= len(index)
+
+    def discard(self, tenant_id: str, entity: str):
+        """Forget a tenant's index; it is reloaded on next use"""
+        self.indexes.pop((tenant_id, entity), None)
+        if self.hub and not any(existing[0] == tenant_id for existing in self.indexes):
+            self.hub.remove_listener(tenant_id, self.handle_event)
+
+    def apply_event(self, event: RealtimeEvent):
+        """Apply a contact_update/product_update event to a loaded index"""
+        if event.event_type == EventTypes.CONTACT_UPDATE:
+            entity, id_field = "contacts", "contact_id"
+            terms = contact_terms(event.data.get("display_name"), event.data.get("first_name"),
+                                  event.data.get("last_name"), event.data.get("company_name"))
+        elif event.event_type == EventTypes.PRODUCT_UPDATE:
+            entity, id_field = "products", "product_id"
+            terms = product_terms(event.data.get("name"), event.data.get("sku"))
+        else:
+            return
+
+        index = self.indexes.get((event.tenant_id, entity))
+        entity_id = event.data.get(id_field)
+        if index is None or not entity_id:
+            return
+
+        if event.data.get("action") == "deleted":
+            index.remove(str(entity_id))
+        else:
+            index.upsert(str(entity_id), terms)
+
+
+    async def handle_event(self, event: RealtimeEvent):
+        """Apply a realtime event from another worker (or echoed from this one)"""
+        self.apply_event(event)
+
+
+# Global instance
+suggestion_index = SuggestionIndex(realtime_hub)
+add_local_listener(suggestion_index.apply_event)
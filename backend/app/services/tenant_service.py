@@ -11,7 +11,9 @@ from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy import select, update, delete, func, and_, or_
 from sqlalchemy.sql import Select, Update, Delete
 
+from app.core.database import rls_enforced
 from app.core.tenant_context import TenantContextManager, TenantQueryFilter, create_tenant_scoped_instance
+from app.services.search_cache import mark_search_stale
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +26,12 @@ class TenantAwareService:
     def __init__(self, db: AsyncSession):
         self.db = db
     
+    def _tenant_filter(self, query: Select, model: Type[ModelType]) -> Select:
+        """Add the tenant WHERE clause unless RLS already scopes this session"""
+        if rls_enforced(self.db):
+            return query
+        return TenantQueryFilter.apply_tenant_filter(query, model)
+    
     # READ Operations with automatic tenant filtering
     
     async def get_by_id(
@@ -46,7 +54,7 @@ class TenantAwareService:
         query = select(model).where(model.id == id)
         
         if validate_tenant:
-            query = TenantQueryFilter.apply_tenant_filter(query, model)
+            query = self._tenant_filter(query, model)
         
         result = await self.db.execute(query)
         return result.scalar_one_or_none()
@@ -75,7 +83,7 @@ class TenantAwareService:
         query = select(model)
         
         # Apply tenant filtering
-        query = TenantQueryFilter.apply_tenant_filter(query, model)
+        query = self._tenant_filter(query, model)
         
         # Apply additional filters
         if filters:
@@ -120,7 +128,7 @@ class TenantAwareService:
         query = select(model)
         
         # Apply tenant filtering
-        query = TenantQueryFilter.apply_tenant_filter(query, model)
+        query = self._tenant_filter(query, model)
         
         # Apply search conditions
         if search_term and search_fields:
@@ -165,7 +173,7 @@ class TenantAwareService:
         query = select(func.count(model.id))
         
         # Apply tenant filtering
-        query = TenantQueryFilter.apply_tenant_filter(query, model)
+        query = self._tenant_filter(query, model)
         
         # Apply additional filters
         if filters:
@@ -199,6 +207,7 @@ class TenantAwareService:
         self.db.add(instance)
         await self.db.flush()  # Flush to get the ID
         await self.db.refresh(instance)
+        self._mark_stale(model, getattr(instance, 'company_id', None))
         
         logger.debug(f"Created {model.__name__} with ID: {instance.id}")
         return instance
@@ -232,6 +241,7 @@ class TenantAwareService:
         
         await self.db.flush()
         await self.db.refresh(instance)
+        self._mark_stale(model, getattr(instance, 'company_id', None))
         
         logger.debug(f"Updated {model.__name__} ID: {id}")
         return instance
@@ -258,6 +268,7 @@ class TenantAwareService:
         
         await self.db.delete(instance)
         await self.db.flush()
+        self._mark_stale(model, getattr(instance, 'company_id', None))
         
         logger.debug(f"Deleted {model.__name__} ID: {id}")
         return True
@@ -298,6 +309,8 @@ class TenantAwareService:
         
         result = await self.db.execute(query)
         await self.db.flush()
+        if result.rowcount:
+            self._mark_stale(model, tenant_id)
         
         updated_count = result.rowcount
         logger.debug(f"Bulk updated {updated_count} {model.__name__} records")
@@ -334,10 +347,16 @@ class TenantAwareService:
         
         result = await self.db.execute(query)
         await self.db.flush()
+        if result.rowcount:
+            self._mark_stale(model, tenant_id)
         
         deleted_count = result.rowcount
         logger.debug(f"Bulk deleted {deleted_count} {model.__name__} records")
         return deleted_count
+    
+    def _mark_stale(self, model: Type[ModelType], tenant_id: Any):
+        """Invalidate the tenant's cached searches over model once the write commits"""
+        mark_search_stale(self.db.sync_session, model, tenant_id or TenantContextManager.get_tenant_id())
 
 
 # Helper functions for creating tenant-aware services
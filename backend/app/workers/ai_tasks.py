@@ -2,15 +2,23 @@
 Celery tasks for AI and Analytics
 """
 import logging
+from sqlalchemy import select
 from app.workers.celery_app import celery_app
 from app.core.database import SessionLocal
 from app.services.ai_analytics_service import SemanticSearchService
+from app.services.recommendation_store import co_occurrence_store
+from app.models.company import Company
 from app.models.product import Product
 from app.models.contact import Contact
 from app.models.order import Order
 
 logger = logging.getLogger(__name__)
 
+
+def _join(*parts) -> str:
+    return " ".join(str(part) for part in parts if part)
+
+
 @celery_app.task(name="ai.train_model")
 def train_model_task(model_type: str, params: dict):
     """
@@ -39,27 +47,77 @@ def index_data_task(entity_type: str):
         service = SemanticSearchService(db)
 
         if entity_type == "product":
-            items = db.query(Product).all()
-            batch = [{"id": item.id, "content": f"{item.name} {item.description}"} for item in items]
+            query = select(Product.id, Product.name, Product.description)
+            to_item = lambda row: {"id": row.id, "content": _join(row.name, row.description)}
         elif entity_type == "contact":
-            items = db.query(Contact).all()
-            batch = [{"id": item.id, "content": f"{item.first_name} {item.last_name} {item.email} {item.job_title}"} for item in items]
+            query = select(Contact.id, Contact.first_name, Contact.last_name, Contact.email, Contact.company_name)
+            to_item = lambda row: {"id": row.id, "content": _join(row.first_name, row.last_name, row.email, row.company_name)}
         elif entity_type == "order":
-            items = db.query(Order).limit(5000).all() # Limiting for performance
-            batch = [{"id": item.id, "content": f"Order {item.order_number} for customer {item.customer_id} with status {item.status}"} for item in items]
+            query = select(Order.id, Order.order_number, Order.contact_id, Order.status)
+            to_item = lambda row: {"id": row.id, "content": f"Order {row.order_number} for customer {row.contact_id} with status {row.status}"}
         else:
             logger.warning(f"Unknown entity type for indexing: {entity_type}")
             return
 
-        if batch:
-            service.index_batch(entity_type, batch)
+        counts = service.index_stream(entity_type, query, to_item)
+        logger.info(f"Indexed {entity_type}: {counts['written']} of {counts['seen']} changed")
+    finally:
+        db.close()
 
-        logger.info(f"Successfully indexed {len(batch)} items of type {entity_type}")
+    return {"status": "completed", "entity_type": entity_type}
 
+@celery_app.task(name="ai.build_recommendations")
+def build_recommendations_task(company_id: str = None):
+    """
+    Rebuild the co-occurrence model from the full order history.
+    Without a company_id every active tenant is rebuilt.
+    """
+    db = SessionLocal()
+    try:
+        if company_id:
+            company_ids = [company_id]
+        else:
+            company_ids = [str(cid) for (cid,) in db.query(Company.id).filter(Company.is_active == True).all()]
+
+        for cid in company_ids:
+            try:
+                co_occurrence_store.rebuild(db, cid)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Recommendation rebuild failed for company {cid}: {e}")
     finally:
         db.close()
 
-    return {"status": "completed", "entity_type": entity_type}
+    return {"status": "completed", "companies": len(company_ids)}
+
+
+@celery_app.task(name="ai.update_recommendations")
+def update_recommendations_task(company_id: str = None, order_ids: list = None):
+    """
+    Fold newly completed orders into the co-occurrence model.
+    Committing an order into a completed status enqueues this with its
+    order_ids (see model_events); the periodic run sweeps every tenant for
+    orders completed since its last update.
+    """
+    db = SessionLocal()
+    try:
+        if company_id:
+            company_ids = [company_id]
+        else:
+            company_ids = [str(cid) for (cid,) in db.query(Company.id).filter(Company.is_active == True).all()]
+
+        for cid in company_ids:
+            try:
+                if co_occurrence_store.apply_completed_orders(db, cid, order_ids) is None:
+                    co_occurrence_store.rebuild(db, cid)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Recommendation update failed for company {cid}: {e}")
+    finally:
+        db.close()
+
+    return {"status": "completed", "companies": len(company_ids)}
+
 
 @celery_app.on_after_configure.connect
 def setup_periodic_tasks(sender, **kwargs):
@@ -77,6 +135,17 @@ def setup_periodic_tasks(sender, **kwargs):
         index_data_task.s('contact'),
         name='re-index all contacts daily'
     )
+    # Keep recommendation co-occurrence models current
+    sender.add_periodic_task(
+        15 * 60.0,  # 15 minutes
+        update_recommendations_task.s(),
+        name='apply completed orders to recommendation models'
+    )
+    sender.add_periodic_task(
+        24 * 60 * 60.0,
+        build_recommendations_task.s(),
+        name='rebuild recommendation models daily'
+    )
     # Schedule daily model training
     sender.add_periodic_task(
         24 * 60 * 60.0,
@@ -15,7 +15,7 @@ celery_app = Celery(
     'elevatecrm_worker',
     broker=CELERY_BROKER_URL,
     backend=CELERY_RESULT_BACKEND,
-    include=['app.workers.ai_tasks']  # Add your task modules here
+    include=['app.workers.ai_tasks', 'app.workers.inventory_tasks']  # Add your task modules here
 )
 
 # Optional configuration, see the Celery documentation for more options:
@@ -0,0 +1,134 @@
+"""
+Celery tasks for inventory maintenance
+"""
+import logging
+from datetime import datetime
+
+import redis
+
+from app.workers.celery_app import celery_app
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.company import Company
+from app.models.product import StockReservation
+from app.services.realtime_service import realtime_service, stock_update_event
+from app.services.reservation_service import (
+    expired_release_statements, expired_reservations_statement, released_levels_statement
+)
+from app.services.search_cache import SEARCH_ENTITIES, SearchCache
+from app.services.stock_service import stock_level_rebuild_statements
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(name="inventory.reconcile_stock_levels")
+def reconcile_stock_levels_task(company_id: str = None):
+    """
+    Rebuild stock levels from the stock move ledger.
+    Without a company_id every active tenant is rebuilt, one transaction each.
+    """
+    db = SessionLocal()
+    try:
+        if company_id:
+            company_ids = [company_id]
+        else:
+            company_ids = [str(cid) for (cid,) in db.query(Company.id).filter(Company.is_active == True).all()]
+
+        dialect_name = db.get_bind().dialect.name
+        for cid in company_ids:
+            try:
+                for statement in stock_level_rebuild_statements(cid, dialect_name):
+                    db.execute(statement)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Stock level reconciliation failed for company {cid}: {e}")
+    finally:
+        db.close()
+
+    return {"status": "completed", "companies": len(company_ids)}
+
+
+def _announce_released_levels(levels):
+    """
+    Invalidate product searches and publish stock updates for freed stock.
+    The after-commit search cache hook needs an event loop, which workers
+    do not have, so both go out over a synchronous Redis client.
+    """
+    if not levels:
+        return
+    entity = SEARCH_ENTITIES[StockReservation.__tablename__]
+    client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    try:
+        pipe = client.pipeline(transaction=False)
+        for company_id in {str(level.company_id) for level in levels}:
+            pipe.incr(SearchCache.generation_key(company_id, entity))
+        pipe.execute()
+
+        realtime_service.publish_events_sync(client, [
+            stock_update_event(
+                str(level.company_id),
+                str(level.product_id),
+                level.on_hand,
+                level.on_hand,
+                str(level.location_id),
+                reserved=level.reserved
+            )
+            for level in levels
+        ])
+    except Exception as e:
+        logger.error(f"Failed to announce expired reservations: {e}")
+    finally:
+        client.close()
+
+
+@celery_app.task(name="inventory.expire_reservations")
+def expire_reservations_task(max_batches: int = 100):
+    """
+    Release the stock of reservations past their expiry, oldest first.
+    Each batch commits on its own so a long backlog never holds many locks.
+    """
+    db = SessionLocal()
+    expired = 0
+    try:
+        for _ in range(max_batches):
+            try:
+                now = datetime.utcnow()
+                rows = db.execute(expired_reservations_statement(now)).all()
+                levels = []
+                if rows:
+                    for statement, params in expired_release_statements(rows, now):
+                        db.execute(statement, params)
+                    levels = db.execute(released_levels_statement(rows)).all()
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Reservation expiry sweep failed: {e}")
+                break
+            _announce_released_levels(levels)
+            expired += len(rows)
+            if len(rows) < settings.STOCK_RESERVATION_SWEEP_BATCH:
+                break
+    finally:
+        db.close()
+
+    if expired:
+        logger.info(f"Expired {expired} stock reservations")
+    return {"status": "completed", "expired": expired}
+
+
+@celery_app.on_after_configure.connect
+def setup_periodic_tasks(sender, **kwargs):
+    """
+    Set up periodic inventory maintenance.
+    """
+    sender.add_periodic_task(
+        24 * 60 * 60.0,  # 24 hours
+        reconcile_stock_levels_task.s(),
+        name='reconcile stock levels with the move ledger daily'
+    )
+    sender.add_periodic_task(
+        settings.STOCK_RESERVATION_SWEEP_INTERVAL,
+        expire_reservations_task.s(),
+        name='expire overdue stock reservations'
+    )
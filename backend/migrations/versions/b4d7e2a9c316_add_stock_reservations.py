@@ -0,0 +1,61 @@
+"""add_stock_reservations
+
+Revision ID: b4d7e2a9c316
+Revises: f2b8d6e1c4a9
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d7e2a9c316'
+down_revision = 'f2b8d6e1c4a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Create stock reservations with a time-ordered index of active ones"""
+
+    op.create_table(
+        'stock_reservations',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('company_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('companies.id'), nullable=False),
+        sa.Column('product_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('products.id'), nullable=False),
+        sa.Column('location_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('stock_locations.id'), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='active'),
+        sa.Column('reference_type', sa.String(length=50), nullable=True),
+        sa.Column('reference_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('resolved_at', sa.DateTime(), nullable=True),
+        sa.Column('created_by_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.id'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_stock_reservations_company_id'), 'stock_reservations', ['company_id'], unique=False)
+    # Only active reservations can expire; the sweeper reads this oldest first
+    op.create_index(
+        'idx_stock_reservations_expiry', 'stock_reservations', ['expires_at'],
+        postgresql_where=sa.text("status = 'active'")
+    )
+
+    op.execute("GRANT SELECT, INSERT, UPDATE, DELETE ON stock_reservations TO app_user, app_admin")
+    op.execute("ALTER TABLE stock_reservations ENABLE ROW LEVEL SECURITY")
+    op.execute("""
+        CREATE POLICY tenant_isolation_stock_reservations ON stock_reservations
+        FOR ALL TO app_user, app_admin
+        USING (company_id = current_setting('elevatecrm.tenant_id')::uuid)
+    """)
+
+
+def downgrade() -> None:
+    """Drop stock reservations"""
+
+    op.execute("DROP POLICY IF EXISTS tenant_isolation_stock_reservations ON stock_reservations")
+    op.drop_index('idx_stock_reservations_expiry', table_name='stock_reservations')
+    op.drop_index(op.f('ix_stock_reservations_company_id'), table_name='stock_reservations')
+    op.drop_table('stock_reservations')
@@ -0,0 +1,68 @@
+"""semantic_index_upsert_key
+
+Revision ID: c5a9e3f7b21d
+Revises: b4d7e2a9c316
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5a9e3f7b21d'
+down_revision = 'b4d7e2a9c316'
+branch_labels = None
+depends_on = None
+
+
+# Keep the most recently updated row of each (entity_type, entity_id)
+DEDUPE_SEMANTIC_INDEX = """
+    DELETE FROM semantic_index
+    WHERE id IN (
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY entity_type, entity_id
+                ORDER BY updated_at DESC NULLS LAST, indexed_at DESC NULLS LAST, id
+            ) AS position
+            FROM semantic_index
+        ) AS ranked
+        WHERE position > 1
+    )
+"""
+
+
+def _has_semantic_index() -> bool:
+    # The AI tables are created by create_tables(); a fresh one already matches the model
+    return sa.inspect(op.get_bind()).has_table('semantic_index')
+
+
+def upgrade() -> None:
+    """Make (entity_type, entity_id) the semantic index upsert key and store content hashes"""
+
+    if not _has_semantic_index():
+        return
+
+    op.execute("ALTER TABLE semantic_index ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);")
+    op.execute(DEDUPE_SEMANTIC_INDEX)
+    op.execute("DROP INDEX IF EXISTS idx_semantic_entity;")
+    op.execute("""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_semantic_entity') THEN
+                ALTER TABLE semantic_index
+                    ADD CONSTRAINT uq_semantic_entity UNIQUE (entity_type, entity_id);
+            END IF;
+        END $$;
+    """)
+
+
+def downgrade() -> None:
+    """Restore the plain entity index and drop content hashes"""
+
+    if not _has_semantic_index():
+        return
+
+    op.execute("ALTER TABLE semantic_index DROP CONSTRAINT IF EXISTS uq_semantic_entity;")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_semantic_entity ON semantic_index (entity_type, entity_id);")
+    op.execute("ALTER TABLE semantic_index DROP COLUMN IF EXISTS content_hash;")
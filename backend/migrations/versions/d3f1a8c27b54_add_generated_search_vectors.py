@@ -0,0 +1,94 @@
+"""add_generated_search_vectors
+
+Revision ID: d3f1a8c27b54
+Revises: 6c7e3693b419
+Create Date: 2026-10-17 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f1a8c27b54'
+down_revision = '6c7e3693b419'
+branch_labels = None
+depends_on = None
+
+
+# Must match the Computed() expressions on the Contact and Product models
+CONTACT_SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(first_name, '') || ' ' || "
+    "coalesce(last_name, '') || ' ' || coalesce(display_name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(company_name, '') || ' ' || "
+    "coalesce(email, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(notes, '')), 'C')"
+)
+
+PRODUCT_SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(name, '') || ' ' || sku), 'A') || "
+    "setweight(to_tsvector('english', coalesce(brand, '') || ' ' || "
+    "coalesce(category, '') || ' ' || coalesce(subcategory, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+
+TRIGRAM_INDEXES = [
+    ('idx_contacts_first_name_gin_trgm', 'contacts', 'first_name'),
+    ('idx_contacts_last_name_gin_trgm', 'contacts', 'last_name'),
+    ('idx_contacts_display_name_gin_trgm', 'contacts', 'display_name'),
+    ('idx_contacts_email_gin_trgm', 'contacts', 'email'),
+    ('idx_products_name_gin_trgm', 'products', 'name'),
+    ('idx_products_sku_gin_trgm', 'products', 'sku'),
+    ('idx_products_barcode_gin_trgm', 'products', 'barcode'),
+]
+
+# Already owned by 6c7e3693b419; re-created here only if that revision skipped them
+EXISTING_TRIGRAM_INDEXES = {
+    'idx_contacts_email_gin_trgm',
+    'idx_products_name_gin_trgm',
+    'idx_products_sku_gin_trgm',
+}
+
+
+def upgrade() -> None:
+    """Add weighted generated tsvector columns with GIN and trigram indexes"""
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+
+    # Generated tsvector columns (stored, so they are maintained on write)
+    op.add_column('contacts', sa.Column(
+        'search_vector', postgresql.TSVECTOR(),
+        sa.Computed(CONTACT_SEARCH_DOCUMENT, persisted=True)
+    ))
+    op.add_column('products', sa.Column(
+        'search_vector', postgresql.TSVECTOR(),
+        sa.Computed(PRODUCT_SEARCH_DOCUMENT, persisted=True)
+    ))
+
+    # CREATE INDEX CONCURRENTLY cannot run inside the migration transaction
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contacts_search_vector ON contacts USING gin (search_vector);")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_products_search_vector ON products USING gin (search_vector);")
+
+        for index_name, table, column in TRIGRAM_INDEXES:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} "
+                f"ON {table} USING gin ({column} gin_trgm_ops);"
+            )
+
+
+def downgrade() -> None:
+    """Remove generated search vectors and their indexes"""
+
+    with op.get_context().autocommit_block():
+        for index_name, _, _ in TRIGRAM_INDEXES:
+            if index_name in EXISTING_TRIGRAM_INDEXES:
+                continue
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name};")
+
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_products_search_vector;")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_contacts_search_vector;")
+
+    op.drop_column('products', 'search_vector')
+    op.drop_column('contacts', 'search_vector')
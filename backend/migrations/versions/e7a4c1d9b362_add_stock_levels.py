@@ -0,0 +1,68 @@
+"""add_stock_levels
+
+Revision ID: e7a4c1d9b362
+Revises: d3f1a8c27b54
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a4c1d9b362'
+down_revision = 'd3f1a8c27b54'
+branch_labels = None
+depends_on = None
+
+
+# Must match STOCK_LEDGER_STATUSES in app/services/stock_service.py
+BACKFILL_FROM_LEDGER = """
+    INSERT INTO stock_levels (company_id, product_id, location_id, on_hand, reserved, updated_at)
+    SELECT company_id, product_id, location_id, SUM(quantity), 0, now()
+    FROM (
+        SELECT company_id, product_id, to_location_id AS location_id, quantity
+        FROM stock_moves
+        WHERE to_location_id IS NOT NULL AND status IN ('completed', 'confirmed')
+        UNION ALL
+        SELECT company_id, product_id, from_location_id AS location_id, -quantity
+        FROM stock_moves
+        WHERE from_location_id IS NOT NULL AND status IN ('completed', 'confirmed')
+    ) AS moves
+    GROUP BY company_id, product_id, location_id
+"""
+
+
+def upgrade() -> None:
+    """Create per-location stock levels and fill them from the move ledger"""
+
+    op.create_table(
+        'stock_levels',
+        sa.Column('company_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('companies.id'), nullable=False),
+        sa.Column('product_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('products.id'), nullable=False),
+        sa.Column('location_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('stock_locations.id'), nullable=False),
+        sa.Column('on_hand', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('reserved', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('company_id', 'product_id', 'location_id'),
+    )
+    op.create_index('idx_stock_levels_location', 'stock_levels', ['company_id', 'location_id'])
+
+    op.execute(BACKFILL_FROM_LEDGER)
+
+    op.execute("GRANT SELECT, INSERT, UPDATE, DELETE ON stock_levels TO app_user, app_admin")
+    op.execute("ALTER TABLE stock_levels ENABLE ROW LEVEL SECURITY")
+    op.execute("""
+        CREATE POLICY tenant_isolation_stock_levels ON stock_levels
+        FOR ALL TO app_user, app_admin
+        USING (company_id = current_setting('elevatecrm.tenant_id')::uuid)
+    """)
+
+
+def downgrade() -> None:
+    """Drop per-location stock levels"""
+
+    op.execute("DROP POLICY IF EXISTS tenant_isolation_stock_levels ON stock_levels")
+    op.drop_index('idx_stock_levels_location', table_name='stock_levels')
+    op.drop_table('stock_levels')
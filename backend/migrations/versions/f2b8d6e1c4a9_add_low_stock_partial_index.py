@@ -0,0 +1,56 @@
+"""add_low_stock_partial_index
+
+Revision ID: f2b8d6e1c4a9
+Revises: e7a4c1d9b362
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b8d6e1c4a9'
+down_revision = 'e7a4c1d9b362'
+branch_labels = None
+depends_on = None
+
+
+# Must match low_stock_condition() in app/services/stock_service.py
+LOW_STOCK_PREDICATE = "track_inventory AND stock_quantity - reserved_quantity <= reorder_point"
+
+# Product totals are now maintained from stock levels; align products that have any
+SYNC_PRODUCT_TOTALS = """
+    UPDATE products
+    SET stock_quantity = levels.on_hand, reserved_quantity = levels.reserved
+    FROM (
+        SELECT company_id, product_id, SUM(on_hand) AS on_hand, SUM(reserved) AS reserved
+        FROM stock_levels
+        GROUP BY company_id, product_id
+    ) AS levels
+    WHERE products.id = levels.product_id AND products.company_id = levels.company_id
+"""
+
+
+def upgrade() -> None:
+    """Sync product stock totals and index low-stock products in summary order"""
+
+    op.execute(SYNC_PRODUCT_TOTALS)
+
+    # CREATE INDEX CONCURRENTLY cannot run inside the migration transaction
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_products_low_stock "
+            f"ON products (company_id, name, id) WHERE {LOW_STOCK_PREDICATE};"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_products_company_name "
+            "ON products (company_id, name, id);"
+        )
+
+
+def downgrade() -> None:
+    """Drop the stock summary indexes"""
+
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_products_company_name;")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_products_low_stock;")
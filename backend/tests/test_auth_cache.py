@@ -0,0 +1,81 @@
+"""
+Tests for JWT verification caching and JWKS key lookup
+"""
+import json
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt import PyJWK
+from jwt.algorithms import RSAAlgorithm
+
+from app.core import auth
+from app.core.auth import JWKSCache, VerifiedTokenCache
+
+
+@pytest.fixture
+def signing_setup(monkeypatch):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update({"kid": "key-1", "use": "sig", "alg": "RS256"})
+
+    keys = JWKSCache("http://keycloak.invalid/certs", 600, 3600)
+    keys.keys = {"key-1": PyJWK(jwk)}
+    keys._last_attempt = time.monotonic()
+
+    monkeypatch.setattr(auth.auth_config, "verify_signature", True)
+    monkeypatch.setattr(auth, "jwks_cache", keys)
+    monkeypatch.setattr(auth, "token_cache", VerifiedTokenCache(max_size=2, max_ttl=300))
+    return private_key
+
+
+def make_token(private_key, kid="key-1", exp_in=60, sub="user-1"):
+    now = int(time.time())
+    claims = {
+        "sub": sub,
+        "iss": auth.auth_config.jwt_issuer,
+        "iat": now,
+        "exp": now + exp_in,
+        "company_id": "tenant-a",
+    }
+    return jwt.encode(claims, private_key, algorithm="RS256", headers={"kid": kid})
+
+
+@pytest.mark.asyncio
+async def test_verified_tokens_are_decoded_once(signing_setup, monkeypatch):
+    token = make_token(signing_setup)
+    decodes = []
+    real_decode = jwt.decode
+    monkeypatch.setattr(jwt, "decode", lambda *a, **kw: decodes.append(1) or real_decode(*a, **kw))
+
+    first = await auth.validate_jwt_token(token)
+    second = await auth.validate_jwt_token(token)
+
+    assert first is second
+    assert first.company_id == "tenant-a"
+    assert len(decodes) == 1
+
+
+@pytest.mark.asyncio
+async def test_unknown_key_id_is_rejected_without_refetch(signing_setup):
+    token = make_token(signing_setup, kid="rotated-away")
+
+    with pytest.raises(auth.HTTPException) as error:
+        await auth.validate_jwt_token(token)
+    assert error.value.status_code == 401
+
+
+def test_cache_entries_expire_with_the_token_and_evict_lru():
+    cache = VerifiedTokenCache(max_size=2, max_ttl=300)
+    now = int(time.time())
+    profile = auth.UserProfile(sub="u", iss="i", iat=now, exp=now - 1)
+
+    cache.put("expired", profile)
+    assert cache.get("expired") is None
+
+    live = auth.UserProfile(sub="u", iss="i", iat=now, exp=now + 60)
+    for token in ("a", "b", "c"):
+        cache.put(token, live)
+    assert cache.get("a") is None
+    assert cache.get("c") is live
@@ -0,0 +1,155 @@
+"""
+Tests for the per-tenant barcode lookup cache
+"""
+import uuid
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.tenant_context import TenantContextManager
+from app.models import Product
+from app.services.barcode_cache import BarcodeCache, BloomFilter, barcode_cache
+from app.services.realtime_service import EventTypes, RealtimeEvent, RealtimeHub, RealtimeService
+from app.services.tenant_service import TenantAwareService
+
+COMPANY_ID = uuid.uuid4()
+PRODUCT_ID = uuid.uuid4()
+USER_ID = uuid.uuid4()
+
+
+@pytest_asyncio.fixture
+async def db():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda sync_conn: Product.metadata.create_all(sync_conn, tables=[Product.__table__]))
+    try:
+        async with AsyncSession(engine) as session:
+            session.add(Product(
+                id=PRODUCT_ID, company_id=COMPANY_ID, name="Widget", sku="W-1",
+                barcode="0012345678905", sale_price=9.5, created_by_id=USER_ID
+            ))
+            await session.flush()
+            yield session
+    finally:
+        await engine.dispose()
+
+
+def count_queries(session):
+    queries = []
+    event.listen(session.bind.sync_engine, "before_cursor_execute", lambda *args: queries.append(1))
+    return queries
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    known = BloomFilter(1000, error_rate=0.01)
+    codes = [f"code-{index}" for index in range(1000)]
+    for code in codes:
+        known.add(code)
+
+    assert all(code in known for code in codes)
+    false_positives = sum(f"other-{index}" in known for index in range(10000))
+    assert false_positives < 300
+
+
+@pytest.mark.asyncio
+async def test_repeat_scans_and_unknown_codes_skip_the_database(db):
+    cache = BarcodeCache(RealtimeHub(RealtimeService()), negative_ttl=60)
+    queries = count_queries(db)
+
+    product = await cache.lookup(db, str(COMPANY_ID), "0012345678905")
+    assert product["name"] == "Widget"
+    assert product["sale_price"] == 9.5
+    assert await cache.lookup(db, str(COMPANY_ID), "9999999999999") is None
+    loaded = len(queries)
+
+    assert await cache.lookup(db, str(COMPANY_ID), "0012345678905") == product
+    assert await cache.lookup(db, str(COMPANY_ID), "9999999999999") is None
+    assert len(queries) == loaded
+
+
+@pytest.mark.asyncio
+async def test_codes_the_filter_never_saw_are_checked_in_the_database(db):
+    cache = BarcodeCache(RealtimeHub(RealtimeService()), negative_ttl=0)
+    tenant_id = str(COMPANY_ID)
+    assert await cache.lookup(db, tenant_id, "4006381333931") is None
+
+    # Written without an ORM session or event, e.g. by a bulk import
+    await db.execute(Product.__table__.insert().values(
+        id=uuid.uuid4(), company_id=COMPANY_ID, name="Gadget", sku="G-1",
+        barcode="4006381333931", created_by_id=USER_ID
+    ))
+    assert (await cache.lookup(db, tenant_id, "4006381333931"))["sku"] == "G-1"
+    assert "4006381333931" in cache.tenants[tenant_id].known
+
+
+@pytest.mark.asyncio
+async def test_product_events_invalidate_and_learn_barcodes(db):
+    hub = RealtimeHub(RealtimeService())
+    cache = BarcodeCache(hub, negative_ttl=60)
+    tenant_id = str(COMPANY_ID)
+    await cache.lookup(db, tenant_id, "0012345678905")
+    assert tenant_id in hub.listeners
+
+    product = await db.get(Product, PRODUCT_ID)
+    product.name = "Widget Pro"
+    await db.flush()
+    await hub.dispatch(RealtimeEvent(
+        event_type=EventTypes.PRODUCT_UPDATE,
+        tenant_id=tenant_id,
+        data={"product_id": str(PRODUCT_ID), "action": "updated", "name": "Widget Pro"},
+        timestamp=datetime.utcnow()
+    ))
+    assert (await cache.lookup(db, tenant_id, "0012345678905"))["name"] == "Widget Pro"
+
+    # A barcode created elsewhere reaches the filter through its event,
+    # ahead of the cached miss expiring
+    assert await cache.lookup(db, tenant_id, "4006381333931") is None
+    db.add(Product(company_id=COMPANY_ID, name="Gadget", sku="G-1", barcode="4006381333931", created_by_id=USER_ID))
+    await db.flush()
+    assert await cache.lookup(db, tenant_id, "4006381333931") is None
+    await hub.dispatch(RealtimeEvent(
+        event_type=EventTypes.PRODUCT_UPDATE,
+        tenant_id=tenant_id,
+        data={"product_id": str(uuid.uuid4()), "action": "created", "barcode": "4006381333931"},
+        timestamp=datetime.utcnow()
+    ))
+    assert (await cache.lookup(db, tenant_id, "4006381333931"))["sku"] == "G-1"
+
+
+@pytest.mark.asyncio
+async def test_idle_tenants_are_evicted(db):
+    hub = RealtimeHub(RealtimeService())
+    cache = BarcodeCache(hub, max_tenants=1)
+
+    await cache.lookup(db, str(COMPANY_ID), "0012345678905")
+    await cache.lookup(db, str(uuid.uuid4()), "0012345678905")
+
+    assert str(COMPANY_ID) not in cache.tenants
+    assert str(COMPANY_ID) not in hub.listeners
+
+
+@pytest.mark.asyncio
+async def test_products_written_by_any_service_scan_after_commit(db):
+    tenant_id = str(COMPANY_ID)
+    TenantContextManager.set_tenant_id(tenant_id)
+    try:
+        await db.commit()
+        assert await barcode_cache.lookup(db, tenant_id, "5012345678900") is None
+
+        service = TenantAwareService(db)
+        product = await service.create(
+            Product, name="Gizmo", sku="GZ-1", barcode="5012345678900", created_by_id=USER_ID
+        )
+        await db.commit()
+        assert (await barcode_cache.lookup(db, tenant_id, "5012345678900"))["sku"] == "GZ-1"
+
+        await service.update(Product, product.id, barcode="5012345678917")
+        await db.commit()
+        assert (await barcode_cache.lookup(db, tenant_id, "5012345678917"))["sku"] == "GZ-1"
+        assert await barcode_cache.lookup(db, tenant_id, "5012345678900") is None
+    finally:
+        barcode_cache.discard(tenant_id)
+        TenantContextManager.clear_tenant_id()
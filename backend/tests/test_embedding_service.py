@@ -0,0 +1,60 @@
+"""
+Tests for the shared embedding model pool and batching encoder
+"""
+import threading
+
+from app.services.embedding_service import BatchingEncoder, EmbeddingModelRegistry
+
+
+class FakeModel:
+    """Records the batches it is asked to encode"""
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, convert_to_numpy=True):
+        self.batches.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+def test_registry_loads_each_model_once():
+    loads = []
+
+    def loader(name):
+        loads.append(name)
+        return FakeModel()
+
+    registry = EmbeddingModelRegistry(loader)
+    threads = [threading.Thread(target=registry.get, args=("mini",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loads == ["mini"]
+
+
+def test_concurrent_queries_share_batches_and_cache():
+    model = FakeModel()
+    registry = EmbeddingModelRegistry(lambda name: model)
+    encoder = BatchingEncoder(registry, "mini", max_batch=64, max_wait_ms=50, cache_size=100)
+
+    results = {}
+    barrier = threading.Barrier(16)
+
+    def query(index):
+        barrier.wait()
+        results[index] = encoder.encode("q" * (index % 4 + 1))
+
+    threads = [threading.Thread(target=query, args=(i,)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(results[i] == [float(i % 4 + 1)] for i in range(16))
+    assert len(model.batches) < 16
+    assert sum(len(batch) for batch in model.batches) <= 4
+
+    encoder.encode("qq")
+    assert sum(len(batch) for batch in model.batches) <= 4
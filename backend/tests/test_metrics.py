@@ -0,0 +1,69 @@
+"""
+Tests for in-process Prometheus metrics and the request timing middleware
+"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.metrics import MetricsRegistry
+from app.middleware.metrics import MetricsMiddleware, TenantTierCache
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("test_latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+
+    for value in (0.05, 0.1, 0.5, 3.5):
+        histogram.labels("/items/{id}").observe(value)
+
+    text = registry.render()
+    assert '# TYPE test_latency_seconds histogram' in text
+    assert 'test_latency_seconds_bucket{route="/items/{id}",le="0.1"} 2' in text
+    assert 'test_latency_seconds_bucket{route="/items/{id}",le="1.0"} 3' in text
+    assert 'test_latency_seconds_bucket{route="/items/{id}",le="+Inf"} 4' in text
+    assert 'test_latency_seconds_count{route="/items/{id}"} 4' in text
+    assert 'test_latency_seconds_sum{route="/items/{id}"} 4.15' in text
+
+
+def test_counter_and_callback_gauge():
+    registry = MetricsRegistry()
+    counter = registry.counter("test_requests", "Requests", ("result",))
+    gauge = registry.gauge("test_open", "Open things")
+
+    counter.labels(result="hit").inc()
+    counter.labels("hit").inc(2)
+    gauge.set_function(lambda: 7)
+
+    text = registry.render()
+    assert 'test_requests_total{result="hit"} 3' in text
+    assert 'test_open 7' in text
+
+
+class StaticTiers(TenantTierCache):
+    def get(self, tenant_id):
+        return "pro" if tenant_id else "none"
+
+
+def test_middleware_labels_by_route_template_and_tier():
+    from app.core.metrics import HTTP_REQUEST_DURATION
+
+    app = FastAPI()
+
+    @app.get("/widgets/{widget_id}")
+    async def get_widget(widget_id: str):
+        return {"id": widget_id}
+
+    @app.middleware("http")
+    async def set_tenant(request, call_next):
+        request.state.tenant_id = "tenant-a"
+        return await call_next(request)
+
+    app.add_middleware(MetricsMiddleware, tiers=StaticTiers())
+
+    client = TestClient(app)
+    for widget_id in ("1", "2", "3"):
+        assert client.get(f"/widgets/{widget_id}").status_code == 200
+    client.get("/missing")
+
+    series = HTTP_REQUEST_DURATION.labels("/widgets/{widget_id}", "GET", "200", "pro")
+    assert sum(series.counts) == 3
+    assert sum(HTTP_REQUEST_DURATION.labels("unmatched", "GET", "404", "pro").counts) == 1
@@ -0,0 +1,60 @@
+"""
+Tests for the pure ASGI security and tenant middleware
+"""
+from fastapi import FastAPI, Request, WebSocket
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.middleware.security import SecurityMiddleware
+from app.middleware.tenant import TenantMiddleware
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/tenant")
+    async def tenant(request: Request):
+        return {"tenant_id": getattr(request.state, "tenant_id", None)}
+
+    @app.get("/export")
+    async def export():
+        async def rows():
+            for index in range(3):
+                yield f"row-{index}\n"
+        return StreamingResponse(rows(), media_type="text/plain")
+
+    @app.websocket("/ws")
+    async def ws(websocket: WebSocket):
+        await websocket.accept()
+        await websocket.send_text("hello")
+        await websocket.close()
+
+    app.add_middleware(SecurityMiddleware, sample_rate=1.0)
+    app.add_middleware(TenantMiddleware)
+    return app
+
+
+def test_headers_and_tenant_state_are_applied():
+    client = TestClient(build_app())
+    response = client.get("/tenant", headers={"X-Tenant-ID": "tenant-a"})
+
+    assert response.json() == {"tenant_id": "tenant-a"}
+    assert response.headers["X-Tenant-ID"] == "tenant-a"
+    assert response.headers["X-Frame-Options"] == "DENY"
+    assert response.headers["X-Content-Type-Options"] == "nosniff"
+    assert "X-Process-Time" in response.headers
+
+
+def test_streaming_response_passes_through():
+    client = TestClient(build_app())
+    response = client.get("/export")
+
+    assert response.text == "row-0\nrow-1\nrow-2\n"
+    assert response.headers["Referrer-Policy"] == "strict-origin-when-cross-origin"
+    assert "X-Tenant-ID" not in response.headers
+
+
+def test_websocket_scope_is_forwarded():
+    client = TestClient(build_app())
+    with client.websocket_connect("/ws") as websocket:
+        assert websocket.receive_text() == "hello"
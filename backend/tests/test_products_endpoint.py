@@ -0,0 +1,27 @@
+"""
+Tests for the product listing endpoint
+"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import products
+from app.core.dependencies import get_read_db
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(products.router, prefix="/products")
+
+    async def no_db():
+        # A malformed cursor is rejected before any query runs
+        yield None
+
+    app.dependency_overrides[get_read_db] = no_db
+    return app
+
+
+def test_garbage_cursor_is_a_bad_request():
+    client = TestClient(build_app())
+    response = client.get("/products/", params={"cursor": "not-a-cursor"})
+
+    assert response.status_code == 400
@@ -0,0 +1,270 @@
+"""
+Tests for the shared per-process realtime hub
+"""
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from app.services.realtime_service import RealtimeEvent, RealtimeHub, RealtimeService
+
+
+def _pmessage(tenant_id: str, event_type: str = "stock_update") -> dict:
+    event = RealtimeEvent(
+        event_type=event_type,
+        tenant_id=tenant_id,
+        data={"product_id": "p1"},
+        timestamp=datetime.utcnow()
+    )
+    return {
+        "type": "pmessage",
+        "pattern": RealtimeHub.CHANNEL_PATTERN,
+        "channel": f"elevatecrm:{tenant_id}:{event_type}",
+        "data": json.dumps(event.to_dict())
+    }
+
+
+@pytest.mark.asyncio
+async def test_hub_dispatches_by_tenant():
+    hub = RealtimeHub(RealtimeService())
+    received = {"a": [], "b": []}
+
+    async def on_a(event):
+        received["a"].append(event)
+
+    async def on_b(event):
+        received["b"].append(event)
+
+    hub.add_listener("tenant-a", on_a)
+    hub.add_listener("tenant-b", on_b)
+
+    await hub.handle_message(_pmessage("tenant-a"))
+    await hub.handle_message(_pmessage("global"))
+    await hub.handle_message(_pmessage("tenant-c"))
+    await hub.handle_message({"type": "psubscribe", "channel": "elevatecrm:*", "data": 1})
+
+    assert len(received["a"]) == 1
+    assert received["a"][0].tenant_id == "tenant-a"
+    assert received["b"] == []
+
+
+@pytest.mark.asyncio
+async def test_hub_remove_listener():
+    hub = RealtimeHub(RealtimeService())
+    received = []
+
+    async def callback(event):
+        received.append(event)
+
+    hub.add_listener("tenant-a", callback)
+    hub.remove_listener("tenant-a", callback)
+
+    assert "tenant-a" not in hub.listeners
+    await hub.handle_message(_pmessage("tenant-a"))
+    assert received == []
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def evalsha(self, sha, numkeys, *args):
+        self.commands.append(("evalsha", args))
+        return self
+
+    def xrange(self, key, min="-", max="+", count=None):
+        self.commands.append(("xrange", (key, min, count)))
+        return self
+
+    async def execute(self):
+        self.client.round_trips.append(self.commands)
+        return [self.client.run(name, args) for name, args in self.commands]
+
+
+class FakeRedis:
+    """Just enough of Redis for the append script and XRANGE"""
+
+    def __init__(self, maxlen: int = 1000):
+        self.round_trips = []
+        self.streams = {}
+        self.published = []
+        self.maxlen = maxlen
+        self.sequence = 0
+
+    async def script_load(self, script):
+        return "sha"
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def run(self, name, args):
+        if name == "evalsha":
+            stream, tenant_channel, global_channel, _, payload = args
+            self.sequence += 1
+            stream_id = f"1000-{self.sequence}"
+            entries = self.streams.setdefault(stream, [])
+            entries.append((stream_id, {"event": payload}))
+            del entries[:-self.maxlen]
+            stamped = payload[:-1] + f', "stream_id": "{stream_id}"}}'
+            self.published += [(tenant_channel, stamped), (global_channel, stamped)]
+            return stream_id
+
+        key, start, count = args
+        entries = self.streams.get(key, [])
+        if start.startswith("("):
+            after = int(start[1:].split("-")[1])
+            entries = [entry for entry in entries if int(entry[0].split("-")[1]) > after]
+        return entries[:count]
+
+
+def _connected_service(maxlen: int = 1000, stock_coalesce_ms: float = 0) -> RealtimeService:
+    service = RealtimeService(stock_coalesce_ms=stock_coalesce_ms)
+    service.redis_client = FakeRedis(maxlen)
+    service.is_connected = True
+    return service
+
+
+@pytest.mark.asyncio
+async def test_publish_appends_to_stream_and_both_channels_in_one_round_trip():
+    service = _connected_service()
+
+    await service.publish_stock_update("tenant-a", "p1", 1, 2)
+
+    redis = service.redis_client
+    assert len(redis.round_trips) == 1
+    assert [channel for channel, _ in redis.published] == [
+        "elevatecrm:tenant-a:stock_update", "elevatecrm:global:stock_update"
+    ]
+    event = RealtimeEvent.from_dict(json.loads(redis.published[0][1]))
+    assert event.stream_id == "1000-1"
+
+
+@pytest.mark.asyncio
+async def test_batch_coalesces_events_into_one_flush():
+    service = _connected_service()
+
+    async with service.batch():
+        await service.publish_stock_update("tenant-a", "p1", 1, 2)
+        async with service.batch():
+            await service.publish_system_notification("tenant-a", "stock", "Moved", "1 unit")
+        assert service.redis_client.round_trips == []
+
+    assert len(service.redis_client.round_trips) == 1
+    assert len(service.redis_client.round_trips[0]) == 2
+
+
+@pytest.mark.asyncio
+async def test_buffered_publisher_flushes_by_size_and_on_exit():
+    service = _connected_service()
+
+    async with service.buffered(max_events=10, flush_interval_ms=10_000) as publisher:
+        for index in range(25):
+            await service.publish_stock_update("tenant-a", f"p{index}", 0, index)
+        await asyncio.sleep(0.01)
+        assert [len(trip) for trip in service.redis_client.round_trips] == [25]
+
+        await service.publish_stock_update("tenant-a", "p-last", 0, 1)
+
+    assert [len(trip) for trip in service.redis_client.round_trips] == [25, 1]
+    assert publisher.dropped == 0
+
+
+@pytest.mark.asyncio
+async def test_read_events_since_replays_only_missed_events():
+    service = _connected_service()
+    for index in range(5):
+        await service.publish_stock_update("tenant-a", f"p{index}", 0, index)
+
+    events, complete = await service.read_events_since("tenant-a", "1000-3")
+
+    assert complete
+    assert [event.stream_id for event in events] == ["1000-4", "1000-5"]
+    assert [event.data["product_id"] for event in events] == ["p3", "p4"]
+
+
+@pytest.mark.asyncio
+async def test_read_events_since_flags_trimmed_or_truncated_gaps():
+    service = _connected_service(maxlen=3)
+    for index in range(6):
+        await service.publish_stock_update("tenant-a", f"p{index}", 0, index)
+
+    _, complete = await service.read_events_since("tenant-a", "1000-1")
+    assert not complete
+
+    events, complete = await service.read_events_since("tenant-a", "1000-4", limit=1)
+    assert not complete
+    assert [event.stream_id for event in events] == ["1000-5"]
+
+    with pytest.raises(ValueError):
+        await service.read_events_since("tenant-a", "not-an-id")
+
+
+def _published_events(service: RealtimeService) -> list:
+    return [
+        RealtimeEvent.from_dict(json.loads(payload))
+        for channel, payload in service.redis_client.published
+        if not channel.startswith("elevatecrm:global:")
+    ]
+
+
+@pytest.mark.asyncio
+async def test_stock_updates_are_merged_per_product_and_location():
+    service = _connected_service(stock_coalesce_ms=20)
+
+    await service.publish_stock_update("tenant-a", "p1", 10, 8, location_id="loc-1")
+    await service.publish_stock_update("tenant-a", "p1", 8, 5, location_id="loc-1")
+    await service.publish_stock_update("tenant-a", "p1", 5, 9, location_id="loc-1")
+    await service.publish_stock_update("tenant-a", "p1", 3, 4, location_id="loc-2")
+    assert service.redis_client.round_trips == []
+
+    await asyncio.sleep(0.05)
+
+    events = _published_events(service)
+    assert len(service.redis_client.round_trips) == 1
+    assert [event.data["location_id"] for event in events] == ["loc-1", "loc-2"]
+    assert events[0].data["old_quantity"] == 10
+    assert events[0].data["new_quantity"] == 9
+    assert events[0].data["change"] == -1
+    assert events[0].data["coalesced"] == 3
+
+
+@pytest.mark.asyncio
+async def test_product_wide_updates_merge_their_locations():
+    service = _connected_service(stock_coalesce_ms=20)
+
+    await service.publish_stock_update("tenant-a", "p1", 0, 5, locations=[
+        {"location_id": "loc-1", "old_quantity": 0, "new_quantity": 5}
+    ])
+    await service.publish_stock_update("tenant-a", "p1", 5, 9, locations=[
+        {"location_id": "loc-1", "old_quantity": 5, "new_quantity": 6},
+        {"location_id": "loc-2", "old_quantity": 0, "new_quantity": 3},
+    ])
+    await asyncio.sleep(0.05)
+
+    [event] = _published_events(service)
+    assert (event.data["old_quantity"], event.data["new_quantity"]) == (0, 9)
+    assert event.data["locations"] == [
+        {"location_id": "loc-1", "old_quantity": 0, "new_quantity": 6},
+        {"location_id": "loc-2", "old_quantity": 0, "new_quantity": 3},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_throttled_tenant_gets_one_catch_up_refresh():
+    service = _connected_service(stock_coalesce_ms=10)
+    service.stock_updates.rate_per_second = 100
+    service.stock_updates.burst = 2
+
+    for index in range(5):
+        await service.publish_stock_update("tenant-a", f"p{index}", 0, 1)
+    await service.publish_stock_update("tenant-b", "p1", 0, 1)
+    await asyncio.sleep(0.1)
+
+    events = _published_events(service)
+    tenant_a = [event for event in events if event.tenant_id == "tenant-a"]
+    assert [event.event_type for event in tenant_a] == ["stock_update"] * 2 + ["dashboard_refresh"]
+    assert tenant_a[-1].data["dropped_updates"] == 3
+    assert [event.event_type for event in events if event.tenant_id == "tenant-b"] == ["stock_update"]
+    assert not service.stock_updates.dropped
@@ -0,0 +1,71 @@
+"""
+Tests for the sparse product co-occurrence store
+"""
+import uuid
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+np = pytest.importorskip("numpy")
+
+from app.models import Order
+from app.services import model_events
+from app.services.recommendation_store import CoOccurrenceMatrix
+
+
+def _matrix() -> CoOccurrenceMatrix:
+    empty = CoOccurrenceMatrix.from_pairs([], np.array([]), np.array([]), np.array([]))
+    return empty.merge_baskets([["a", "b", "c"], ["a", "b"], ["c", "d"]])
+
+
+def test_merge_and_top_k():
+    matrix = _matrix()
+
+    assert matrix.nnz == 8
+    assert matrix.top_k(["a"], 5, exclude=["a"]) == [("b", 2.0), ("c", 1.0)]
+    assert matrix.top_k(["b", "c"], 1) == [("a", 3.0)]
+    # b and c tie on 2.0; ties go to the lower product id
+    assert matrix.top_k(["a", "d"], 1) == [("b", 2.0)]
+    assert matrix.top_k(["a", "d"], 2) == [("b", 2.0), ("c", 2.0)]
+    assert matrix.top_k(["unknown"], 5) == []
+
+
+def test_save_and_memory_mapped_load(tmp_path):
+    matrix = _matrix()
+    matrix.meta = {"built_at": "2025-01-01T00:00:00"}
+
+    assert matrix.save(str(tmp_path)) == "v000001"
+    assert matrix.save(str(tmp_path)) == "v000002"
+
+    loaded = CoOccurrenceMatrix.load(str(tmp_path))
+    assert loaded.meta["version"] == "v000002"
+    assert isinstance(loaded.indices, np.memmap)
+    assert loaded.top_k(["a"], 5) == matrix.top_k(["a"], 5)
+
+
+def test_completing_an_order_queues_a_recommendation_update(monkeypatch):
+    queued = []
+    monkeypatch.setattr(model_events.celery_app, "send_task",
+                        lambda name, args=None, kwargs=None: queued.append((name, args, kwargs)))
+    engine = create_engine("sqlite://")
+    Order.metadata.create_all(engine, tables=[Order.__table__])
+    company_id = uuid.uuid4()
+
+    with Session(engine) as db:
+        draft = Order(company_id=company_id, order_number="SO-1", type="sales_order", created_by_id=uuid.uuid4())
+        confirmed = Order(company_id=company_id, order_number="SO-2", type="sales_order", status="confirmed",
+                          created_by_id=uuid.uuid4())
+        db.add_all([draft, confirmed])
+        db.commit()
+        assert queued == [("ai.update_recommendations", [str(company_id)], {"order_ids": [str(confirmed.id)]})]
+
+        queued.clear()
+        draft.notes = "Rush delivery"
+        db.commit()
+        assert queued == []
+
+        draft.status = "fulfilled"
+        db.commit()
+        assert queued == [("ai.update_recommendations", [str(company_id)], {"order_ids": [str(draft.id)]})]
+    engine.dispose()
@@ -0,0 +1,157 @@
+"""
+Tests for read-replica selection, health checks and read-your-writes stickiness
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import Column, Integer, String, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase
+
+from app.core import database
+from app.core.replicas import ReplicaSet
+from app.core.tenant_context import TenantContextManager
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Note(Base):
+    __tablename__ = "notes"
+    id = Column(Integer, primary_key=True)
+    body = Column(String)
+
+
+class DownEngine:
+    """Engine stand-in whose connections always fail"""
+
+    def connect(self):
+        raise ConnectionError("replica down")
+
+    async def dispose(self):
+        pass
+
+
+def sqlite_engine(url: str):
+    return create_async_engine("sqlite+aiosqlite:///:memory:")
+
+
+@pytest.mark.asyncio
+async def test_round_robin_and_least_connections():
+    replicas = ReplicaSet(["replica-a", "replica-b"], sqlite_engine)
+    try:
+        chosen = [replicas.choose().url for _ in range(4)]
+        assert chosen == ["replica-a", "replica-b", "replica-a", "replica-b"]
+
+        replicas.strategy = "least_connections"
+        replicas.replicas[0].active_sessions = 3
+        assert replicas.choose().url == "replica-b"
+    finally:
+        await replicas.stop()
+
+
+@pytest.mark.asyncio
+async def test_dead_replicas_leave_rotation():
+    replicas = ReplicaSet(["replica-a", "replica-b"], sqlite_engine)
+    try:
+        await replicas.replicas[0].engine.dispose()
+        replicas.replicas[0].engine = DownEngine()
+        await replicas.check_health()
+
+        assert not replicas.replicas[0].healthy
+        assert {replicas.choose().url for _ in range(4)} == {"replica-b"}
+
+        replicas.replicas[1].healthy = False
+        assert replicas.choose() is None
+    finally:
+        await replicas.stop()
+
+
+@pytest.mark.asyncio
+async def test_committed_writes_pin_tenant_to_primary(monkeypatch):
+    replicas = ReplicaSet(["replica-a"], sqlite_engine, sticky_seconds=60)
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    monkeypatch.setattr(database, "read_replicas", replicas)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        TenantContextManager.set_tenant_id("tenant-a")
+        async with AsyncSession(engine) as session:
+            await session.execute(text("SELECT 1"))
+            await session.commit()
+        assert replicas.choose("tenant-a") is not None
+
+        async with AsyncSession(engine) as session:
+            session.add(Note(body="hello"))
+            await session.rollback()
+        assert replicas.choose("tenant-a") is not None
+
+        async with AsyncSession(engine) as session:
+            session.add(Note(body="hello"))
+            await session.commit()
+        assert replicas.choose("tenant-a") is None
+        assert replicas.choose("tenant-b") is not None
+    finally:
+        TenantContextManager.clear_tenant_id()
+        await replicas.stop()
+        await engine.dispose()
+
+
+class FakeRedis:
+    """Shared key store with millisecond expiries, as seen by several workers"""
+
+    def __init__(self):
+        self.expiries = {}
+
+    async def set(self, key, value, px=None):
+        self.expiries[key] = px
+
+    async def pttl(self, key):
+        return self.expiries.get(key, -2)
+
+    async def close(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_search_results_from_a_lagging_replica_are_not_cacheable(monkeypatch):
+    replicas = ReplicaSet(["replica-a"], sqlite_engine, sticky_seconds=5.0)
+    monkeypatch.setattr(database, "read_replicas", replicas)
+    tenant_id = "6f1c2d3e-4a5b-4c6d-8e7f-9a0b1c2d3e4f"
+    lag = {"seconds": 0.0}
+
+    async def replication_lag(session):
+        return lag["seconds"]
+
+    monkeypatch.setattr(database, "replication_lag", replication_lag)
+    try:
+        async for session in database.get_read_session(tenant_id):
+            assert database.on_read_replica(session)
+            assert await database.cacheable_read(session)
+            lag["seconds"] = 10.0
+            assert not await database.cacheable_read(session)
+            lag["seconds"] = None
+            assert not await database.cacheable_read(session)
+    finally:
+        await replicas.stop()
+
+
+@pytest.mark.asyncio
+async def test_stickiness_is_shared_between_processes():
+    redis_conn = FakeRedis()
+    writer = ReplicaSet(["replica-a"], sqlite_engine, sticky_seconds=5.0, redis_factory=lambda: redis_conn)
+    reader = ReplicaSet(["replica-a"], sqlite_engine, sticky_seconds=5.0, redis_factory=lambda: redis_conn)
+    try:
+        assert await reader.choose_for("tenant-a") is not None
+
+        writer.mark_write("tenant-a")
+        await asyncio.sleep(0)
+
+        assert await reader.choose_for("tenant-a") is None
+        assert reader.is_sticky("tenant-a")
+        assert await reader.choose_for("tenant-b") is not None
+    finally:
+        await writer.stop()
+        await reader.stop()
@@ -0,0 +1,117 @@
+"""
+Tests for atomic stock reservations and their expiry sweep
+"""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.models import Product, StockLevel, StockLocation, StockMove, StockReservation
+from app.services.reservation_service import (
+    InsufficientStock, commit_reservation, expire_reservations, release_reservation, reserve_stock
+)
+from app.services.stock_service import adjust_product_totals, adjust_stock_level, get_stock_level
+
+COMPANY_ID = uuid.uuid4()
+PRODUCT_ID = uuid.uuid4()
+LOCATION_ID = uuid.uuid4()
+USER_ID = uuid.uuid4()
+
+
+@pytest_asyncio.fixture
+async def engine():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            lambda sync_conn: StockMove.metadata.create_all(
+                sync_conn,
+                tables=[
+                    Product.__table__, StockLocation.__table__, StockMove.__table__,
+                    StockLevel.__table__, StockReservation.__table__
+                ]
+            )
+        )
+    async with AsyncSession(engine) as session:
+        session.add(Product(
+            id=PRODUCT_ID, company_id=COMPANY_ID, name="Widget", sku="W-1",
+            stock_quantity=0, reserved_quantity=0, created_by_id=USER_ID
+        ))
+        await session.flush()
+        await adjust_stock_level(session, COMPANY_ID, PRODUCT_ID, LOCATION_ID, on_hand_delta=10)
+        await adjust_product_totals(session, COMPANY_ID, PRODUCT_ID, on_hand_delta=10)
+        await session.commit()
+    try:
+        yield engine
+    finally:
+        await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def db(engine):
+    async with AsyncSession(engine) as session:
+        yield session
+
+
+async def stock(db):
+    level = await get_stock_level(db, COMPANY_ID, PRODUCT_ID, LOCATION_ID)
+    product = await db.get(Product, PRODUCT_ID, populate_existing=True)
+    return level.on_hand, level.reserved, product.stock_quantity, product.reserved_quantity
+
+
+@pytest.mark.asyncio
+async def test_reservations_never_exceed_available_stock(db):
+    _, level = await reserve_stock(db, COMPANY_ID, PRODUCT_ID, LOCATION_ID, 6)
+    assert (level.on_hand, level.reserved) == (10, 6)
+
+    with pytest.raises(InsufficientStock):
+        await reserve_stock(db, COMPANY_ID, PRODUCT_ID, LOCATION_ID, 5)
+    with pytest.raises(InsufficientStock):
+        await reserve_stock(db, COMPANY_ID, PRODUCT_ID, uuid.uuid4(), 1)
+
+    await reserve_stock(db, COMPANY_ID, PRODUCT_ID, LOCATION_ID, 4)
+    assert await stock(db) == (10, 10, 10, 10)
+
+
+@pytest.mark.asyncio
+async def test_release_and_commit_resolve_a_reservation_once(db):
+    released, _ = await reserve_stock(db, COMPANY_ID, PRODUCT_ID, LOCATION_ID, 2)
+    shipped, _ = await reserve_stock(db, COMPANY_ID, PRODUCT_ID, LOCATION_ID, 3, reference_type="order")
+
+    level = await release_reservation(db, COMPANY_ID, released.id)
+    assert (level.location_id, level.on_hand, level.reserved) == (LOCATION_ID, 10, 3)
+    assert await release_reservation(db, COMPANY_ID, released.id) is None
+    assert await stock(db) == (10, 3, 10, 3)
+
+    move, level = await commit_reservation(db, COMPANY_ID, shipped.id, USER_ID)
+    assert (level.on_hand, level.reserved) == (7, 0)
+    assert (move.from_location_id, move.quantity, move.reference_type) == (LOCATION_ID, 3, "order")
+    assert await commit_reservation(db, COMPANY_ID, shipped.id, USER_ID) is None
+    assert await release_reservation(db, COMPANY_ID, shipped.id) is None
+    assert await stock(db) == (7, 0, 7, 0)
+
+
+@pytest.mark.asyncio
+async def test_sweeper_expires_overdue_reservations_oldest_first(db):
+    now = datetime.utcnow()
+    stale, _ = await reserve_stock(db, COMPANY_ID, PRODUCT_ID, LOCATION_ID, 1, ttl_seconds=60, now=now - timedelta(hours=1))
+    older, _ = await reserve_stock(db, COMPANY_ID, PRODUCT_ID, LOCATION_ID, 2, ttl_seconds=60, now=now - timedelta(hours=2))
+    live, _ = await reserve_stock(db, COMPANY_ID, PRODUCT_ID, LOCATION_ID, 4, ttl_seconds=600, now=now)
+
+    # Expired reservations can no longer be committed, even before the sweep
+    assert await commit_reservation(db, COMPANY_ID, stale.id, USER_ID, now=now) is None
+
+    count, levels = await expire_reservations(db, now=now, limit=1)
+    assert count == 1
+    assert [(level.location_id, level.on_hand, level.reserved) for level in levels] == [(LOCATION_ID, 10, 5)]
+    assert (await db.get(StockReservation, older.id, populate_existing=True)).status == "expired"
+    assert (await expire_reservations(db, now=now))[0] == 1
+    assert await expire_reservations(db, now=now) == (0, [])
+
+    statuses = (await db.execute(
+        select(StockReservation.id, StockReservation.status)
+    )).all()
+    assert dict(statuses) == {stale.id: "expired", older.id: "expired", live.id: "active"}
+    assert await stock(db) == (10, 4, 10, 4)
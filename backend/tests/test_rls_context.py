@@ -0,0 +1,76 @@
+"""
+Tests for applying the RLS tenant context with each transaction's BEGIN
+"""
+import uuid
+
+import asyncpg
+import pytest
+
+from app.core import database
+from app.core.database import RLS_TENANT_KEY, TenantConnection, rls_enforced, scope_session_to_tenant
+
+
+class UnconnectedTenantConnection(TenantConnection):
+    """TenantConnection with no socket behind it"""
+
+    def __del__(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self):
+        self.info = {}
+
+
+@pytest.fixture
+def executed(monkeypatch):
+    statements = []
+
+    async def fake_execute(self, query, *args, timeout=None):
+        statements.append(query)
+        return "OK"
+
+    monkeypatch.setattr(asyncpg.Connection, "execute", fake_execute)
+    return statements
+
+
+@pytest.mark.asyncio
+async def test_pending_tenant_is_folded_into_begin_once(executed):
+    tenant_id = str(uuid.uuid4())
+    connection = object.__new__(UnconnectedTenantConnection)
+    connection._pending_tenant_id = tenant_id
+
+    await connection.execute("BEGIN ISOLATION LEVEL READ COMMITTED;")
+    await connection.execute("COMMIT;")
+    await connection.execute("BEGIN;")
+
+    assert executed == [
+        "BEGIN ISOLATION LEVEL READ COMMITTED; "
+        f"SELECT set_config('elevatecrm.tenant_id', '{tenant_id}', true);",
+        "COMMIT;",
+        "BEGIN;",
+    ]
+
+
+def test_only_uuid_tenants_scope_a_session():
+    session = FakeSession()
+    tenant_id = uuid.uuid4()
+
+    assert not scope_session_to_tenant(session, "tenant'; DROP TABLE contacts; --")
+    assert RLS_TENANT_KEY not in session.info
+
+    assert scope_session_to_tenant(session, str(tenant_id).upper())
+    assert session.info[RLS_TENANT_KEY] == str(tenant_id)
+
+
+def test_app_filter_is_kept_unless_rls_is_enforced(monkeypatch):
+    session = FakeSession()
+    scope_session_to_tenant(session, str(uuid.uuid4()))
+    monkeypatch.setattr(database.settings, "DATABASE_URL", "postgresql://db/elevatecrm")
+
+    monkeypatch.setattr(database.settings, "RLS_ENFORCED", False)
+    assert not rls_enforced(session)
+
+    monkeypatch.setattr(database.settings, "RLS_ENFORCED", True)
+    assert rls_enforced(session)
+    assert not rls_enforced(FakeSession())
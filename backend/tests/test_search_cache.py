@@ -0,0 +1,135 @@
+"""
+Tests for the tenant-versioned search cache
+"""
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.middleware.commit_tasks import CommitTasksMiddleware
+from app.services import search_cache as search_cache_module
+from app.services.search_cache import SearchCache, mark_search_stale
+
+
+class FakeRedis:
+    """In-memory subset of the Redis commands the cache uses"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    async def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+
+def _cache() -> SearchCache:
+    client = FakeRedis()
+
+    async def factory():
+        return client
+
+    return SearchCache(client_factory=factory, ttl=3600)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_compute_once():
+    cache = _cache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"results": [1, 2], "total": 2}
+
+    outcomes = await asyncio.gather(*[
+        cache.get_or_compute("tenant-a", "products", {"q": "bolt"}, compute)
+        for _ in range(10)
+    ])
+
+    assert len(calls) == 1
+    assert all(result == {"results": [1, 2], "total": 2} for result, _ in outcomes)
+
+    result, cached = await cache.get_or_compute("tenant-a", "products", {"q": "bolt"}, compute)
+    assert cached is True
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_bump_invalidates_only_that_tenant_and_entity():
+    cache = _cache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"total": len(calls)}
+
+    await cache.get_or_compute("tenant-a", "products", {}, compute)
+    await cache.get_or_compute("tenant-b", "products", {}, compute)
+    await cache.bump("tenant-a", "products")
+    await cache.bump("tenant-b", "contacts")
+
+    _, cached_a = await cache.get_or_compute("tenant-a", "products", {}, compute)
+    _, cached_b = await cache.get_or_compute("tenant-b", "products", {}, compute)
+
+    assert cached_a is False
+    assert cached_b is True
+
+
+@pytest.mark.asyncio
+async def test_uncacheable_results_are_not_stored():
+    cache = _cache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"total": len(calls)}
+
+    async def lagging():
+        return False
+
+    result, cached = await cache.get_or_compute("tenant-a", "products", {}, compute, cacheable=lagging)
+    assert (result, cached) == ({"total": 1}, False)
+
+    result, cached = await cache.get_or_compute("tenant-a", "products", {}, compute)
+    assert (result, cached) == ({"total": 2}, False)
+
+
+class ProductsTable:
+    __tablename__ = "products"
+
+
+def test_write_responses_wait_for_the_generation_bump(monkeypatch):
+    bumped = []
+
+    async def slow_bump(tenant_id, entity):
+        await asyncio.sleep(0.05)
+        bumped.append((tenant_id, entity))
+
+    monkeypatch.setattr(search_cache_module.search_cache, "bump", slow_bump)
+
+    app = FastAPI()
+
+    @app.post("/write")
+    async def write():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with AsyncSession(engine) as session:
+            await session.execute(text("SELECT 1"))
+            mark_search_stale(session.sync_session, ProductsTable, "tenant-a")
+            await session.commit()
+        await engine.dispose()
+        return {"ok": True}
+
+    app.add_middleware(CommitTasksMiddleware)
+    response = TestClient(app).post("/write")
+
+    assert response.json() == {"ok": True}
+    assert bumped == [("tenant-a", "products")]
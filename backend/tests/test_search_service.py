@@ -0,0 +1,110 @@
+"""
+Tests for search service helpers
+"""
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, String, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import DeclarativeBase
+
+from app.services.search_service import (
+    DEFAULT_PRICE_BUCKETS,
+    SEARCH_CAPABILITIES,
+    SearchQuery,
+    SearchService,
+    build_price_ranges,
+    decode_cursor,
+    detect_search_capabilities,
+    encode_cursor,
+)
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Item(Base):
+    __tablename__ = "items"
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    updated_at = Column(DateTime)
+
+
+def test_default_price_ranges():
+    ranges = build_price_ranges(DEFAULT_PRICE_BUCKETS)
+
+    assert [label for label, _, _ in ranges] == ['0-10', '10-50', '50-100', '100-500', '500+']
+    assert ranges[-1] == ('500+', 500, None)
+
+
+def test_custom_price_ranges():
+    ranges = build_price_ranges([0, 19.99, 250])
+
+    assert ranges == [('0-19.99', 0, 19.99), ('19.99-250', 19.99, 250), ('250+', 250, None)]
+
+
+def test_tsquery_quotes_operator_characters_in_user_input():
+    query = SearchQuery("o'brien a:b&c (x|y)! back\\slash -\"it's done\" ! &&")
+
+    assert query.to_tsquery() == (
+        "(('o''brien':* & 'a:b&c':* & '(x|y)!':* & 'back\\\\slash':*)) & !(('it''s' <-> 'done'))"
+    )
+
+
+def test_tsquery_drops_terms_without_words():
+    query = SearchQuery("& | ! \"( )\" -:")
+
+    assert not query.has_content()
+    assert query.to_tsquery() == ''
+
+
+def test_cursor_round_trip():
+    values = [Decimal("19.99"), datetime(2024, 1, 2, 3, 4, 5), None, uuid.uuid4()]
+    cursor = encode_cursor(values, "products:name")
+
+    assert decode_cursor(cursor, "products:name") == values
+
+
+def test_cursor_rejects_other_sort_and_garbage():
+    cursor = encode_cursor(["a", 1], "products:name")
+
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, "products:price")
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor", "products:name")
+
+
+@pytest.mark.asyncio
+async def test_capabilities_default_to_fuzzy_without_postgres():
+    capabilities = await detect_search_capabilities(None)
+
+    assert capabilities == {'fts': False, 'trigram': False}
+    assert SEARCH_CAPABILITIES == capabilities
+
+
+@pytest.mark.asyncio
+async def test_cursor_pages_skip_the_count():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSession(engine) as session:
+            session.add_all([Item(name=name) for name in ("a", "b", "c")])
+            await session.commit()
+
+            service = SearchService(session, None)
+            first = await service._paginate(select(Item), Item, [('name', 'asc')], page=1, limit=2)
+            assert first['total'] == 3
+            assert [item.name for item in first['results']] == ['a', 'b']
+
+            second = await service._paginate(
+                select(Item), Item, [('name', 'asc')], page=1, limit=2, cursor=first['cursor']
+            )
+            assert second['total'] is None
+            assert [item.name for item in second['results']] == ['c']
+            assert second['cursor'] is None
+    finally:
+        await engine.dispose()
@@ -0,0 +1,105 @@
+"""
+Tests for hashed, chunked semantic indexing
+"""
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine, select
+from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.sql import Select
+
+pytest.importorskip("pandas")
+
+from app.services import ai_analytics_service
+from app.services.ai_analytics_service import SemanticSearchService
+from app.services.embedding_service import EmbeddingModelRegistry
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Note(Base):
+    __tablename__ = "notes"
+    id = Column(Integer, primary_key=True)
+    body = Column(String)
+
+
+class FakeModel:
+    """Records the batches it is asked to encode"""
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, convert_to_numpy=True):
+        self.batches.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    """Serves stored content hashes and records upserts; reads stream from bind"""
+
+    def __init__(self, bind=None, stored=None):
+        self.bind = bind
+        self.stored = dict(stored or {})
+        self.upserts = []
+        self.commits = 0
+
+    def get_bind(self):
+        return self.bind
+
+    def execute(self, statement):
+        if isinstance(statement, Select):
+            return FakeResult(list(self.stored.items()))
+        self.upserts.append(statement)
+
+    def commit(self):
+        self.commits += 1
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(ai_analytics_service, "embedding_registry", EmbeddingModelRegistry(lambda name: model))
+    return model
+
+
+def test_unchanged_rows_are_not_re_encoded(model):
+    db = FakeSession(stored={1: SemanticSearchService.content_hash("same")})
+    service = SemanticSearchService(db)
+
+    written = service.index_batch("product", [{"id": 1, "content": "same"}, {"id": 2, "content": "new"}])
+
+    assert written == 1
+    assert model.batches == [["new"]]
+    assert len(db.upserts) == 1
+
+    db.stored[2] = SemanticSearchService.content_hash("new")
+    assert service.index_batch("product", [{"id": 1, "content": "same"}, {"id": 2, "content": "new"}]) == 0
+    assert model.batches == [["new"]]
+    assert len(db.upserts) == 1
+
+
+def test_index_stream_encodes_one_chunk_at_a_time(model):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(Note.__table__.insert(), [{"id": i, "body": f"note {i}"} for i in range(5)])
+
+    db = FakeSession(bind=engine, stored={0: SemanticSearchService.content_hash("note 0")})
+    service = SemanticSearchService(db)
+    counts = service.index_stream(
+        "note", select(Note.id, Note.body).order_by(Note.id),
+        lambda row: {"id": row.id, "content": row.body}, chunk_size=2
+    )
+
+    assert counts == {"seen": 5, "written": 4}
+    assert model.batches == [["note 1"], ["note 2", "note 3"], ["note 4"]]
+    assert db.commits == 3
+    engine.dispose()
@@ -0,0 +1,164 @@
+"""
+Tests for per-location stock levels maintained from stock moves
+"""
+import json
+import uuid
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.api.v1.endpoints.inventory import _stream_stock_summary
+from app.models import Product, StockLevel, StockLocation, StockMove
+from app.services.search_service import decode_cursor
+from app.services.stock_service import (
+    adjust_product_totals_bulk, adjust_stock_level, apply_stock_deltas, apply_stock_move, get_stock_level,
+    rebuild_stock_levels, stock_summary_query
+)
+
+COMPANY_ID = uuid.uuid4()
+PRODUCT_ID = uuid.uuid4()
+USER_ID = uuid.uuid4()
+
+
+@pytest_asyncio.fixture
+async def db():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            lambda sync_conn: StockMove.metadata.create_all(
+                sync_conn,
+                tables=[Product.__table__, StockLocation.__table__, StockMove.__table__, StockLevel.__table__]
+            )
+        )
+    try:
+        async with AsyncSession(engine) as session:
+            session.add(Product(
+                id=PRODUCT_ID, company_id=COMPANY_ID, name="Widget", sku="W-1",
+                reorder_point=5, created_by_id=USER_ID
+            ))
+            await session.flush()
+            yield session
+    finally:
+        await engine.dispose()
+
+
+async def record_move(db, from_location_id, to_location_id, quantity, status="completed"):
+    move = StockMove(
+        company_id=COMPANY_ID,
+        product_id=PRODUCT_ID,
+        from_location_id=from_location_id,
+        to_location_id=to_location_id,
+        quantity=quantity,
+        movement_type="adjustment",
+        status=status,
+        created_by_id=USER_ID
+    )
+    db.add(move)
+    await db.flush()
+    return await apply_stock_move(db, move)
+
+
+async def on_hand(db, location_id):
+    level = await get_stock_level(db, COMPANY_ID, PRODUCT_ID, location_id)
+    return level.on_hand if level else None
+
+
+@pytest.mark.asyncio
+async def test_moves_adjust_both_locations(db):
+    warehouse, store = uuid.uuid4(), uuid.uuid4()
+
+    assert await record_move(db, None, warehouse, 10) == [(warehouse, 0, 10)]
+    assert await record_move(db, warehouse, store, 3) == [(warehouse, 10, 7), (store, 0, 3)]
+    assert await record_move(db, store, None, 1) == [(store, 3, 2)]
+    assert await record_move(db, None, store, 50, status="pending") == []
+    await db.commit()
+
+    assert await on_hand(db, warehouse) == 7
+    assert await on_hand(db, store) == 2
+    assert await db.scalar(select(Product.stock_quantity)) == 9
+
+
+@pytest.mark.asyncio
+async def test_rebuild_restores_ledger_and_keeps_reservations(db):
+    warehouse, store, stale = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    await record_move(db, None, warehouse, 10)
+    await record_move(db, warehouse, store, 4)
+
+    # Drift the table away from the ledger
+    await adjust_stock_level(db, COMPANY_ID, PRODUCT_ID, warehouse, on_hand_delta=100, reserved_delta=2)
+    await adjust_stock_level(db, COMPANY_ID, PRODUCT_ID, stale, on_hand_delta=5)
+    await db.commit()
+
+    await rebuild_stock_levels(db, COMPANY_ID)
+    await db.commit()
+
+    rows = await db.execute(select(StockLevel.location_id, StockLevel.on_hand, StockLevel.reserved))
+    assert {location_id: (qty, reserved) for location_id, qty, reserved in rows} == {
+        warehouse: (6, 2),
+        store: (4, 0),
+    }
+    assert (await db.execute(select(Product.stock_quantity, Product.reserved_quantity))).one() == (10, 2)
+
+
+@pytest.mark.asyncio
+async def test_bulk_deltas_upsert_levels_and_product_totals(db):
+    warehouse, store = uuid.uuid4(), uuid.uuid4()
+    await adjust_stock_level(db, COMPANY_ID, PRODUCT_ID, warehouse, on_hand_delta=5)
+
+    changes = await apply_stock_deltas(db, COMPANY_ID, {
+        (PRODUCT_ID, warehouse): -2,
+        (PRODUCT_ID, store): 7,
+        (PRODUCT_ID, uuid.uuid4()): 0,
+    })
+    totals = await adjust_product_totals_bulk(db, COMPANY_ID, {PRODUCT_ID: 5})
+    await db.commit()
+
+    assert totals == {PRODUCT_ID: (0, 5)}
+
+    assert changes == {(PRODUCT_ID, warehouse): (5, 3), (PRODUCT_ID, store): (0, 7)}
+    assert await on_hand(db, store) == 7
+    assert await db.scalar(select(Product.stock_quantity)) == 5
+
+
+async def read_summary(db, limit, **filters):
+    rows = await db.stream(stock_summary_query(COMPANY_ID, limit + 1, **filters))
+    chunks = [chunk async for chunk in _stream_stock_summary(rows, limit, "location_id" in filters)]
+    return json.loads("".join(chunks))
+
+
+@pytest.mark.asyncio
+async def test_summary_pages_by_keyset_and_filters(db):
+    warehouse, store = uuid.uuid4(), uuid.uuid4()
+    db.add_all([
+        StockLocation(id=warehouse, company_id=COMPANY_ID, name="Warehouse"),
+        StockLocation(id=store, company_id=COMPANY_ID, name="Store"),
+        Product(company_id=COMPANY_ID, name="Anvil", sku="A-1", reorder_point=0, created_by_id=USER_ID),
+        Product(company_id=COMPANY_ID, name="Zipper", sku="Z-1", reorder_point=0, created_by_id=USER_ID),
+        Product(company_id=uuid.uuid4(), name="Other tenant", sku="O-1", created_by_id=USER_ID),
+    ])
+    await record_move(db, None, warehouse, 10)
+    await record_move(db, warehouse, store, 4)
+    await db.commit()
+
+    first = await read_summary(db, 2)
+    assert [item["product_name"] for item in first["items"]] == ["Anvil", "Widget"]
+    assert first["has_more"]
+    widget = first["items"][1]
+    assert (widget["total_quantity"], widget["available_quantity"]) == (10, 10)
+    assert [(location["name"], location["quantity"]) for location in widget["locations"]] == [
+        ("Store", 4), ("Warehouse", 6)
+    ]
+
+    after = decode_cursor(first["next_cursor"], "stock_summary")
+    second = await read_summary(db, 2, after=after)
+    assert [item["product_name"] for item in second["items"]] == ["Zipper"]
+    assert not second["has_more"] and second["next_cursor"] is None
+
+    at_store = await read_summary(db, 10, location_id=store)
+    assert [(item["product_name"], item["total_quantity"]) for item in at_store["items"]] == [("Widget", 4)]
+
+    # Widget has 10 on hand against a reorder point of 5; the others sit at 0 <= 0
+    low = await read_summary(db, 10, low_stock_only=True)
+    assert [item["product_name"] for item in low["items"]] == ["Anvil", "Zipper"]
@@ -0,0 +1,101 @@
+"""
+Tests for the in-memory search suggestion index
+"""
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.tenant_context import TenantContextManager
+from app.models import Contact, Order
+from app.services.realtime_service import EventTypes, RealtimeEvent, RealtimeHub, RealtimeService
+from app.services.suggestion_index import PrefixIndex, SuggestionIndex, contact_terms, suggestion_index
+from app.services.tenant_service import TenantAwareService
+
+
+def test_prefix_index_groups_kinds_and_shares_terms():
+    index = PrefixIndex(("name", "company"))
+    index.load([
+        ("c1", contact_terms("Acme Buyer", company_name="Acme Corp")),
+        ("c2", contact_terms(None, "Ada", "Lovelace", "Acme Corp")),
+        ("c3", contact_terms("Bob", company_name="Beta")),
+    ])
+
+    assert index.suggest("ac", 10) == [
+        {"type": "name", "value": "Acme Buyer"},
+        {"type": "company", "value": "Acme Corp"},
+    ]
+    assert index.suggest("AD", 10) == [{"type": "name", "value": "Ada Lovelace"}]
+
+    # Shared company term survives until its last contact goes
+    index.remove("c1")
+    assert {"type": "company", "value": "Acme Corp"} in index.suggest("acme", 10)
+    index.remove("c2")
+    assert index.suggest("acme", 10) == []
+
+
+@pytest.mark.asyncio
+async def test_events_update_loaded_index_and_lru_evicts_idle_tenants():
+    hub = RealtimeHub(RealtimeService())
+    suggestions = SuggestionIndex(hub, max_terms=2, max_age=3600)
+
+    index = PrefixIndex(("name", "sku"))
+    suggestions._store(("tenant-a", "products"), index)
+    assert "tenant-a" in hub.listeners
+
+    await hub.dispatch(RealtimeEvent(
+        event_type=EventTypes.PRODUCT_UPDATE,
+        tenant_id="tenant-a",
+        data={"product_id": "p1", "action": "created", "name": "Widget", "sku": "WID-1"},
+        timestamp=datetime.utcnow()
+    ))
+    assert index.suggest("wi", 5) == [
+        {"type": "name", "value": "Widget"},
+        {"type": "sku", "value": "WID-1"},
+    ]
+
+    # A second tenant pushes the budget over; the idle tenant is evicted
+    other = PrefixIndex(("name", "sku"))
+    other.upsert("p9", {"name": "Gadget"})
+    suggestions._store(("tenant-b", "products"), other)
+
+    assert ("tenant-a", "products") not in suggestions.indexes
+    assert "tenant-a" not in hub.listeners
+
+
+@pytest.mark.asyncio
+async def test_contact_writes_update_the_loaded_index():
+    tenant_id = str(uuid.uuid4())
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda sync_conn: Contact.metadata.create_all(
+            sync_conn, tables=[Contact.__table__, Order.__table__]
+        ))
+    TenantContextManager.set_tenant_id(tenant_id)
+    try:
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            assert await suggestion_index.suggest(db, tenant_id, "contacts", "ad", 5) == []
+
+            service = TenantAwareService(db)
+            contact = await service.create(
+                Contact, first_name="Ada", last_name="Lovelace", company_name="Acme",
+                created_by_id=uuid.uuid4()
+            )
+            await db.commit()
+            assert await suggestion_index.suggest(db, tenant_id, "contacts", "a", 5) == [
+                {"type": "name", "value": "Ada Lovelace"},
+                {"type": "company", "value": "Acme"},
+            ]
+
+            await service.update(Contact, contact.id, company_name="Analytical Engines")
+            await db.commit()
+            assert await suggestion_index.suggest(db, tenant_id, "contacts", "ac", 5) == []
+
+            await service.delete(Contact, contact.id)
+            await db.commit()
+            assert await suggestion_index.suggest(db, tenant_id, "contacts", "a", 5) == []
+    finally:
+        suggestion_index.discard(tenant_id, "contacts")
+        TenantContextManager.clear_tenant_id()
+        await engine.dispose()
@@ -0,0 +1,271 @@
+"""
+Tests for WebSocket connection management and outbound queues
+"""
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from app.api.v1.endpoints.websocket import (
+    JSON_FORMAT, ClientConnection, ConnectionManager, WireFormat, _coalesce_key, negotiate_wire_format,
+    parse_subscription
+)
+from app.services.realtime_service import RealtimeEvent
+
+
+class FakeWebSocket:
+    """Minimal stand-in for a Starlette WebSocket"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.sent = []
+        self.close_code = None
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(text)
+
+    async def send_bytes(self, data: bytes):
+        self.sent.append(data)
+
+    async def close(self, code: int = 1000, reason=None):
+        self.close_code = code
+
+
+@pytest.mark.asyncio
+async def test_tenant_broadcast_is_not_serialized_by_slow_clients():
+    manager = ConnectionManager()
+    sockets = [FakeWebSocket(delay=0.05) for _ in range(50)]
+    for index, ws in enumerate(sockets):
+        await manager.connect(ws, f"user-{index}", "tenant-a")
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await manager.send_to_tenant("tenant-a", {"type": "ping"})
+    await asyncio.sleep(0.2)
+
+    assert all(len(ws.sent) == 1 for ws in sockets)
+    assert loop.time() - started < 1.0
+    # Every recipient shares the same encoded payload object
+    assert len({id(ws.sent[0]) for ws in sockets}) == 1
+
+    for connection_id in list(manager.connection_metadata):
+        manager.disconnect(connection_id)
+
+
+@pytest.mark.asyncio
+async def test_full_queue_coalesces_then_drops_oldest():
+    connection = ClientConnection(FakeWebSocket(), "conn-1", max_queue_size=2)
+
+    connection.enqueue("a", coalesce_key="stock:p1")
+    connection.enqueue("b")
+    connection.enqueue("c", coalesce_key="stock:p1")
+    assert [payload for _, payload in connection.queue] == ["c", "b"]
+    assert connection.dropped == 0
+
+    connection.enqueue("d")
+    assert [payload for _, payload in connection.queue] == ["b", "d"]
+    assert connection.dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_send_timeout_closes_the_socket():
+    connection = ClientConnection(FakeWebSocket(delay=0.5), "conn-1", send_timeout=0.01)
+    failed = []
+    connection.start(failed.append)
+
+    connection.enqueue("a")
+    await asyncio.sleep(0.05)
+
+    assert failed == ["conn-1"]
+    assert connection.closed
+    assert connection.websocket.close_code == 1013
+
+
+@pytest.mark.asyncio
+async def test_disconnect_removes_connection():
+    manager = ConnectionManager()
+    connection_id = await manager.connect(FakeWebSocket(), "user-1", "tenant-a")
+
+    manager.disconnect(connection_id)
+
+    assert manager.get_total_connections() == 0
+    assert "tenant-a" not in manager.active_connections
+
+
+def _stock_event(stream_id: str, product_id: str, location_id: str = "loc-1") -> RealtimeEvent:
+    return RealtimeEvent(
+        event_type="stock_update",
+        tenant_id="tenant-a",
+        data={"product_id": product_id, "location_id": location_id},
+        timestamp=datetime.utcnow(),
+        stream_id=stream_id
+    )
+
+
+class ReplayingService:
+    """Serves a fixed replay while a live event races in mid-read"""
+
+    def __init__(self, manager: ConnectionManager, complete: bool = True):
+        self.manager = manager
+        self.complete = complete
+
+    async def read_events_since(self, tenant_id, last_event_id, limit):
+        await self.manager.dispatch_event(_stock_event("1-3", "p3"))
+        await self.manager.dispatch_event(_stock_event("1-4", "p4"))
+        return [_stock_event("1-2", "p2"), _stock_event("1-3", "p3")], self.complete
+
+
+@pytest.mark.asyncio
+async def test_replay_precedes_live_tail_without_duplicates():
+    manager = ConnectionManager()
+    ws = FakeWebSocket()
+    connection_id = await manager.connect(ws, "user-1", "tenant-a")
+
+    await manager.replay(connection_id, "1-1", ReplayingService(manager))
+    await asyncio.sleep(0.05)
+
+    messages = [json.loads(text) for text in ws.sent]
+    assert [message["stream_id"] for message in messages] == ["1-2", "1-3", "1-4"]
+    assert [message.get("replayed", False) for message in messages] == [True, True, False]
+
+    manager.disconnect(connection_id)
+
+
+@pytest.mark.asyncio
+async def test_incomplete_replay_asks_client_to_resync():
+    manager = ConnectionManager()
+    ws = FakeWebSocket()
+    connection_id = await manager.connect(ws, "user-1", "tenant-a")
+
+    await manager.replay(connection_id, "1-1", ReplayingService(manager, complete=False))
+    await asyncio.sleep(0.05)
+
+    messages = [json.loads(text) for text in ws.sent]
+    assert messages[0]["type"] == "resync_required"
+    assert [message["stream_id"] for message in messages[1:]] == ["1-2", "1-3", "1-4"]
+
+    manager.disconnect(connection_id)
+
+
+@pytest.mark.asyncio
+async def test_events_reach_only_matching_subscriptions():
+    manager = ConnectionManager()
+    everything, orders, product_p1 = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    await manager.connect(everything, "user-1", "tenant-a")
+    orders_id = await manager.connect(orders, "user-2", "tenant-a")
+    product_id = await manager.connect(product_p1, "user-3", "tenant-a")
+
+    manager.subscribe(orders_id, *parse_subscription({"event_types": ["order_update"]}))
+    manager.subscribe(product_id, *parse_subscription({
+        "filters": {"stock_update": {"product_id": ["p1"], "location_id": ["loc-1"]}}
+    }))
+
+    await manager.dispatch_event(_stock_event("1-1", "p1"))
+    await manager.dispatch_event(_stock_event("1-2", "p1", location_id="loc-2"))
+    await manager.dispatch_event(_stock_event("1-3", "p2"))
+    await asyncio.sleep(0.05)
+
+    assert len(everything.sent) == 3
+    assert orders.sent == []
+    assert [json.loads(text)["stream_id"] for text in product_p1.sent] == ["1-1"]
+
+    # An empty subscription restores the default of receiving everything
+    manager.subscribe(orders_id, *parse_subscription({}))
+    manager.disconnect(product_id)
+    await manager.dispatch_event(_stock_event("1-4", "p1"))
+    await asyncio.sleep(0.05)
+
+    assert [json.loads(text)["stream_id"] for text in orders.sent] == ["1-4"]
+    assert not manager.subscriptions.by_entity
+
+    for connection_id in list(manager.connection_metadata):
+        manager.disconnect(connection_id)
+    assert not manager.subscriptions.unfiltered and not manager.subscriptions.by_type
+
+
+@pytest.mark.asyncio
+async def test_product_wide_stock_updates_match_their_locations():
+    manager = ConnectionManager()
+    by_location, by_product = FakeWebSocket(), FakeWebSocket()
+    location_id = await manager.connect(by_location, "user-1", "tenant-a")
+    product_id = await manager.connect(by_product, "user-2", "tenant-a")
+    manager.subscribe(location_id, *parse_subscription({"filters": {"stock_update": {"location_id": ["loc-1"]}}}))
+    manager.subscribe(product_id, *parse_subscription({
+        "filters": {"stock_update": {"product_id": ["p1"], "location_id": ["loc-2"]}}
+    }))
+
+    batch = _stock_event("1-1", "p1", location_id=None)
+    batch.data["locations"] = [{"location_id": "loc-1"}, {"location_id": "loc-2"}]
+    other = _stock_event("1-2", "p1", location_id=None)
+    other.data["locations"] = [{"location_id": "loc-3"}]
+    await manager.dispatch_event(batch)
+    await manager.dispatch_event(other)
+    await asyncio.sleep(0.05)
+
+    assert [json.loads(text)["stream_id"] for text in by_location.sent] == ["1-1"]
+    assert [json.loads(text)["stream_id"] for text in by_product.sent] == ["1-1"]
+    assert _coalesce_key(batch) == "stock_update:p1:loc-1,loc-2"
+    assert _coalesce_key(other) == "stock_update:p1:loc-3"
+
+    for connection_id in list(manager.connection_metadata):
+        manager.disconnect(connection_id)
+
+
+def test_invalid_subscriptions_are_rejected():
+    with pytest.raises(ValueError):
+        parse_subscription({"event_types": ["everything"]})
+    with pytest.raises(ValueError):
+        parse_subscription({"filters": {"stock_update": {"sku": ["A"]}}})
+    with pytest.raises(ValueError):
+        parse_subscription({"filters": {"notification": {"user_id": ["u"]}}})
+
+
+class HeaderOnlyWebSocket:
+    def __init__(self, headers: dict):
+        self.headers = headers
+
+
+@pytest.mark.asyncio
+async def test_messages_are_encoded_once_per_wire_format():
+    encoded = []
+
+    def encode(message):
+        encoded.append(message)
+        return json.dumps(message).encode()
+
+    binary_format = WireFormat("test-binary", True, encode, json.loads)
+    manager = ConnectionManager()
+    text_sockets = [FakeWebSocket() for _ in range(3)]
+    binary_sockets = [FakeWebSocket() for _ in range(3)]
+    for index, ws in enumerate(text_sockets):
+        await manager.connect(ws, f"text-{index}", "tenant-a")
+    for index, ws in enumerate(binary_sockets):
+        await manager.connect(ws, f"binary-{index}", "tenant-a", wire_format=binary_format)
+
+    await manager.dispatch_event(_stock_event("1-1", "p1"))
+    await asyncio.sleep(0.05)
+
+    assert len(encoded) == 1
+    assert {type(ws.sent[0]) for ws in text_sockets} == {str}
+    assert len({id(ws.sent[0]) for ws in binary_sockets}) == 1
+    assert json.loads(binary_sockets[0].sent[0]) == json.loads(text_sockets[0].sent[0])
+
+    for connection_id in list(manager.connection_metadata):
+        manager.disconnect(connection_id)
+
+
+def test_wire_format_negotiation_falls_back_to_json():
+    assert negotiate_wire_format(HeaderOnlyWebSocket({})) == (JSON_FORMAT, None)
+    assert negotiate_wire_format(HeaderOnlyWebSocket({}), "unknown") == (JSON_FORMAT, None)
+
+    offered = HeaderOnlyWebSocket({"sec-websocket-protocol": "elevatecrm.unknown, elevatecrm.json"})
+    assert negotiate_wire_format(offered) == (JSON_FORMAT, "elevatecrm.json")
+
+    lookalike = HeaderOnlyWebSocket({"sec-websocket-protocol": "x-elevatecrm.json"})
+    assert negotiate_wire_format(lookalike) == (JSON_FORMAT, None)